@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019-2020, University of Freiburg.
+# Chair of Algorithms and Data Structures.
+# Markus Näther <naetherm@informatik.uni-freiburg.de>
+
+"""
+Throughput of the bit-parallel edit distance of ocr_eval compared to the plain
+dynamic programming over Python lists, on synthetic ground truth and OCR output
+with the given character error rate:
+
+  python benchmarks/bench_eval.py --length 5000 --cer 0.05
+
+Both variants have to compute the same distance.
+"""
+
+import sys
+import time
+import random
+import argparse
+
+from ocr_pipeline.ocr_eval import edit_distance
+
+
+def python_edit_distance(a, b):
+  prev_ = list(range(len(b) + 1))
+  for i, x in enumerate(a, 1):
+    cur_ = [i]
+    for j, y in enumerate(b, 1):
+      cur_.append(min(prev_[j] + 1, cur_[-1] + 1, prev_[j - 1] + (x != y)))
+    prev_ = cur_
+  return prev_[-1]
+
+
+def synthetic_pair(length, cer, seed=0):
+  rnd_ = random.Random(seed)
+  gt_ = "".join(rnd_.choice("abcdefghijklmnopqrstuvwxyz      ") for _ in range(length))
+  ocr_ = []
+  for c in gt_:
+    r_ = rnd_.random()
+    if r_ < cer / 3:
+      continue
+    elif r_ < 2 * cer / 3:
+      ocr_.append(rnd_.choice("il1|"))
+    elif r_ < cer:
+      ocr_.append(c + rnd_.choice(".,'"))
+    else:
+      ocr_.append(c)
+  return gt_, "".join(ocr_)
+
+
+def main(argv=None):
+
+  if argv is None:
+    argv = sys.argv[1:]
+
+  parser = argparse.ArgumentParser(prog="bench_eval")
+
+  parser.add_argument("--length", dest="length", type=int, default=5000)
+  parser.add_argument("--cer", dest="cer", type=float, default=0.05)
+
+  args = parser.parse_args(argv)
+
+  gt, ocr = synthetic_pair(args.length, args.cer)
+
+  results_ = []
+  for name, distance in [('python', python_edit_distance), ('myers', edit_distance)]:
+    start_ = time.perf_counter()
+    d_ = distance(gt, ocr)
+    elapsed_ = time.perf_counter() - start_
+    results_.append(d_)
+
+    print("{:<8} distance {:>6} {:>8.3f}s {:>14.0f} cells/s".format(
+      name, d_, elapsed_, len(gt) * len(ocr) / elapsed_
+    ))
+
+  if results_[0] != results_[1]:
+    print("Mismatch: {} != {}".format(*results_))
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+  main()
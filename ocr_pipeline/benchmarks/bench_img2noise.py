@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019-2020, University of Freiburg.
+# Chair of Algorithms and Data Structures.
+# Markus Näther <naetherm@informatik.uni-freiburg.de>
+
+"""
+Microbenchmark of the single noisers of Img2NoiseConverter on a synthetic page
+(A4 at 200 dpi by default):
+
+  python benchmarks/bench_img2noise.py --repeat 20
+"""
+
+import sys
+import time
+import argparse
+
+import numpy as np
+
+from ocr_pipeline.ocr_img2noise import Img2NoiseConverter
+
+
+def make_page(height, width, rng):
+  """
+  A white page with some black 'text lines'.
+  """
+  page = np.full((height, width, 3), 255, dtype=np.uint8)
+  for y in range(100, height - 100, 40):
+    mask = rng.random(width - 200) < 0.6
+    page[y:y + 20, 100:width - 100][:, mask] = 0
+  return page
+
+
+def main(argv=None):
+
+  if argv is None:
+    argv = sys.argv[1:]
+
+  parser = argparse.ArgumentParser(prog="bench_img2noise")
+
+  parser.add_argument("--height", dest="height", type=int, default=2339)
+  parser.add_argument("--width", dest="width", type=int, default=1654)
+  parser.add_argument("--repeat", dest="repeat", type=int, default=10)
+
+  args = parser.parse_args(argv)
+
+  converter = Img2NoiseConverter(
+    input_directory=None,
+    noise_types=None,
+    num_trials=1,
+    gauss_mean=80,
+    gauss_variance=4000,
+    sp_ratio=0.5,
+    sp_amount=0.015,
+    erose_kernel_size=2,
+    erose_iterations=1,
+    rotate_angle=2,
+    seed=0,
+    paper_id="benchmark"
+  )
+  rng = converter.page_rng(0)
+  page = make_page(args.height, args.width, rng)
+
+  noisers = [
+    ('gauss', converter._gauss),
+    ('sp', converter._salt_n_pepper),
+    ('poisson', converter._poisson),
+    ('speckle', converter._speckle),
+    ('erode', converter._erode),
+    ('rotate', converter._rotate),
+  ]
+
+  # The noisers may work in-place, so every call gets a fresh copy of the page.
+  # The time of the copy is measured separately and subtracted.
+  start_ = time.perf_counter()
+  for _ in range(args.repeat):
+    page.copy()
+  copy_time_ = (time.perf_counter() - start_) / args.repeat
+
+  print("{}x{} page, {} repetitions".format(args.height, args.width, args.repeat))
+  for name, noiser in noisers:
+    # Warm up the caches (kernels, rotation matrices, buffers)
+    noiser(page.copy(), rng)
+
+    start_ = time.perf_counter()
+    for _ in range(args.repeat):
+      noiser(page.copy(), rng)
+    elapsed_ = (time.perf_counter() - start_) / args.repeat - copy_time_
+
+    print("{:<10} {:>10.2f} ms".format(name, 1000. * elapsed_))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019-2020, University of Freiburg.
+# Chair of Algorithms and Data Structures.
+# Markus Näther <naetherm@informatik.uni-freiburg.de>
+
+"""
+Compares the OCR modes of Img2TxtConverter on the page images of one paper
+(e.g. the 30 pages produced by ocr_pdf2img):
+
+  python benchmarks/bench_img2txt.py --input-directory /output/arxiv/noise/<id>/
+
+Note that the converter (re)writes the *.jpg.txt and output.txt files of that
+directory.
+"""
+
+import sys
+import time
+import argparse
+
+from ocr_pipeline.ocr_img2txt import Img2TxtConverter
+
+
+def run(name, **kwargs):
+  start_ = time.perf_counter()
+  i2t = Img2TxtConverter(**kwargs)
+  elapsed_ = time.perf_counter() - start_
+
+  print("{:<32} {:>4} pages {:>8.2f}s total {:>6.3f}s/page".format(
+    name, len(i2t.latencies), elapsed_, elapsed_ / max(1, len(i2t.latencies))
+  ))
+
+  with open(i2t.output_file, 'r', encoding='utf-8') as fin:
+    return fin.read()
+
+
+def main(argv=None):
+
+  if argv is None:
+    argv = sys.argv[1:]
+
+  parser = argparse.ArgumentParser(prog="bench_img2txt")
+
+  parser.add_argument(
+    "--input-directory",
+    dest="input_directory",
+    required=True,
+    help="Directory containing the page images of a single paper."
+  )
+  parser.add_argument(
+    "--batch-size",
+    dest="batch_size",
+    type=int,
+    default=0,
+    help="Batch size of the batch mode, default: 0 (whole paper)."
+  )
+
+  args = parser.parse_args(argv)
+
+  per_page = run(
+    "per page (pytesseract)",
+    input_directory=args.input_directory,
+    backend='pytesseract',
+    num_workers=1
+  )
+  batched = run(
+    "batch (tesseract list file)",
+    input_directory=args.input_directory,
+    num_workers=1,
+    batch_size=args.batch_size
+  )
+
+  if per_page.split() != batched.split():
+    print("Warning: the recognized texts of both modes differ")
+
+
+if __name__ == '__main__':
+  main()
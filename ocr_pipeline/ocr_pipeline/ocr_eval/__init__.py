@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019-2020, University of Freiburg.
+# Chair of Algorithms and Data Structures.
+# Markus Näther <naetherm@informatik.uni-freiburg.de>
+
+"""
+Scores the recognized text of papers against their ground truth.
+
+The ground truth of a paper is its original.txt, the recognized text the
+<page>.jpg.txt files written by ocr_img2txt. Both are compared with all runs of
+whitespace collapsed into one space, as the line breaks of the ground truth and
+of the rendered pages have nothing in common.
+
+Edit distances are computed with the bit-parallel algorithm of Myers (in the
+formulation of Hyyrö), which handles a whole column of the dynamic programming
+matrix with a few operations on Python integers used as bit vectors. The
+sequences are mapped to integer codes with NumPy first, so characters and words
+are handled the same way.
+
+The paper scores compare the whole ground truth with all pages. The page scores
+compare every page with its own ground truth <page>.jpg.gt.txt written by
+ocr_pdf2gt. Pages without one are searched (with a free start and end) in the
+ground truth, starting where the previous page ended. The character and word
+alignments of the pages can additionally be written to alignment.jsonl.
+"""
+
+import os
+import re
+import json
+import logging
+import multiprocessing
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ground_truth_file_name = "original.txt"
+alignment_file_name = "alignment.jsonl"
+
+# Suffix of the recognized text of a page image, see ocr_img2txt
+page_text_suffix = ".txt"
+# Suffix of the ground truth of a page image, see ocr_pdf2gt
+page_ground_truth_suffix = ".gt.txt"
+
+paper_columns = [
+  'paper', 'pages', 'gt_chars', 'ocr_chars', 'char_errors', 'cer', 'gt_words', 'ocr_words', 'word_errors', 'wer'
+]
+page_columns = [
+  'paper', 'page', 'gt_chars', 'ocr_chars', 'char_errors', 'cer', 'gt_words', 'ocr_words', 'word_errors', 'wer'
+]
+
+# Alignment operations
+OP_MATCH = '='
+OP_SUBSTITUTION = 'S'
+OP_DELETION = 'D'
+OP_INSERTION = 'I'
+
+# Largest dynamic programming matrix (in cells) computed for an alignment
+default_max_alignment_cells = 1 << 25
+
+# Ground truth searched for a page beyond twice its length
+_search_slack = 1000
+
+_rx_whitespace = re.compile(r'\s+')
+
+
+def normalize_whitespace(text):
+  return _rx_whitespace.sub(' ', text).strip()
+
+
+def encode(a, b):
+  """
+  Returns the sequences `a` and `b` (strings, or lists of words) as arrays of
+  integer codes. Equal elements get equal codes.
+  """
+  if isinstance(a, str) and isinstance(b, str):
+    return (
+      np.frombuffer(a.encode('utf-32-le', errors='surrogatepass'), dtype='<u4'),
+      np.frombuffer(b.encode('utf-32-le', errors='surrogatepass'), dtype='<u4')
+    )
+
+  codes_ = {}
+  return (
+    np.array([codes_.setdefault(x, len(codes_)) for x in a], dtype=np.int64),
+    np.array([codes_.setdefault(x, len(codes_)) for x in b], dtype=np.int64)
+  )
+
+
+def _match_vectors(pattern, text):
+  """
+  Returns the list of the bit vectors of the positions of `pattern` matching
+  each element of `text`, bit i standing for position i.
+  """
+  order_ = np.argsort(pattern, kind='stable')
+  symbols_, starts_ = np.unique(pattern[order_], return_index=True)
+  ends_ = np.append(starts_[1:], len(pattern))
+
+  used_ = np.isin(symbols_, text)
+  bits_ = np.zeros(len(pattern), dtype=bool)
+  vectors_ = {}
+  for symbol, start, end in zip(symbols_[used_].tolist(), starts_[used_], ends_[used_]):
+    positions_ = order_[start:end]
+    bits_[positions_] = True
+    vectors_[symbol] = int.from_bytes(np.packbits(bits_, bitorder='little').tobytes(), 'little')
+    bits_[positions_] = False
+
+  return [vectors_.get(symbol, 0) for symbol in text.tolist()]
+
+
+def _myers_columns(pattern, text, free_start):
+  """
+  Yields the edit distance between `pattern` and the prefixes of `text` (after
+  every element of it) using Myers' bit-parallel algorithm. With `free_start`
+  the pattern may start anywhere in the text (approximate search), otherwise
+  at its beginning.
+  """
+  m = len(pattern)
+  mask = (1 << m) - 1
+  high = 1 << (m - 1)
+
+  pv = mask
+  mv = 0
+  score = m
+  for eq in _match_vectors(pattern, text):
+    xv = eq | mv
+    xh = (((eq & pv) + pv) ^ pv) | eq
+    ph = mv | (~(xh | pv) & mask)
+    mh = pv & xh
+    if ph & high:
+      score += 1
+    elif mh & high:
+      score -= 1
+    ph <<= 1
+    mh <<= 1
+    if not free_start:
+      # The first row of the matrix grows by one in every column
+      ph |= 1
+    pv = (mh | ~(xv | ph)) & mask
+    mv = ph & xv
+    yield score
+
+
+def edit_distance(a, b):
+  """
+  Returns the Levenshtein distance between the sequences `a` and `b` (strings,
+  or lists of words).
+  """
+  a, b = encode(a, b)
+
+  # A common prefix and suffix don't change the distance
+  k_ = min(len(a), len(b))
+  diff_ = np.flatnonzero(a[:k_] != b[:k_])
+  prefix_ = diff_[0] if len(diff_) else k_
+  a, b = a[prefix_:], b[prefix_:]
+  k_ = min(len(a), len(b))
+  diff_ = np.flatnonzero(a[len(a) - k_:][::-1] != b[len(b) - k_:][::-1])
+  suffix_ = diff_[0] if len(diff_) else k_
+  a, b = a[:len(a) - suffix_], b[:len(b) - suffix_]
+
+  # The longer sequence is the bit vector, so the loop runs over the shorter one
+  if len(a) < len(b):
+    a, b = b, a
+  if not len(a) or not len(b):
+    return len(a)
+
+  score = len(a)
+  for score in _myers_columns(a, b, free_start=False):
+    pass
+  return score
+
+
+def search(pattern, text):
+  """
+  Returns the tuple (distance, start, end) of the substring text[start:end]
+  with the smallest edit distance to `pattern` (of the same type as `text`).
+  Of several, the one ending last wins, and of those the shortest.
+  """
+  pattern_, text_ = encode(pattern, text)
+  if not len(pattern_):
+    return 0, 0, 0
+  if not len(text_):
+    return len(pattern_), 0, 0
+
+  best_, end_ = len(pattern_), 0
+  for i, score in enumerate(_myers_columns(pattern_, text_, free_start=True)):
+    if score <= best_:
+      best_, end_ = score, i + 1
+  if end_ == 0:
+    return best_, 0, 0
+
+  # The start is the end of the best match of the reversed pattern searching
+  # backwards from `end_`
+  start_ = end_
+  for i, score in enumerate(_myers_columns(pattern_[::-1], text_[end_ - 1::-1], free_start=True)):
+    if score == best_:
+      start_ = end_ - i - 1
+      break
+
+  return best_, start_, end_
+
+
+def align(a, b, max_cells=default_max_alignment_cells):
+  """
+  Returns an optimal alignment of the sequences `a` and `b` (strings, or lists of
+  words) as a list of runs (op, part of a, part of b), where op is one of
+  OP_MATCH, OP_SUBSTITUTION, OP_DELETION (only in `a`) and OP_INSERTION (only
+  in `b`), or None if it needs more than `max_cells` cells.
+  """
+  a_, b_ = encode(a, b)
+  n, m = len(a_), len(b_)
+  if (n + 1) * (m + 1) > max_cells:
+    return None
+
+  # Every row is computed from the previous one at once: the insertions within a
+  # row are a running minimum of D[i][j] - j
+  cols_ = np.arange(m + 1, dtype=np.int32)
+  d_ = np.empty((n + 1, m + 1), dtype=np.int32)
+  d_[0] = cols_
+  for i in range(1, n + 1):
+    prev_ = d_[i - 1]
+    row_ = np.empty(m + 1, dtype=np.int32)
+    row_[0] = i
+    np.minimum(prev_[:-1] + (b_ != a_[i - 1]), prev_[1:] + 1, out=row_[1:])
+    d_[i] = np.minimum.accumulate(row_ - cols_) + cols_
+
+  ops_ = []
+  i, j = n, m
+  while i > 0 or j > 0:
+    if i > 0 and j > 0 and d_[i, j] == d_[i - 1, j - 1] + (a_[i - 1] != b_[j - 1]):
+      ops_.append(OP_MATCH if a_[i - 1] == b_[j - 1] else OP_SUBSTITUTION)
+      i, j = i - 1, j - 1
+    elif i > 0 and d_[i, j] == d_[i - 1, j] + 1:
+      ops_.append(OP_DELETION)
+      i -= 1
+    else:
+      ops_.append(OP_INSERTION)
+      j -= 1
+  ops_.reverse()
+
+  runs_ = []
+  i = j = 0
+  for op in ops_:
+    di, dj = (0 if op == OP_INSERTION else 1), (0 if op == OP_DELETION else 1)
+    if runs_ and runs_[-1][0] == op:
+      runs_[-1][1] += di
+      runs_[-1][2] += dj
+    else:
+      runs_.append([op, di, dj])
+
+  result = []
+  for op, di, dj in runs_:
+    result.append((op, a[i:i + di], b[j:j + dj]))
+    i, j = i + di, j + dj
+  return result
+
+
+def _word_range(text, start, end):
+  """
+  Extends text[start:end] to whole words.
+  """
+  if start >= end:
+    return start, end
+  start = text.rfind(' ', 0, start) + 1
+  if text[end - 1] != ' ':
+    end = text.find(' ', end)
+    if end < 0:
+      end = len(text)
+  return start, end
+
+
+def _error_rate(errors, length):
+  if length:
+    return errors / length
+  return 0.0 if not errors else 1.0
+
+
+def _score_row(gt, ocr, char_errors, word_errors, gt_words, ocr_words):
+  return [
+    len(gt), len(ocr), char_errors, _error_rate(char_errors, len(gt)),
+    len(gt_words), len(ocr_words), word_errors, _error_rate(word_errors, len(gt_words))
+  ]
+
+
+def page_files(directory):
+  """
+  Returns the sorted names of the page images within `directory` which have a
+  recognized text.
+  """
+  return sorted(
+    fn for fn in os.listdir(directory)
+    if fn.endswith(".jpg") and os.path.isfile(os.path.join(directory, fn + page_text_suffix))
+  )
+
+
+def _read_text(filename):
+  with open(filename, 'r', encoding='utf-8', errors='replace') as fin:
+    return fin.read()
+
+
+def evaluate_paper(directory, alignment=False, max_alignment_cells=default_max_alignment_cells):
+  """
+  Scores the paper within `directory`. Returns the tuple (paper row, page rows),
+  see `paper_columns` and `page_columns`, or None if there is no ground truth.
+  With `alignment`, the alignments of all pages are written to alignment.jsonl
+  within `directory`.
+  """
+  gt_fn = os.path.join(directory, ground_truth_file_name)
+  if not os.path.isfile(gt_fn):
+    logger.warning("No ground truth in '%s'", directory)
+    return None
+
+  paper = os.path.basename(os.path.normpath(directory))
+  gt = normalize_whitespace(_read_text(gt_fn))
+  pages = [
+    (fn, normalize_whitespace(_read_text(os.path.join(directory, fn + page_text_suffix))))
+    for fn in page_files(directory)
+  ]
+
+  page_rows = []
+  alignments_ = []
+  pos_ = 0
+  for fn, ocr in pages:
+    page_gt_fn = os.path.join(directory, fn + page_ground_truth_suffix)
+    if os.path.isfile(page_gt_fn):
+      gt_page = normalize_whitespace(_read_text(page_gt_fn))
+    else:
+      lo_ = max(0, pos_ - _search_slack)
+      hi_ = min(len(gt), pos_ + 2 * len(ocr) + _search_slack)
+      _, start_, end_ = search(ocr, gt[lo_:hi_])
+      start_, end_ = _word_range(gt, lo_ + start_, lo_ + end_)
+      pos_ = max(pos_, end_)
+      gt_page = gt[start_:end_]
+
+    gt_words, ocr_words = gt_page.split(), ocr.split()
+    word_errors = edit_distance(gt_words, ocr_words)
+    char_errors = edit_distance(gt_page, ocr)
+    page_rows.append([paper, fn] + _score_row(gt_page, ocr, char_errors, word_errors, gt_words, ocr_words))
+
+    if alignment:
+      alignments_.append({
+        'page': fn,
+        'chars': align(gt_page, ocr, max_alignment_cells),
+        'words': align(gt_words, ocr_words, max_alignment_cells),
+      })
+
+  ocr = " ".join(text for _, text in pages if text)
+  gt_words, ocr_words = gt.split(), ocr.split()
+  paper_row = [paper, len(pages)] + _score_row(
+    gt, ocr, edit_distance(gt, ocr), edit_distance(gt_words, ocr_words), gt_words, ocr_words
+  )
+
+  if alignment:
+    with open(os.path.join(directory, alignment_file_name), 'w', encoding='utf-8') as fout:
+      for a in alignments_:
+        fout.write(json.dumps(a, ensure_ascii=False) + "\n")
+
+  return paper_row, page_rows
+
+
+def _evaluate_paper(args):
+  directory, alignment, max_alignment_cells = args
+  try:
+    return directory, evaluate_paper(directory, alignment, max_alignment_cells)
+  except (OSError, ValueError) as e:
+    logger.error("Could not evaluate '%s': %s", directory, e)
+    return directory, None
+
+
+def evaluate_papers(directories, alignment=False, num_workers=1, max_alignment_cells=default_max_alignment_cells):
+  """
+  Yields (directory, result of evaluate_paper) for all `directories`, in order,
+  distributed over `num_workers` processes.
+  """
+  jobs_ = [(directory, alignment, max_alignment_cells) for directory in directories]
+  num_workers = max(1, num_workers or 1)
+
+  if num_workers == 1 or len(jobs_) < 2:
+    for job in jobs_:
+      yield _evaluate_paper(job)
+    return
+
+  pool = multiprocessing.Pool(processes=min(num_workers, len(jobs_)))
+  try:
+    for result in pool.imap(_evaluate_paper, jobs_):
+      yield result
+  finally:
+    pool.terminate()
+
+
+def format_row(row):
+  return "\t".join("{:.4f}".format(v) if isinstance(v, float) else str(v) for v in row)
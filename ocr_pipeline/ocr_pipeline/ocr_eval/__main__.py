@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019-2020, University of Freiburg.
+# Chair of Algorithms and Data Structures.
+# Markus Näther <naetherm@informatik.uni-freiburg.de>
+
+import os
+import sys
+import argparse
+import logging
+
+from ocr_pipeline.ocr_eval import (
+  evaluate_papers, format_row, paper_columns, page_columns, default_max_alignment_cells
+)
+
+logger = logging.getLogger(__name__)
+
+def main(argv=None):
+
+  if argv is None:
+    argv = sys.argv[1:]
+
+  parser = argparse.ArgumentParser(prog="ocr_eval", add_help=False)
+
+  group = parser.add_argument_group("Evaluation options")
+
+  group.add_argument(
+    "--output-file",
+    dest="output_file",
+    default=None,
+    help="Write the per-paper error table (TSV) to this file, default: standard output."
+  )
+
+  group.add_argument(
+    "--page-table",
+    dest="page_table",
+    default=None,
+    help="Write the per-page error table (TSV) to this file."
+  )
+
+  group.add_argument(
+    "--alignment",
+    dest="alignment",
+    action='store_true',
+    default=False,
+    help="Write the character and word alignments of all pages to alignment.jsonl within the paper directories."
+  )
+
+  group.add_argument(
+    "--max-alignment-cells",
+    dest="max_alignment_cells",
+    type=int,
+    default=default_max_alignment_cells,
+    help="Skip alignments needing a larger matrix than that, default: {}.".format(default_max_alignment_cells)
+  )
+
+  group.add_argument(
+    "--num-workers",
+    dest="num_workers",
+    type=int,
+    default=os.cpu_count(),
+    help="The number of papers evaluated in parallel, default: number of cores."
+  )
+
+  group = parser.add_argument_group("General options")
+
+  group.add_argument('-q', '--quiet', dest='logging_level', action='store_const',
+                      const=logging.ERROR, default=logging.INFO,
+                      help="Suppress warning messages")
+  group.add_argument('-v', '--verbose', dest='logging_level', action='store_const',
+                      const=logging.DEBUG,
+                      help="Verbose output")
+  group.add_argument('--help', action='help',
+                      help="Show this help information and exit")
+
+  parser.add_argument(
+    "directories",
+    metavar="DIRECTORY",
+    nargs='+',
+    help="The paper directories, containing original.txt and the recognized pages."
+  )
+
+  args = parser.parse_args(argv)
+
+  logging.basicConfig()
+  logging.getLogger().setLevel(args.logging_level)
+
+  fout = open(args.output_file, 'w') if args.output_file is not None else sys.stdout
+  fpages = open(args.page_table, 'w') if args.page_table is not None else None
+
+  # Micro-averaged over all papers
+  totals_ = dict((column, 0) for column in ['gt_chars', 'char_errors', 'gt_words', 'word_errors'])
+  try:
+    fout.write("\t".join(paper_columns) + "\n")
+    if fpages is not None:
+      fpages.write("\t".join(page_columns) + "\n")
+
+    for directory, result in evaluate_papers(
+      args.directories,
+      alignment=args.alignment,
+      num_workers=args.num_workers,
+      max_alignment_cells=args.max_alignment_cells
+    ):
+      if result is None:
+        continue
+
+      paper_row, page_rows = result
+      fout.write(format_row(paper_row) + "\n")
+      if fpages is not None:
+        for row in page_rows:
+          fpages.write(format_row(row) + "\n")
+
+      for column in totals_:
+        totals_[column] += paper_row[paper_columns.index(column)]
+  finally:
+    if fout is not sys.stdout:
+      fout.close()
+    if fpages is not None:
+      fpages.close()
+
+  logger.info(
+    "CER %.4f, WER %.4f",
+    totals_['char_errors'] / max(1, totals_['gt_chars']), totals_['word_errors'] / max(1, totals_['gt_words'])
+  )
+
+
+if __name__ == '__main__':
+  main()
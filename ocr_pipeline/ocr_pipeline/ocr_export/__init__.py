@@ -0,0 +1,376 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019-2020, University of Freiburg.
+# Chair of Algorithms and Data Structures.
+# Markus Näther <naetherm@informatik.uni-freiburg.de>
+
+"""
+Packs the outputs of the pipeline into a few large tar shards instead of
+millions of small files.
+
+The shards follow the WebDataset layout: a sample is a run of consecutive tar
+members sharing a key, the member name being <key>.<field>, e.g.
+
+  2001_01234/0001-01.jpg
+  2001_01234/0001-01.gt.txt
+  2001_01234/0001-01.ocr.txt
+  2001_01234/0001-01.json
+
+so they can be read sequentially with plain tar or any WebDataset reader. A
+shard is closed once it reaches a size or sample limit, and the next one is
+started. Next to every shard <prefix>-000000.tar, the index <prefix>-000000.idx
+lists the key, byte offset and byte length of every sample within it, for
+random access.
+
+Writers append to the last shard of their prefix if it is not full yet, so the
+pipeline can add one paper at a time. Writers running concurrently need
+distinct prefixes.
+"""
+
+import io
+import os
+import re
+import json
+import glob
+import tarfile
+import logging
+
+from ocr_pipeline.ocr_eval import ground_truth_file_name, page_text_suffix, page_ground_truth_suffix
+from ocr_pipeline.ocr_pdf2gt import read_pages_table
+
+logger = logging.getLogger(__name__)
+
+shard_suffix = ".tar"
+index_suffix = ".idx"
+
+default_max_shard_size = 1 << 30
+default_max_shard_samples = 10000
+
+# Files of a paper directory exported with the paper sample, by field
+paper_source_files = {
+  'original.txt': ground_truth_file_name,
+  'output.txt': "output.txt",
+  'simplified.tex': "simplified.tex",
+  'pdf': "simplified.pdf",
+}
+
+_rx_shard_number = re.compile(r'-(\d{6})' + re.escape(shard_suffix) + r'$')
+
+_tar_block_size = tarfile.BLOCKSIZE
+
+
+def sample_key(*parts):
+  """
+  Returns the key of a sample from `parts` (e.g. paper and page). Dots would end
+  the key within the member names, so they are replaced.
+  """
+  return "/".join(part.replace(".", "_") for part in parts)
+
+
+def split_member_name(name):
+  """
+  Returns the tuple (key, field) of the tar member `name`.
+  """
+  dirname, _, basename = name.rpartition("/")
+  stem, _, field = basename.partition(".")
+  return (dirname + "/" + stem if dirname else stem), field
+
+
+def _member_size(data):
+  # Header and the data padded to whole blocks
+  return _tar_block_size + -(-len(data) // _tar_block_size) * _tar_block_size
+
+
+def read_shard_index(index_fn):
+  """
+  Returns the list of (key, offset, length) of the shard index `index_fn`.
+  """
+  index_ = []
+  with open(index_fn, 'r') as fin:
+    for line in fin:
+      key, offset, length = line.rstrip("\n").split("\t")
+      index_.append((key, int(offset), int(length)))
+  return index_
+
+
+def _read_complete_index(index_fn):
+  """
+  Same as :py:func:`read_shard_index`, but stops at the first incomplete or
+  malformed line, e.g. one cut off by an interrupted export.
+  """
+  index_ = []
+  with open(index_fn, 'r') as fin:
+    for line in fin:
+      fields_ = line[:-1].split("\t") if line.endswith("\n") else []
+      if len(fields_) != 3 or not fields_[1].isdigit() or not fields_[2].isdigit():
+        break
+      index_.append((fields_[0], int(fields_[1]), int(fields_[2])))
+  return index_
+
+
+class ShardWriter(object):
+  """
+  Writes samples into the shards <prefix>-000000.tar, <prefix>-000001.tar, ...
+  A shard is closed before it would exceed `max_size` bytes or `max_samples`
+  samples (a single larger sample still gets a shard of its own). With `resume`,
+  writing continues in the last existing shard if it is not full yet.
+  """
+
+  def __init__(self, prefix, max_size=default_max_shard_size, max_samples=default_max_shard_samples, resume=True):
+    super(ShardWriter, self).__init__()
+
+    self.prefix = prefix
+    self.max_size = max_size
+    self.max_samples = max_samples
+
+    self.shard_number = 0
+    self.num_samples = 0
+    self.shards = []
+
+    self._tar = None
+    self._index = None
+    self._shard_samples = 0
+
+    dirname = os.path.dirname(prefix)
+    if dirname:
+      os.makedirs(dirname, exist_ok=True)
+
+    if resume:
+      existing_ = shard_files(prefix)
+      if existing_:
+        self.shard_number = int(_rx_shard_number.search(existing_[-1]).group(1))
+        self._open(append=True)
+
+  def shard_name(self, number=None):
+    return "{}-{:06d}{}".format(self.prefix, self.shard_number if number is None else number, shard_suffix)
+
+  def _open(self, append=False):
+    shard_fn = self.shard_name()
+    index_fn = shard_fn[:-len(shard_suffix)] + index_suffix
+
+    if append and os.path.isfile(shard_fn):
+      if self._resume(shard_fn, index_fn):
+        self.shards.append(shard_fn)
+        return
+      # Not resumable or full already, start the next one
+      self.shard_number += 1
+      self._open()
+      return
+
+    self._shard_samples = 0
+    self._tar = tarfile.open(shard_fn, 'w', format=tarfile.USTAR_FORMAT)
+    self._index = open(index_fn, 'w')
+    self.shards.append(shard_fn)
+
+  def _resume(self, shard_fn, index_fn):
+    """
+    Opens the shard `shard_fn` for appending, if it can be continued. Its index
+    is authoritative: everything behind the last indexed sample (e.g. a sample
+    cut off by an interrupted export) is truncated, as are index entries
+    pointing behind the end of the shard.
+    """
+    if not os.path.isfile(index_fn):
+      logger.warning("Shard '%s' has no index, not appending to it", shard_fn)
+      return False
+
+    size_ = os.path.getsize(shard_fn)
+    index_ = [entry for entry in _read_complete_index(index_fn) if entry[1] + entry[2] <= size_]
+    end_ = index_[-1][1] + index_[-1][2] if index_ else 0
+
+    if len(index_) >= self.max_samples or end_ >= self.max_size:
+      return False
+
+    if end_ < size_:
+      logger.debug("Truncating shard '%s' from %d to %d bytes", shard_fn, size_, end_)
+    with open(shard_fn, 'r+b') as fshard:
+      fshard.truncate(end_)
+      # The end-of-archive marker, tarfile only appends behind one
+      fshard.seek(end_)
+      fshard.write(tarfile.NUL * (2 * _tar_block_size))
+    with open(index_fn, 'w') as fidx:
+      for entry in index_:
+        fidx.write("{}\t{}\t{}\n".format(*entry))
+
+    try:
+      self._tar = tarfile.open(shard_fn, 'a' if end_ else 'w', format=tarfile.USTAR_FORMAT)
+    except tarfile.ReadError as e:
+      logger.warning("Shard '%s' is not readable, not appending to it: %s", shard_fn, e)
+      return False
+
+    logger.debug("Appending to shard '%s'", shard_fn)
+    self._index = open(index_fn, 'a')
+    self._shard_samples = len(index_)
+    return True
+
+  def _close_shard(self):
+    if self._tar is not None:
+      self._tar.close()
+      self._index.close()
+      self._tar = None
+      self._index = None
+
+  def write(self, key, fields):
+    """
+    Writes the sample `key` with the `fields` (a dictionary mapping the field
+    names, e.g. 'jpg' or 'gt.txt', to bytes or str).
+    """
+    data_ = [
+      (field, value.encode('utf-8') if isinstance(value, str) else value)
+      for field, value in sorted(fields.items())
+    ]
+    size_ = sum(_member_size(value) for _, value in data_)
+
+    if self._tar is not None and self._shard_samples and (
+      self._shard_samples >= self.max_samples or self._tar.offset + size_ > self.max_size
+    ):
+      self._close_shard()
+      self.shard_number += 1
+    if self._tar is None:
+      self._open()
+
+    offset_ = self._tar.offset
+    for field, value in data_:
+      info_ = tarfile.TarInfo(key + "." + field)
+      info_.size = len(value)
+      info_.mode = 0o644
+      self._tar.addfile(info_, io.BytesIO(value))
+
+    # Only index samples which are completely written
+    self._tar.fileobj.flush()
+    self._index.write("{}\t{}\t{}\n".format(key, offset_, self._tar.offset - offset_))
+    self._shard_samples += 1
+    self.num_samples += 1
+
+  def close(self):
+    self._close_shard()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+    return False
+
+
+def shard_files(prefix):
+  """
+  Returns the shards of `prefix`, in order.
+  """
+  return sorted(
+    fn for fn in glob.glob(glob.escape(prefix) + "-*" + shard_suffix)
+    if _rx_shard_number.search(fn)
+  )
+
+
+class ShardReader(object):
+  """
+  Reads the samples of the shards `shards` (a list of shard files, or the prefix
+  they were written with).
+
+  Iterating yields (key, fields) for all samples in order, reading every shard
+  sequentially in one stream. :py:meth:`read` fetches single samples through
+  the shard indices.
+  """
+
+  def __init__(self, shards, buffer_size=1 << 20):
+    super(ShardReader, self).__init__()
+
+    self.shards = shard_files(shards) if isinstance(shards, str) else list(shards)
+    self.buffer_size = buffer_size
+
+    # key -> (shard, offset, length), loaded on demand
+    self._index = None
+
+  def __iter__(self):
+    for shard_fn in self.shards:
+      with open(shard_fn, 'rb', buffering=self.buffer_size) as fin:
+        for sample in _iter_samples(tarfile.open(fileobj=fin, mode='r|', bufsize=self.buffer_size)):
+          yield sample
+
+  def keys(self):
+    self._load_index()
+    return list(self._index.keys())
+
+  def read(self, key):
+    """
+    Returns the fields of the sample `key`.
+    """
+    self._load_index()
+    shard_fn, offset, length = self._index[key]
+    with open(shard_fn, 'rb') as fin:
+      fin.seek(offset)
+      data_ = fin.read(length)
+
+    for _, fields in _iter_samples(tarfile.open(fileobj=io.BytesIO(data_), mode='r:')):
+      return fields
+    return {}
+
+  def _load_index(self):
+    if self._index is not None:
+      return
+
+    self._index = {}
+    for shard_fn in self.shards:
+      for key, offset, length in read_shard_index(shard_fn[:-len(shard_suffix)] + index_suffix):
+        self._index[key] = (shard_fn, offset, length)
+
+
+def _iter_samples(tar):
+  """
+  Yields (key, fields) of the consecutive members of `tar` sharing a key.
+  """
+  key_ = None
+  fields_ = {}
+  with tar:
+    for info in tar:
+      if not info.isfile():
+        continue
+      key, field = split_member_name(info.name)
+      if key != key_ and fields_:
+        yield key_, fields_
+        fields_ = {}
+      key_ = key
+      fields_[field] = tar.extractfile(info).read()
+  if fields_:
+    yield key_, fields_
+
+
+def _read_bytes(filename):
+  with open(filename, 'rb') as fin:
+    return fin.read()
+
+
+def paper_samples(directory, with_sources=False):
+  """
+  Yields (key, fields) of the samples of the paper within `directory`: one for
+  every page image with its recognized text ('ocr.txt'), its ground truth
+  ('gt.txt', see ocr_pdf2gt) and metadata ('json'). With `with_sources`, the
+  paper itself is a sample too, with its ground truth, recognized text, simplified
+  source and pdf (see `paper_source_files`).
+  """
+  paper = os.path.basename(os.path.normpath(directory))
+  pages_ = read_pages_table(directory)
+  images_ = sorted(fn for fn in os.listdir(directory) if fn.endswith(".jpg"))
+
+  for img_fn in images_:
+    fields_ = {'jpg': _read_bytes(os.path.join(directory, img_fn))}
+
+    for field, suffix in (('ocr.txt', page_text_suffix), ('gt.txt', page_ground_truth_suffix)):
+      fn = os.path.join(directory, img_fn + suffix)
+      if os.path.isfile(fn):
+        fields_[field] = _read_bytes(fn)
+
+    metadata_ = {'paper': paper, 'image': img_fn}
+    if img_fn in pages_:
+      metadata_['gt_start'], metadata_['gt_end'], _ = pages_[img_fn]
+    fields_['json'] = json.dumps(metadata_)
+
+    yield sample_key(paper, img_fn[:-len(".jpg")]), fields_
+
+  if with_sources:
+    fields_ = {'json': json.dumps({'paper': paper, 'pages': images_})}
+    for field, fn in paper_source_files.items():
+      fn = os.path.join(directory, fn)
+      if os.path.isfile(fn):
+        fields_[field] = _read_bytes(fn)
+
+    yield sample_key(paper, "paper"), fields_
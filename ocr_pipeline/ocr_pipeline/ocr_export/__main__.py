@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019-2020, University of Freiburg.
+# Chair of Algorithms and Data Structures.
+# Markus Näther <naetherm@informatik.uni-freiburg.de>
+
+import sys
+import argparse
+import logging
+
+from ocr_pipeline.ocr_export import (
+  ShardWriter, paper_samples, default_max_shard_size, default_max_shard_samples
+)
+
+def main(argv=None):
+
+  if argv is None:
+    argv = sys.argv[1:]
+
+  parser = argparse.ArgumentParser(prog="ocr_export", add_help=False)
+
+  group = parser.add_argument_group("Export options")
+
+  group.add_argument(
+    "--output-prefix",
+    dest="output_prefix",
+    required=True,
+    help="The prefix of the shards, e.g. /output/arxiv/shards/arxiv gives /output/arxiv/shards/arxiv-000000.tar, ..."
+  )
+
+  group.add_argument(
+    "--max-shard-size",
+    dest="max_shard_size",
+    type=int,
+    default=default_max_shard_size,
+    help="The maximum size of a shard in bytes, default: {}.".format(default_max_shard_size)
+  )
+
+  group.add_argument(
+    "--max-shard-samples",
+    dest="max_shard_samples",
+    type=int,
+    default=default_max_shard_samples,
+    help="The maximum number of samples of a shard, default: {}.".format(default_max_shard_samples)
+  )
+
+  group.add_argument(
+    "--with-sources",
+    dest="with_sources",
+    action='store_true',
+    default=False,
+    help="Additionally export every paper as a sample with its ground truth, recognized text, simplified source and pdf."
+  )
+
+  group.add_argument(
+    "--no-resume",
+    dest="resume",
+    action='store_false',
+    default=True,
+    help="Start a new shard instead of appending to the last one of the prefix."
+  )
+
+  group = parser.add_argument_group("General options")
+
+  group.add_argument('-q', '--quiet', dest='logging_level', action='store_const',
+                      const=logging.ERROR, default=logging.INFO,
+                      help="Suppress warning messages")
+  group.add_argument('-v', '--verbose', dest='logging_level', action='store_const',
+                      const=logging.DEBUG,
+                      help="Verbose output")
+  group.add_argument('--help', action='help',
+                      help="Show this help information and exit")
+
+  parser.add_argument(
+    "directories",
+    metavar="DIRECTORY",
+    nargs='+',
+    help="The paper directories to export."
+  )
+
+  args = parser.parse_args(argv)
+
+  logging.basicConfig()
+  logging.getLogger().setLevel(args.logging_level)
+
+  with ShardWriter(
+    args.output_prefix,
+    max_size=args.max_shard_size,
+    max_samples=args.max_shard_samples,
+    resume=args.resume
+  ) as writer:
+    for directory in args.directories:
+      for key, fields in paper_samples(directory, with_sources=args.with_sources):
+        writer.write(key, fields)
+
+  logging.debug("Wrote %d samples to %s", writer.num_samples, ", ".join(writer.shards))
+
+if __name__ == '__main__':
+  main()
@@ -4,6 +4,8 @@
 # Markus Näther <naetherm@informatik.uni-freiburg.de>
 
 import os
+import hashlib
+import logging
 
 import cv2
 try:
@@ -12,10 +14,17 @@ except ImportError:
   import Image
 
 import numpy as np
-import numpy.random as rnd
-import imutils
+
+logger = logging.getLogger(__name__)
 
 class Img2NoiseConverter(object):
+  """
+  Applies randomly chosen noisers to all page images of a paper.
+
+  Note that the noisers may work in-place on the image they are given, and
+  _rotate returns one of two buffers shared between all images of the same
+  shape.
+  """
 
   def __init__(
     self,
@@ -28,7 +37,10 @@ class Img2NoiseConverter(object):
     sp_amount,
     erose_kernel_size,
     erose_iterations,
-    rotate_angle
+    rotate_angle,
+    seed=None,
+    paper_id=None,
+    rotate_angle_step=0.1
   ):
     super(Img2NoiseConverter, self).__init__()
 
@@ -47,32 +59,57 @@ class Img2NoiseConverter(object):
     self.erose_kernel_size = erose_kernel_size
     self.erose_iterations = erose_iterations
     self.rotate_angle = rotate_angle
-
+    # Rotation angles are rounded to multiples of this step (in degrees), so the
+    # rotation matrices can be reused across pages
+    self.rotate_angle_step = rotate_angle_step
+
+    # Structuring elements per kernel size
+    self._kernels = {}
+    # Rotation matrices per (height, width, angle bucket)
+    self._rotation_matrices = {}
+    # Two output buffers per (shape, dtype), used alternately by _rotate
+    self._buffers = {}
+
+    # Every page gets its own random generator, derived from the base seed, the
+    # paper id and the page number. That way the noise is reproducible and does
+    # not depend on the process (or order) in which the pages are processed.
+    if seed is None:
+      seed = np.random.SeedSequence().entropy
+      logger.info("Using noise seed {}".format(seed))
+    self.seed = seed
+    if paper_id is None and self.input_directory is not None:
+      paper_id = os.path.basename(os.path.normpath(os.path.abspath(self.input_directory)))
+    self.paper_id = paper_id
+    self._paper_key = int.from_bytes(
+      hashlib.sha256(str(self.paper_id).encode('utf-8')).digest()[:8], 'little'
+    )
 
     if self.noise_types != None and len(self.noise_types) > 0:
       # Get all images located within the file
       img_files_ = self._fetch_all_images()
 
-      for _, img_fn in enumerate(img_files_):
+      for page_no, img_fn in enumerate(img_files_):
+        rng_ = self.page_rng(page_no)
+
         # Read the image file
         noised_ = cv2.imread(img_fn)
 
         for _ in range(self.num_trials):
           # Choose an noiser
-          rnd_noiser_ = self._choose_noise_type()
+          rnd_noiser_ = self._choose_noise_type(rng_)
 
           if rnd_noiser_ == 'gauss':
-            noised_ = self._gauss(noised_)
+            noised_ = self._gauss(noised_, rng_)
           if rnd_noiser_ == 'sp':
-            noised_ = self._salt_n_pepper(noised_)
+            noised_ = self._salt_n_pepper(noised_, rng_)
           if rnd_noiser_ == 'poisson':
-            noised_ = self._poisson(noised_)
+            noised_ = self._poisson(noised_, rng_)
           if rnd_noiser_ == 'speckle':
-            noised_ = self._speckle(noised_)
+            noised_ = self._speckle(noised_, rng_)
           if rnd_noiser_ == 'erode':
-            noised_ = self._erode(noised_)
+            noised_ = self._erode(noised_, rng_)
           if rnd_noiser_ == 'rotate':
-            noised_ = self._rotate(noised_)
+            noised_ = self._rotate(noised_, rng_)
 
         # Done, write image to file
         cv2.imwrite(img_fn, noised_)
@@ -84,63 +121,99 @@ class Img2NoiseConverter(object):
     for file in os.listdir(self.input_directory):
       if file.endswith(".jpg"):
         files.append(os.path.join(self.input_directory, file))
+    # The page numbers used for seeding are the positions within this list
+    files.sort()
     return files
 
-  def _choose_noise_type(self):
-    choice = rnd.choice(self.noise_types, 1)
+  def page_rng(self, page_no):
+    """
+    Returns the random generator for page `page_no` of the current paper.
+    """
+    seq = np.random.SeedSequence(self.seed, spawn_key=(self._paper_key, page_no))
+    return np.random.default_rng(seq)
+
+  def _choose_noise_type(self, rng):
+    choice = rng.choice(self.noise_types, 1)
 
     return choice[0]
 
-  def _gauss(self, img):
+  def _gauss(self, img, rng):
     row, col, ch = img.shape
     sigma = self.gauss_variance**0.5
-    gauss = rnd.normal(self.gauss_mean, sigma, (row, col, ch))
-    gauss = gauss.reshape(row, col, ch)
-    noised = img + gauss
+    noised = rng.normal(self.gauss_mean, sigma, (row, col, ch))
+    noised += img
     return noised
 
-  def _salt_n_pepper(self, img):
+  def _salt_n_pepper(self, img, rng):
     row, col, ch = img.shape
-    noised = np.copy(img)
+    noised = img
     # Salt mode
     num_salt = np.ceil(self.sp_amount * img.size * self.sp_ratio)
-    coords = [rnd.randint(0, i - 1, int(num_salt)) for i in img.shape]
+    coords = [rng.integers(0, i - 1, int(num_salt)) for i in img.shape]
 
     noised[coords[0], coords[1], :] = 255
     # Pepper mode
     num_pepper = np.ceil(self.sp_amount * img.size * (1. - self.sp_ratio))
-    coords = [rnd.randint(0, i - 1, int(num_pepper)) for i in img.shape]
+    coords = [rng.integers(0, i - 1, int(num_pepper)) for i in img.shape]
     noised[coords[0], coords[1], :] = 0
 
     return noised
 
-  def _poisson(self, img):
+  def _poisson(self, img, rng):
     vals = len(np.unique(img))
     vals = 2 ** np.ceil(np.log2(vals))
 
-    noised = rnd.poisson(img * vals) / float(vals)
+    noised = rng.poisson(img * vals) / float(vals)
 
     return noised
 
-  def _speckle(self, img):
+  def _speckle(self, img, rng):
     row, col, ch = img.shape
-    gauss = rnd.randn(row, col, ch)
-    gauss = gauss.reshape(row, col, ch)
+    noised = rng.standard_normal((row, col, ch))
 
-    noised = img + img * gauss
+    noised *= img
+    noised += img
 
     return noised
 
-  def _erode(self, img):
-    kernel = np.ones((self.erose_kernel_size, self.erose_kernel_size), np.uint8)
+  def _erode(self, img, rng):
+    kernel = self._kernel(self.erose_kernel_size)
 
-    noised = cv2.erode(img, kernel, iterations=self.erose_iterations)
+    noised = cv2.erode(img, kernel, dst=img, iterations=self.erose_iterations)
 
     return noised
 
-  def _rotate(self, img):
-    rot_angle = np.random.uniform(low=0, high=2*self.rotate_angle) - self.rotate_angle
-    noised = imutils.rotate(img, rot_angle)
-    #img.rotate(self.rotate_angle)
+  def _rotate(self, img, rng):
+    rot_angle = rng.uniform(low=0, high=2*self.rotate_angle) - self.rotate_angle
+    (h, w) = img.shape[:2]
+
+    # warpAffine can't work in-place, so we use the buffer not holding `img`
+    buffers = self._buffers.get((img.shape, img.dtype))
+    if buffers is None:
+      buffers = [np.empty_like(img), np.empty_like(img)]
+      self._buffers[(img.shape, img.dtype)] = buffers
+    dst = buffers[1] if img is buffers[0] else buffers[0]
+
+    noised = cv2.warpAffine(img, self._rotation_matrix(h, w, rot_angle), (w, h), dst=dst)
+
+    return noised
 
-    return noised
\ No newline at end of file
+  def _kernel(self, size):
+    kernel = self._kernels.get(size)
+    if kernel is None:
+      kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (size, size))
+      self._kernels[size] = kernel
+    return kernel
+
+  def _rotation_matrix(self, h, w, angle):
+    """
+    Returns the matrix rotating an image of size (h, w) by `angle` degrees
+    around its center, with the angle rounded to `rotate_angle_step`.
+    """
+    bucket = int(round(angle / self.rotate_angle_step)) if self.rotate_angle_step else angle
+    M = self._rotation_matrices.get((h, w, bucket))
+    if M is None:
+      angle = bucket * self.rotate_angle_step if self.rotate_angle_step else angle
+      M = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
+      self._rotation_matrices[(h, w, bucket)] = M
+    return M
\ No newline at end of file
@@ -96,6 +96,30 @@ def main(argv=None):
     help="The amount of degree to rotate an image."
   )
 
+  group.add_argument(
+    "--rotate-angle-step",
+    dest="rotate_angle_step",
+    type=float,
+    default=0.1,
+    help="Rotation angles are rounded to multiples of this step, so that the transforms can be cached, default: 0.1."
+  )
+
+  group.add_argument(
+    "--seed",
+    dest="seed",
+    type=int,
+    default=None,
+    help="The base seed of the noise generators. Together with the paper id and the page number it determines the noise of every page, default: random."
+  )
+
+  group.add_argument(
+    "--paper-id",
+    dest="paper_id",
+    type=str,
+    default=None,
+    help="The id of the paper used for seeding, default: name of the input directory."
+  )
+
   args = parser.parse_args()
 
   img2n = Img2NoiseConverter(
@@ -108,7 +132,10 @@ def main(argv=None):
     sp_amount=args.sp_amount,
     erose_kernel_size=args.erose_kernel_size,
     erose_iterations=args.erose_iterations,
-    rotate_angle=args.rotate_angle
+    rotate_angle=args.rotate_angle,
+    seed=args.seed,
+    paper_id=args.paper_id,
+    rotate_angle_step=args.rotate_angle_step
   )
 
 if __name__ == '__main__':
@@ -4,6 +4,17 @@
 # Markus Näther <naetherm@informatik.uni-freiburg.de>
 
 import os
+import time
+import logging
+import tempfile
+import subprocess
+import multiprocessing
+
+# The pages are recognized by several workers already, so tesseract must not
+# spawn its own threads on top. OpenMP reads the limit when tesserocr is loaded,
+# so it has to be set before the import (and is inherited by the tesseract
+# processes of pytesseract and the batch mode). An explicit setting is kept.
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
 
 try:
   from PIL import Image
@@ -11,36 +22,313 @@ except ImportError:
   import Image
 import pytesseract
 
+try:
+  import tesserocr
+except ImportError:
+  tesserocr = None
+
+logger = logging.getLogger(__name__)
+
 custom_oem_psm_config = r'--oem 0'
 
+# The combined text of all pages and its optional page index
+output_file_name = "output.txt"
+index_file_name = "output.idx"
+
+# Separator tesseract writes after every page of a multi-page input
+tesseract_page_separator = '\f'
+
+
+class OCRBackend(object):
+  """
+  Base class of all OCR backends.
+
+  A backend instance is created once per worker and then used for all pages
+  that worker is processing, so everything expensive (e.g. loading the
+  traineddata) belongs into the constructor.
+  """
+
+  name = None
+
+  def __init__(self, lang='eng'):
+    super(OCRBackend, self).__init__()
+
+    self.lang = lang
+
+  def image_to_string(self, img_fn):
+    raise NotImplementedError()
+
+  def close(self):
+    pass
+
+
+class TesserocrBackend(OCRBackend):
+  """
+  Backend talking directly to the tesseract C-API through tesserocr. The engine
+  is initialized once and reused for every page.
+  """
+
+  name = 'tesserocr'
+
+  def __init__(self, lang='eng'):
+    super(TesserocrBackend, self).__init__(lang=lang)
+
+    # Same engine mode as custom_oem_psm_config
+    self.api = tesserocr.PyTessBaseAPI(lang=lang, oem=tesserocr.OEM.TESSERACT_ONLY)
+
+  def image_to_string(self, img_fn):
+    self.api.SetImageFile(img_fn)
+    return self.api.GetUTF8Text()
+
+  def close(self):
+    self.api.End()
+
+
+class PyTesseractBackend(OCRBackend):
+  """
+  Fallback backend using pytesseract, which starts a tesseract process for
+  every single page.
+  """
+
+  name = 'pytesseract'
+
+  def image_to_string(self, img_fn):
+    return pytesseract.image_to_string(img_fn, lang=self.lang, config=custom_oem_psm_config)
+
+
+ocr_backends = {
+  TesserocrBackend.name: TesserocrBackend,
+  PyTesseractBackend.name: PyTesseractBackend,
+}
+
+
+def make_ocr_backend(backend='auto', lang='eng'):
+  """
+  Create the OCR backend `backend`. With 'auto' tesserocr is used whenever it
+  is available, otherwise (and if tesserocr was requested but is not installed)
+  we fall back to pytesseract.
+  """
+  if backend == 'auto':
+    backend = TesserocrBackend.name if tesserocr is not None else PyTesseractBackend.name
+  elif backend == TesserocrBackend.name and tesserocr is None:
+    logger.warning("tesserocr is not available, falling back to pytesseract")
+    backend = PyTesseractBackend.name
+
+  return ocr_backends[backend](lang=lang)
+
+
+# The backend of the current worker process, see _init_worker
+_worker_backend = None
+
+def _init_worker(backend, lang):
+  global _worker_backend
+
+  _worker_backend = make_ocr_backend(backend, lang)
+
+def _ocr_page(img_fn):
+  start_ = time.perf_counter()
+  text_ = _worker_backend.image_to_string(img_fn)
+  return img_fn, text_, time.perf_counter() - start_
+
+
+def tesseract_batch(img_fns, lang='eng'):
+  """
+  Recognizes all images `img_fns` with a single tesseract process, which only
+  loads its model once. The image paths are handed over in a list file and the
+  combined output is split back into one text per image.
+  """
+  with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as flist:
+    for img_fn in img_fns:
+      flist.write(os.path.abspath(img_fn) + "\n")
+
+  try:
+    proc_ = subprocess.run(
+      [pytesseract.pytesseract.tesseract_cmd, flist.name, 'stdout', '-l', lang] + custom_oem_psm_config.split(),
+      stdout=subprocess.PIPE,
+      stderr=subprocess.PIPE,
+      check=True
+    )
+  finally:
+    os.remove(flist.name)
+
+  texts_ = proc_.stdout.decode('utf-8').split(tesseract_page_separator)
+  # Every page is terminated by the separator, so there is one empty trailing chunk
+  if len(texts_) != len(img_fns) + 1:
+    raise RuntimeError(
+      "tesseract returned {} pages for {} images".format(len(texts_) - 1, len(img_fns))
+    )
+  return texts_[:-1]
+
+def _ocr_batch(args):
+  img_fns, lang = args
+  start_ = time.perf_counter()
+  texts_ = tesseract_batch(img_fns, lang)
+  # We can only measure the whole batch, so the time is split evenly over its pages
+  latency_ = (time.perf_counter() - start_) / len(img_fns)
+  return [(img_fn, text_, latency_) for img_fn, text_ in zip(img_fns, texts_)]
+
+
+def latency_percentiles(latencies, percentiles=(50, 90, 99)):
+  """
+  Returns a dictionary mapping the given percentiles to the per-page latencies
+  (in seconds) using the nearest-rank method.
+  """
+  if not latencies:
+    return {}
+
+  latencies = sorted(latencies)
+  result = {}
+  for p in percentiles:
+    rank = max(0, -(-p * len(latencies) // 100) - 1)
+    result[p] = latencies[rank]
+  return result
+
+
+def read_page_index(input_directory):
+  """
+  Reads the page index written by Img2TxtConverter and returns a list of
+  (image file name, byte offset, byte length) of all pages in output.txt.
+  """
+  index_ = []
+  with open(os.path.join(input_directory, index_file_name), 'r') as fin:
+    for line in fin:
+      img_fn, offset, length = line.rstrip("\n").split("\t")
+      index_.append((img_fn, int(offset), int(length)))
+  return index_
+
+def read_output_pages(input_directory):
+  """
+  Yields (image file name, text) for all pages of output.txt, using the page
+  index to seek to the single pages.
+  """
+  with open(os.path.join(input_directory, output_file_name), 'rb') as fin:
+    for img_fn, offset, length in read_page_index(input_directory):
+      fin.seek(offset)
+      yield img_fn, fin.read(length).decode('utf-8')
+
+
+class _NullFile(object):
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    return False
+
+  def write(self, data):
+    pass
+
+
 class Img2TxtConverter(object):
 
   def __init__(
     self,
-    input_directory
+    input_directory,
+    backend='auto',
+    lang='eng',
+    num_workers=1,
+    batch_size=None,
+    page_separator="\n",
+    write_index=False
   ):
     super(Img2TxtConverter, self).__init__()
 
     self.input_directory = input_directory
+    self.backend = backend
+    self.lang = lang
+    self.num_workers = max(1, num_workers or 1)
+    # None: recognize page by page, 0: one tesseract call for the whole paper,
+    # N: one tesseract call for every N pages
+    self.batch_size = batch_size
+
+    if self.batch_size is not None and self.backend != 'auto':
+      logger.warning("The batch mode always uses the tesseract CLI, ignoring the backend '%s'", self.backend)
 
-    # The combined text
-    self.combined_text = ""
+    # OCR latency of every page, in seconds
+    self.latencies = []
 
     # Fetch all images
     files_ = self._fetch_all_images()
 
-    for _, img_fn in enumerate(files_):
-      with open(img_fn + ".txt", 'w') as fout:
-        text_ = pytesseract.image_to_string(img_fn, config=custom_oem_psm_config)
-        fout.write(text_)
-        self.combined_text += "\n" + text_
+    if not files_:
+      logger.warning("No images found in '{}'".format(self.input_directory))
+
+    # The text of every page is appended to output.txt as soon as it is
+    # recognized, optionally together with its byte offset and length in output.idx
+    self.output_file = os.path.join(self.input_directory, output_file_name)
+    self.index_file = os.path.join(self.input_directory, index_file_name) if write_index else None
+
+    with open(self.output_file, 'wb') as fout, \
+         (open(self.index_file, 'w') if write_index else _NullFile()) as fidx:
+      separator_ = page_separator.encode('utf-8')
+      for img_fn, text_, latency_ in self._recognize(files_):
+        with open(img_fn + ".txt", 'w') as fpage:
+          fpage.write(text_)
+
+        data_ = text_.encode('utf-8')
+        fout.write(separator_)
+        offset_ = fout.tell()
+        fout.write(data_)
+        fidx.write("{}\t{}\t{}\n".format(os.path.basename(img_fn), offset_, len(data_)))
+
+        self.latencies.append(latency_)
+
+    self.num_pages = len(self.latencies)
+    self.latency_percentiles = latency_percentiles(self.latencies)
+
+  def _recognize(self, files):
+    """
+    Yields (image file, text, latency) for all `files`, in order. The pages are
+    distributed over `num_workers` processes, each of them initializing its OCR
+    engine only once.
+    """
+    if self.batch_size is not None:
+      for result in self._recognize_batched(files):
+        yield result
+      return
+
+    if self.num_workers == 1 or len(files) < 2:
+      _init_worker(self.backend, self.lang)
+      try:
+        for img_fn in files:
+          yield _ocr_page(img_fn)
+      finally:
+        _worker_backend.close()
+      return
+
+    pool = multiprocessing.Pool(
+      processes=min(self.num_workers, len(files)),
+      initializer=_init_worker,
+      initargs=(self.backend, self.lang)
+    )
+    try:
+      for result in pool.imap(_ocr_page, files):
+        yield result
+    finally:
+      pool.terminate()
+
+  def _recognize_batched(self, files):
+    """
+    Same as _recognize but calls the tesseract CLI once per batch of
+    `batch_size` pages instead of once per page.
+    """
+    batch_size_ = self.batch_size or max(1, len(files))
+    batches_ = [(files[i:i + batch_size_], self.lang) for i in range(0, len(files), batch_size_)]
 
-    dir_name_ = os.path.dirname(os.path.abspath(files_[0]))
+    if self.num_workers == 1 or len(batches_) < 2:
+      for batch_ in batches_:
+        for result in _ocr_batch(batch_):
+          yield result
+      return
 
-    with open(os.path.join(dir_name_, "output.txt"), 'w') as fout:
-      fout.write(self.combined_text)
+    pool = multiprocessing.Pool(processes=min(self.num_workers, len(batches_)))
+    try:
+      for results in pool.imap(_ocr_batch, batches_):
+        for result in results:
+          yield result
+    finally:
+      pool.terminate()
 
-  
   def _fetch_all_images(self):
     files = []
     for file in os.listdir(self.input_directory):
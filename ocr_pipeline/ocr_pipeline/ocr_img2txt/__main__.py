@@ -3,12 +3,13 @@
 # Chair of Algorithms and Data Structures.
 # Markus Näther <naetherm@informatik.uni-freiburg.de>
 
+import os
 import sys
 import fileinput
 import argparse
 import logging
 
-from ocr_pipeline.ocr_img2txt import Img2TxtConverter
+from ocr_pipeline.ocr_img2txt import Img2TxtConverter, ocr_backends
 
 def main(argv=None):
 
@@ -25,12 +26,84 @@ def main(argv=None):
 
   )
 
+  group.add_argument(
+    "--backend",
+    dest="backend",
+    choices=['auto'] + sorted(ocr_backends.keys()),
+    default='auto',
+    help="The OCR backend to use. 'auto' uses tesserocr if available and falls back to pytesseract, default: auto."
+  )
+
+  group.add_argument(
+    "--lang",
+    dest="lang",
+    type=str,
+    default='eng',
+    help="The tesseract language to use, default: eng."
+  )
+
+  group.add_argument(
+    "--num-workers",
+    dest="num_workers",
+    type=int,
+    default=os.cpu_count(),
+    help="The number of OCR worker processes, default: number of cores."
+  )
+
+  group.add_argument(
+    "--batch-size",
+    dest="batch_size",
+    type=int,
+    default=None,
+    help="Call the tesseract CLI once per batch of that many pages instead of once per page. 0 recognizes the whole paper at once. Can't be combined with --backend."
+  )
+
+  group.add_argument(
+    "--page-separator",
+    dest="page_separator",
+    type=str,
+    default="\n",
+    help="The separator written in front of every page in output.txt, default: newline."
+  )
+
+  group.add_argument(
+    "--write-index",
+    dest="write_index",
+    action='store_true',
+    default=False,
+    help="Additionally write the byte offset and length of every page in output.txt to output.idx."
+  )
+
+  group.add_argument(
+    "--report-latency",
+    dest="report_latency",
+    action='store_true',
+    default=False,
+    help="Print the per-page OCR latency percentiles."
+  )
+
   args = parser.parse_args()
 
+  if args.batch_size is not None and args.backend != 'auto':
+    parser.error("--backend can't be combined with --batch-size, which always uses the tesseract CLI.")
+
   i2t = Img2TxtConverter(
-    input_directory=args.input_directory
+    input_directory=args.input_directory,
+    backend=args.backend,
+    lang=args.lang,
+    num_workers=args.num_workers,
+    batch_size=args.batch_size,
+    page_separator=args.page_separator,
+    write_index=args.write_index
   )
 
+  if not i2t.num_pages:
+    sys.exit(1)
+
+  if args.report_latency:
+    for p, latency in sorted(i2t.latency_percentiles.items()):
+      print("p{}: {:.3f}s".format(p, latency))
+
 
 if __name__ == '__main__':
   main()
\ No newline at end of file
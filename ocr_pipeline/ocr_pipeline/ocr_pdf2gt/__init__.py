@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019-2020, University of Freiburg.
+# Chair of Algorithms and Data Structures.
+# Markus Näther <naetherm@informatik.uni-freiburg.de>
+
+"""
+Splits the ground truth of a paper (original.txt) into the pages of its
+compiled pdf, so every page image gets its own ground truth.
+
+The page boundaries are taken from pdftotext, which separates the pages of a
+pdf with a form feed. The text of a rendered page differs from the ground
+truth (math, hyphenation, page numbers), so the words around every page break
+are used as an anchor: the anchor is searched approximately (see
+:py:func:`ocr_pipeline.ocr_eval.search`) in the ground truth, within a window
+behind the end of the previous page, and the page ends where the page break
+of the anchor is aligned to within the best match. This costs time linear in
+the page length instead of aligning whole documents.
+
+For every page image <page>.jpg the ground truth is written to
+<page>.jpg.gt.txt, next to the recognized text <page>.jpg.txt, and pages.tsv
+lists the character range of every page within original.txt.
+"""
+
+import os
+import re
+import bisect
+import logging
+import subprocess
+
+from ocr_pipeline.ocr_eval import (
+  search, align, ground_truth_file_name, page_ground_truth_suffix, OP_DELETION
+)
+
+logger = logging.getLogger(__name__)
+
+pages_file_name = "pages.tsv"
+
+# Separator pdftotext writes after every page
+pdftotext_page_separator = '\f'
+
+# Number of words on either side of a page break searched in the ground truth
+default_anchor_words = 16
+
+# Ground truth searched for an anchor beyond twice the page length
+_anchor_slack = 1000
+
+_rx_word = re.compile(r'\S+')
+
+
+def pdf_page_texts(pdf_fn):
+  """
+  Returns the texts of all pages of the pdf `pdf_fn`, extracted by pdftotext.
+  """
+  proc_ = subprocess.run(
+    ['pdftotext', '-enc', 'UTF-8', pdf_fn, '-'],
+    stdout=subprocess.PIPE,
+    stderr=subprocess.PIPE,
+    check=True
+  )
+  pages_ = proc_.stdout.decode('utf-8', errors='replace').split(pdftotext_page_separator)
+  # Every page is terminated by the separator, so there is one empty trailing chunk
+  if pages_ and not pages_[-1].strip():
+    pages_.pop()
+  return pages_
+
+
+def segment_ground_truth(gt, page_texts, anchor_words=default_anchor_words):
+  """
+  Returns a list of (start, end, anchor errors) of the ranges of the ground truth
+  `gt` corresponding to the pages `page_texts`. The ranges start and end at
+  whole words and together cover all words of `gt`. The anchor errors are the
+  edit distance of the best match of the anchor (None for the last page, which
+  takes the rest of the ground truth).
+  """
+  # The anchors are searched with all whitespace collapsed. `starts_` maps the
+  # words of the collapsed text back to their positions within `gt`
+  words_ = [(m.start(), m.end()) for m in _rx_word.finditer(gt)]
+  text_ = " ".join(gt[s:e] for s, e in words_)
+  starts_ = []
+  p_ = 0
+  for s, e in words_:
+    starts_.append(p_)
+    p_ += e - s + 1
+
+  def offset(k):
+    return words_[k][0] if k < len(words_) else len(gt)
+
+  pages_words_ = [_page_words(page) for page in page_texts]
+
+  ranges = []
+  pos_ = 0
+  k_ = 0
+  for i, page_words_ in enumerate(pages_words_):
+    if i == len(pages_words_) - 1:
+      end_, errors_ = len(text_), None
+    elif not page_words_:
+      end_, errors_ = pos_, 0
+    else:
+      # The anchor spans the page break, which is where its two halves meet
+      left_ = " ".join(page_words_[-anchor_words:])
+      anchor_ = " ".join([left_] + pages_words_[i + 1][:anchor_words])
+
+      page_length_ = len(" ".join(page_words_))
+      hi_ = min(len(text_), pos_ + 2 * page_length_ + len(anchor_) + _anchor_slack)
+      # Not behind the anchor, even if the ground truth of the page is shorter
+      lo_ = pos_ + min(page_length_ // 4, (page_length_ - len(left_)) // 2)
+      lo_ = min(lo_, max(pos_, hi_ - len(anchor_) - _anchor_slack))
+
+      errors_, start_, end_ = search(anchor_, text_[lo_:hi_])
+      if errors_ > len(anchor_) // 2:
+        logger.warning("The end of page %d was not found reliably (%d errors)", i + 1, errors_)
+
+      start_ += lo_
+      end_ = start_ + _aligned_position(align(anchor_, text_[start_:lo_ + end_]), len(left_))
+
+    # The page takes the words starting before its end
+    first_, k_ = k_, max(k_, bisect.bisect_left(starts_, end_))
+    start_ = offset(first_)
+    ranges.append((start_, words_[k_ - 1][1] if k_ > first_ else start_, errors_))
+    pos_ = starts_[k_] if k_ < len(starts_) else len(text_)
+
+  return ranges
+
+
+def _page_words(page):
+  words = page.split()
+  if words and words[-1].isdigit():
+    # The page number
+    words.pop()
+  return words
+
+
+def _aligned_position(runs, pos):
+  """
+  Returns the position of the second sequence of the alignment `runs` (see
+  :py:func:`ocr_pipeline.ocr_eval.align`) aligned to position `pos` of the
+  first one.
+  """
+  i_ = j_ = 0
+  for op, a_part, b_part in runs:
+    if i_ + len(a_part) > pos:
+      return j_ + (pos - i_ if op != OP_DELETION else 0)
+    i_ += len(a_part)
+    j_ += len(b_part)
+  return j_
+
+
+def read_pages_table(directory):
+  """
+  Reads pages.tsv within `directory` and returns a dictionary mapping the page
+  images to (gt_start, gt_end, anchor errors), or an empty one if there is none.
+  """
+  fn = os.path.join(directory, pages_file_name)
+  if not os.path.isfile(fn):
+    return {}
+
+  pages_ = {}
+  with open(fn, 'r') as fin:
+    next(fin, None)
+    for line in fin:
+      img_fn, start, end, errors = line.rstrip("\n").split("\t")
+      pages_[img_fn] = (int(start), int(end), int(errors) if errors else None)
+  return pages_
+
+
+class PDF2GtConverter(object):
+
+  def __init__(
+    self,
+    input_file,
+    input_directory,
+    ground_truth_file=None,
+    anchor_words=default_anchor_words
+  ):
+    super(PDF2GtConverter, self).__init__()
+
+    self.input_file = input_file
+    self.input_directory = input_directory
+    self.ground_truth_file = ground_truth_file or os.path.join(input_directory, ground_truth_file_name)
+
+    images_ = self._fetch_all_images()
+    page_texts_ = pdf_page_texts(self.input_file)
+    if len(images_) != len(page_texts_):
+      raise ValueError("'{}' has {} pages, but there are {} images in '{}'".format(
+        self.input_file, len(page_texts_), len(images_), self.input_directory
+      ))
+
+    with open(self.ground_truth_file, 'r', encoding='utf-8') as fin:
+      gt_ = fin.read()
+
+    self.ranges = segment_ground_truth(gt_, page_texts_, anchor_words)
+
+    with open(os.path.join(self.input_directory, pages_file_name), 'w') as fpages:
+      fpages.write("page\tgt_start\tgt_end\tanchor_errors\n")
+      for img_fn, (start_, end_, errors_) in zip(images_, self.ranges):
+        with open(os.path.join(self.input_directory, img_fn + page_ground_truth_suffix), 'w', encoding='utf-8') as fout:
+          fout.write(gt_[start_:end_] + "\n")
+        fpages.write("{}\t{}\t{}\t{}\n".format(img_fn, start_, end_, "" if errors_ is None else errors_))
+
+  def _fetch_all_images(self):
+    files = []
+    for file in os.listdir(self.input_directory):
+      if file.endswith(".jpg"):
+        files.append(file)
+    files.sort()
+    return files
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019-2020, University of Freiburg.
+# Chair of Algorithms and Data Structures.
+# Markus Näther <naetherm@informatik.uni-freiburg.de>
+
+import sys
+import argparse
+import logging
+import subprocess
+
+from ocr_pipeline.ocr_pdf2gt import PDF2GtConverter, default_anchor_words
+
+def main(argv=None):
+
+  if argv is None:
+    argv = sys.argv[1:]
+
+  parser = argparse.ArgumentParser(prog="ocr_pdf2gt", add_help=False)
+
+  group = parser.add_argument_group("PDF2Gt options")
+
+  group.add_argument(
+    "--input-file",
+    dest="input_file",
+    help="The compiled pdf whose page breaks are used."
+  )
+
+  group.add_argument(
+    "--input-directory",
+    dest="input_directory",
+    help="The directory containing the page images of the pdf (and original.txt)."
+  )
+
+  group.add_argument(
+    "--ground-truth",
+    dest="ground_truth",
+    default=None,
+    help="The ground truth to split, default: original.txt within the input directory."
+  )
+
+  group.add_argument(
+    "--anchor-words",
+    dest="anchor_words",
+    type=int,
+    default=default_anchor_words,
+    help="The number of words on either side of a page break searched in the ground truth, default: {}.".format(
+      default_anchor_words
+    )
+  )
+
+  group = parser.add_argument_group("General options")
+
+  group.add_argument('-q', '--quiet', dest='logging_level', action='store_const',
+                      const=logging.ERROR, default=logging.INFO,
+                      help="Suppress warning messages")
+  group.add_argument('-v', '--verbose', dest='logging_level', action='store_const',
+                      const=logging.DEBUG,
+                      help="Verbose output")
+  group.add_argument('--help', action='help',
+                      help="Show this help information and exit")
+
+  args = parser.parse_args(argv)
+
+  logging.basicConfig()
+  logging.getLogger().setLevel(args.logging_level)
+
+  try:
+    PDF2GtConverter(
+      input_file=args.input_file,
+      input_directory=args.input_directory,
+      ground_truth_file=args.ground_truth,
+      anchor_words=args.anchor_words
+    )
+  except (OSError, ValueError, subprocess.CalledProcessError) as e:
+    logging.error("Could not split the ground truth: %s", e)
+    sys.exit(1)
+
+if __name__ == '__main__':
+  main()
@@ -3,14 +3,304 @@
 # Chair of Algorithms and Data Structures.
 # Markus Näther <naetherm@informatik.uni-freiburg.de>
 
-from pdflatex import PDFLaTeX
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import subprocess
+import concurrent.futures
+
+logger = logging.getLogger(__name__)
+
+
+# Failure categories, see classify_failure
+FAILURE_TIMEOUT = 'timeout'
+FAILURE_MISSING_PACKAGE = 'missing-package'
+FAILURE_MISSING_FILE = 'missing-file'
+FAILURE_UNDEFINED_CONTROL_SEQUENCE = 'undefined-control-sequence'
+FAILURE_OTHER = 'other'
+
+_rx_missing_file = re.compile(r"^! LaTeX Error: File `([^']*)' not found\.", re.MULTILINE)
+_rx_undefined_cs = re.compile(r"^! Undefined control sequence\.\n(.*)$", re.MULTILINE)
+_rx_last_cs = re.compile(r"(\\(?:[A-Za-z@]+|.))\s*$")
+_rx_error = re.compile(r"^! (.*)$", re.MULTILINE)
+
+
+def classify_failure(log, timed_out=False):
+  """
+  Classifies a failed compilation by its pdflatex `log`. Returns the tuple
+  (category, detail), where detail is e.g. the missing package or the
+  undefined control sequence, if known.
+  """
+  if timed_out:
+    return FAILURE_TIMEOUT, None
+
+  m = _rx_missing_file.search(log)
+  if m is not None:
+    fn = m.group(1)
+    if fn.endswith('.sty') or fn.endswith('.cls'):
+      return FAILURE_MISSING_PACKAGE, fn
+    return FAILURE_MISSING_FILE, fn
+
+  m = _rx_undefined_cs.search(log)
+  if m is not None:
+    # The undefined control sequence is the last one before the line break
+    # pdflatex inserts at the error position, on the first context line. That
+    # is the l.<n> line, or the expansion of a macro if the error is within one
+    cs = _rx_last_cs.search(m.group(1))
+    return FAILURE_UNDEFINED_CONTROL_SEQUENCE, cs.group(1) if cs is not None else None
+
+  m = _rx_error.search(log)
+  return FAILURE_OTHER, m.group(1).strip() if m is not None else None
+
+
+def source_hash(input_file, options=None):
+  """
+  Returns the hash of the contents of `input_file` and, if given, the compile
+  `options` (a JSON serializable dictionary).
+  """
+  hash_ = hashlib.sha256()
+  with open(input_file, 'rb') as fin:
+    hash_.update(fin.read())
+  if options is not None:
+    hash_.update(json.dumps(options, sort_keys=True).encode('utf-8'))
+  return hash_.hexdigest()
+
+
+class NegativeCache(object):
+  """
+  Remembers the sources which failed to compile, keyed by the hash of their
+  contents and the compile options (see source_hash). Every entry is a small JSON file in `directory`, so several
+  processes can share the same cache.
+  """
+
+  def __init__(self, directory):
+    super(NegativeCache, self).__init__()
+
+    self.directory = directory
+    if not os.path.isdir(self.directory):
+      os.makedirs(self.directory)
+
+  def _entry_file(self, key):
+    return os.path.join(self.directory, key + ".json")
+
+  def lookup(self, key):
+    """
+    Returns the recorded failure of the source with the hash `key`, or None.
+    """
+    try:
+      with open(self._entry_file(key), 'r') as fin:
+        return json.load(fin)
+    except (IOError, OSError, ValueError):
+      return None
+
+  def add(self, key, input_file, category, detail):
+    entry = {
+      'input_file': input_file,
+      'category': category,
+      'detail': detail,
+      'time': time.time(),
+    }
+    # Write atomically, others may read the cache at the same time
+    tmp_fn = self._entry_file(key) + ".{}.tmp".format(os.getpid())
+    with open(tmp_fn, 'w') as fout:
+      json.dump(entry, fout)
+    os.replace(tmp_fn, self._entry_file(key))
+
+  def entries(self):
+    for fn in os.listdir(self.directory):
+      if fn.endswith(".json"):
+        entry = self.lookup(fn[:-len(".json")])
+        if entry is not None:
+          yield entry
+
+  def stats(self):
+    """
+    Returns a dictionary mapping every failure category to the number of
+    failures and the counts of the single details (e.g. which control
+    sequences were undefined how often).
+    """
+    stats = {}
+    for entry in self.entries():
+      cat = stats.setdefault(entry['category'], {'count': 0, 'details': {}})
+      cat['count'] += 1
+      if entry['detail'] is not None:
+        cat['details'][entry['detail']] = cat['details'].get(entry['detail'], 0) + 1
+    return stats
+
+
+class CompileResult(object):
+  """
+  The outcome of a single compilation job of the LaTeXCompiler.
+  """
+
+  def __init__(self, input_file, output_file, returncode, log, elapsed, timed_out=False, failure=None, cached=False):
+    super(CompileResult, self).__init__()
+
+    self.input_file = input_file
+    self.output_file = output_file
+    self.returncode = returncode
+    self.log = log
+    self.elapsed = elapsed
+    self.timed_out = timed_out
+    # (category, detail) of a failed compilation, see classify_failure
+    self.failure = failure
+    # Whether the failure was taken from the NegativeCache without compiling
+    self.cached = cached
+
+  @property
+  def success(self):
+    return not self.cached and not self.timed_out and self.returncode == 0
+
+
+class LaTeXCompiler(object):
+  """
+  Compiles TeX files to pdf using pdflatex.
+
+  Up to `num_workers` jobs run concurrently, every one of them in its own
+  temporary output directory and limited to `timeout` seconds. If a
+  `format_file` is given (e.g. built by texfmtbuilder), all jobs start from
+  that precompiled format instead of loading the LaTeX format and the preamble
+  packages over and over again.
+
+  Failed compilations are recorded in the `negative_cache`, if given, and
+  sources known to fail are skipped right away (timeouts are retried if
+  `retry_timeouts` is set). Failures are only known for the same options,
+  i.e. pdflatex, the timeout and the format file, which is identified by its
+  path, size and modification time, so it can be rebuilt in place.
+  """
+
+  def __init__(
+    self,
+    num_workers=1,
+    timeout=60,
+    format_file=None,
+    pdflatex='pdflatex',
+    negative_cache=None,
+    retry_timeouts=False
+  ):
+    super(LaTeXCompiler, self).__init__()
+
+    self.num_workers = max(1, num_workers or 1)
+    self.timeout = timeout
+    self.format_file = format_file
+    self.pdflatex = pdflatex
+    self.negative_cache = negative_cache
+    self.retry_timeouts = retry_timeouts
+
+    self._executor = None
+
+  def compile(self, input_file, output_file):
+    """
+    Compiles `input_file` and moves the resulting pdf to `output_file`.
+    Returns a CompileResult, the pdflatex log is contained in there.
+    """
+    input_file = os.path.abspath(input_file)
+
+    key_ = None
+    if self.negative_cache is not None:
+      key_ = source_hash(input_file, self._cache_options())
+      entry_ = self.negative_cache.lookup(key_)
+      if entry_ is not None and not (self.retry_timeouts and entry_['category'] == FAILURE_TIMEOUT):
+        return CompileResult(
+          input_file, output_file, None, "", 0.0,
+          failure=(entry_['category'], entry_['detail']), cached=True
+        )
+
+    tmp_dir = tempfile.mkdtemp(prefix="tex2pdf-")
+
+    args = [self.pdflatex, '-interaction=nonstopmode', '-halt-on-error', '-output-directory=' + tmp_dir, '-jobname=job']
+    env = None
+    if self.format_file is not None:
+      fmt_dir, fmt_name = os.path.split(os.path.abspath(self.format_file))
+      args.append('-fmt=' + os.path.splitext(fmt_name)[0])
+      # The trailing separator keeps the default search path
+      env = dict(os.environ, TEXFORMATS=fmt_dir + os.pathsep)
+    args.append(input_file)
+
+    start_ = time.perf_counter()
+    timed_out_ = False
+    returncode_ = None
+    try:
+      proc_ = subprocess.run(
+        args,
+        cwd=os.path.dirname(input_file),
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        timeout=self.timeout
+      )
+      returncode_ = proc_.returncode
+    except subprocess.TimeoutExpired:
+      timed_out_ = True
+    elapsed_ = time.perf_counter() - start_
+
+    try:
+      log_ = ""
+      if os.path.exists(os.path.join(tmp_dir, "job.log")):
+        with open(os.path.join(tmp_dir, "job.log"), 'r', encoding='utf-8', errors='replace') as fin:
+          log_ = fin.read()
+
+      pdf_file_ = os.path.join(tmp_dir, "job.pdf")
+      if returncode_ == 0 and os.path.exists(pdf_file_):
+        shutil.move(pdf_file_, output_file)
+      elif returncode_ == 0:
+        # pdflatex succeeded, but did not produce any output
+        returncode_ = 1
+    finally:
+      shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    result_ = CompileResult(input_file, output_file, returncode_, log_, elapsed_, timed_out_)
+    if not result_.success:
+      result_.failure = classify_failure(log_, timed_out_)
+      if key_ is not None:
+        self.negative_cache.add(key_, input_file, *result_.failure)
+
+    return result_
+
+  def _cache_options(self):
+    """
+    Returns the options a failure in the negative cache depends on.
+    """
+    options = {'pdflatex': self.pdflatex, 'timeout': self.timeout, 'format_file': None}
+    if self.format_file is not None:
+      fmt_file_ = os.path.abspath(self.format_file)
+      try:
+        stat_ = os.stat(fmt_file_)
+        options['format_file'] = [fmt_file_, stat_.st_size, stat_.st_mtime_ns]
+      except OSError:
+        options['format_file'] = [fmt_file_, None, None]
+    return options
+
+  def compile_many(self, jobs):
+    """
+    Compiles all (input file, output file) pairs of `jobs` concurrently and
+    returns their CompileResults in the same order.
+    """
+    if self._executor is None:
+      self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.num_workers)
+
+    futures_ = [self._executor.submit(self.compile, input_file, output_file) for input_file, output_file in jobs]
+    return [f.result() for f in futures_]
+
+  def close(self):
+    if self._executor is not None:
+      self._executor.shutdown()
+      self._executor = None
+
 
 class TeX2PDFConverter(object):
 
   def __init__(
     self,
     input_file,
-    output_file
+    output_file,
+    compiler=None
   ):
     super(TeX2PDFConverter, self).__init__()
 
@@ -19,13 +309,14 @@ class TeX2PDFConverter(object):
 
     print("Writing to output file: {}".format(self.output_file))
 
+    if compiler is None:
+      compiler = LaTeXCompiler()
+
     # Create the pdf file
-    pdfl = PDFLaTeX.from_texfile(self.input_file)
-    pdf, log, _ = pdfl.create_pdf(keep_pdf_file=True)
-
-    # Save the log file
-    #with open(self.output_file + ".log", "w") as fout:
-    #  fout.write(log)
-    # Save the pdf file to disk
-    with open(self.output_file, 'wb') as fout:
-      fout.write(pdf)
\ No newline at end of file
+    self.result = compiler.compile(self.input_file, self.output_file)
+
+    if not self.result.success:
+      logger.error("Compiling '{}' failed{}: {} {}".format(
+        self.input_file, " (cached)" if self.result.cached else "",
+        self.result.failure[0], self.result.failure[1] or ""
+      ))
@@ -8,7 +8,7 @@ import fileinput
 import argparse
 import logging
 
-from ocr_pipeline.ocr_tex2pdf import TeX2PDFConverter
+from ocr_pipeline.ocr_tex2pdf import TeX2PDFConverter, LaTeXCompiler, NegativeCache
 
 def main(argv=None):
 
@@ -22,22 +22,103 @@ def main(argv=None):
   group.add_argument(
     '--input-file', type=str,
     dest='input_file',
-    help="The TeX file to compile via pdflatex."
+    nargs='+',
+    help="The TeX file(s) to compile via pdflatex."
   )
   group.add_argument(
     '--output-file', type=str,
     dest='output_file',
-    help="The filename of the pdf file to save."
+    nargs='+',
+    help="The filename(s) of the pdf file(s) to save, one for every input file."
+  )
+
+  group = parser.add_argument_group("Compilation options")
+
+  group.add_argument(
+    '--num-workers', type=int,
+    dest='num_workers',
+    default=1,
+    help="The number of files to compile concurrently, default: 1."
+  )
+  group.add_argument(
+    '--timeout', type=float,
+    dest='timeout',
+    default=60,
+    help="Abort the compilation of a file after that many seconds, default: 60."
+  )
+  group.add_argument(
+    '--format-file', type=str,
+    dest='format_file',
+    default=None,
+    help="A precompiled format file (e.g. built by texfmtbuilder) to start all compilations from."
+  )
+
+  group.add_argument(
+    '--negative-cache', type=str,
+    dest='negative_cache',
+    default=None,
+    help="Directory of the cache of failed compilations. Sources which are known to fail are skipped."
+  )
+  group.add_argument(
+    '--retry-timeouts',
+    dest='retry_timeouts',
+    action='store_true',
+    default=False,
+    help="Compile sources again which are in the negative cache because of a timeout."
+  )
+  group.add_argument(
+    '--cache-stats',
+    dest='cache_stats',
+    action='store_true',
+    default=False,
+    help="Only print the statistics of the negative cache (failure categories, most frequent missing packages and undefined control sequences) and exit."
   )
 
   args = parser.parse_args()
 
-  # Create the tex2pdf converter instance, this means that it will also 
-  # create the pdf and save it to disk (including the log for debugging purposes)
-  tex2pdf = TeX2PDFConverter(
-    input_file=args.input_file,
-    output_file=args.output_file
+  negative_cache = NegativeCache(args.negative_cache) if args.negative_cache is not None else None
+
+  if args.cache_stats:
+    if negative_cache is None:
+      parser.error("--cache-stats requires --negative-cache.")
+    for category, stats in sorted(negative_cache.stats().items(), key=lambda x: -x[1]['count']):
+      print("{}: {}".format(category, stats['count']))
+      for detail, count in sorted(stats['details'].items(), key=lambda x: -x[1])[:20]:
+        print("  {:>6}  {}".format(count, detail))
+    return
+
+  if args.input_file is None or args.output_file is None or len(args.input_file) != len(args.output_file):
+    parser.error("Expecting the same number of input and output files.")
+
+  compiler = LaTeXCompiler(
+    num_workers=args.num_workers,
+    timeout=args.timeout,
+    format_file=args.format_file,
+    negative_cache=negative_cache,
+    retry_timeouts=args.retry_timeouts
   )
 
+  if len(args.input_file) == 1:
+    # Create the tex2pdf converter instance, this means that it will also 
+    # create the pdf and save it to disk
+    tex2pdf = TeX2PDFConverter(
+      input_file=args.input_file[0],
+      output_file=args.output_file[0],
+      compiler=compiler
+    )
+    results = [tex2pdf.result]
+  else:
+    results = compiler.compile_many(zip(args.input_file, args.output_file))
+    compiler.close()
+
+    for r in results:
+      if not r.success:
+        logging.error("Compiling '{}' failed{}: {} {}".format(
+          r.input_file, " (cached)" if r.cached else "", r.failure[0], r.failure[1] or ""
+        ))
+
+  if not all(r.success for r in results):
+    sys.exit(1)
+
 if __name__ == '__main__':
   main()
\ No newline at end of file
@@ -49,8 +49,11 @@ setup(
     "console_scripts": [
       "ocr_tex2pdf=ocr_pipeline.ocr_tex2pdf.__main__:main",
       "ocr_pdf2img=ocr_pipeline.ocr_pdf2img.__main__:main",
+      "ocr_pdf2gt=ocr_pipeline.ocr_pdf2gt.__main__:main",
       "ocr_img2noise=ocr_pipeline.ocr_img2noise.__main__:main",
-      "ocr_img2txt=ocr_pipeline.ocr_img2txt.__main__:main"
+      "ocr_img2txt=ocr_pipeline.ocr_img2txt.__main__:main",
+      "ocr_eval=ocr_pipeline.ocr_eval.__main__:main",
+      "ocr_export=ocr_pipeline.ocr_export.__main__:main"
     ]
 
   },
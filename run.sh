@@ -12,7 +12,9 @@ mkdir -p ${OUT}/arxiv/tars
 mkdir -p ${OUT}/arxiv/noise
 
 SIM_OUT=${OUT}/arxiv/noise
+FMT_OUT=${OUT}/arxiv/fmt
 TAR_OUT=${OUT}/arxiv/tars
+SHARD_OUT=${OUT}/arxiv/shards
 
 # If there is already a paper_ids.txt we don't fetch the list of all papers
 if [ ! -r ${DATA}/arxiv/paper_ids.txt ]
@@ -40,6 +42,10 @@ do
   fi
 done
 
+# Build the precompiled format for the fixed preamble of the simplified documents
+mkdir -p ${FMT_OUT}
+FMT_FILE=$(texfmtbuilder --letter-spacing 56 --output-dir=${FMT_OUT})
+
 # Now start the simplification process, loop through all entries in $TAR_OUT
 GCount=0
 for entry in $(find ${TAR_OUT} -mindepth 1 -maxdepth 1 -type d)
@@ -52,59 +58,54 @@ do
     FILENAME=$(basename -- "$entry")
     FILENAME="${FILENAME%.*}"
     
-    # Find the tex file
-    i=0
-    while read line
-    do
-      array[ $i ]="$line"
-      ((i++))
-    done < <(find -name "*.tex")
-    TEX_LIST=$array #$(find -name "*.tex")
-
-    echo "LENGTH: ${#TEX_LIST[@]} -> ${TEX_LIST}"
-
-    # TODO(naetherm): Find *.tex file that contains documentclass
+    # Find the root document, all files it references are inlined by texflatten
+    ROOT_TEX=$(texflatten --print-root ${entry})
 
-    if [[ ${i} == 1 ]]
+    if [[ -n ${ROOT_TEX} ]]
     then
-      echo "For directory '${entry}' will compile the file '${TEX_LIST[0]}'"
-      #TEX_FILES=$(echo ${TEX_LIST} | cut -d$'\n' -f1-)
+      echo "For directory '${entry}' will compile the file '${ROOT_TEX}'"
       # And create a simplified version
       {
         {
         mkdir -p ${SIM_OUT}/${FILENAME}
         OUT_DIR=${SIM_OUT}/${FILENAME}
 
-        iconv -t UTF-8 ${TEX_LIST[0]} > ${OUT_DIR}/original.tex
+        texflatten --source-map=${OUT_DIR}/source_map.json ${entry} | iconv -t UTF-8 > ${OUT_DIR}/original.tex
 
-        pdflatex -halt-on-error -interaction=nonstopmode -output-directory=${OUT_DIR}  ${TEX_LIST[0]}
+        # Check that the flattened paper compiles, pdflatex is only run if that
+        # can't be decided from the source (and for a small sample to track the
+        # agreement). Graphics and packages are still found in the source tree
+        texvalidator --fallback-compile --verify-rate=0.01 --stats-file=${OUT}/arxiv/validation_stats.json --input-directory=${entry} ${OUT_DIR}/original.tex
 
-        #cp ${TEX_LIST[0]} ${OUT_DIR}/original.tex
       } && {
-        timeout 10 texsimplifier --letter-spacing 56 ${OUT_DIR}/original.tex > ${OUT_DIR}/simplified.tex
-
-        cp ${OUT_DIR}/simplified.tex ${OUT_DIR}/simplified_temp.tex
+        timeout 10 texsimplifier --letter-spacing 56 --precompiled-format --deps-file=${OUT_DIR}/simplified.deps.json --output-file=${OUT_DIR}/simplified.tex ${OUT_DIR}/original.tex
 
         # Extract PDF to PPM
-        tex2text ${OUT_DIR}/simplified.tex > ${OUT_DIR}/original_temp.txt
-        textpostwork --input-file=${OUT_DIR}/original_temp.txt --output-file=${OUT_DIR}/original.txt
-        rm ${OUT_DIR}/simplified_temp.tex ${OUT_DIR}/original_temp.txt
+        tex2text ${OUT_DIR}/simplified.tex | textpostwork --output-file=${OUT_DIR}/original.txt
       } && {
 
         # Compile PDF
-        ocr_tex2pdf --input-file=${OUT_DIR}/simplified.tex --output-file=${OUT_DIR}/simplified.pdf
+        ocr_tex2pdf --input-file=${OUT_DIR}/simplified.tex --output-file=${OUT_DIR}/simplified.pdf --format-file=${FMT_FILE} --negative-cache=${OUT}/arxiv/tex2pdf_failures
       } && {
 
         # Extract PDF to PPM
         ocr_pdf2img --input-file=${OUT_DIR}/simplified.pdf --output-dir=${OUT_DIR}/
       } && {
 
+        # Split the ground truth into the pages
+        ocr_pdf2gt --input-file=${OUT_DIR}/simplified.pdf --input-directory=${OUT_DIR}/
+      } && {
+
         # Generate noise
         ocr_img2noise --input-directory=${OUT_DIR}/ --noise-types gauss erode sp rotate
       } && {
 
         # And generate the text
         ocr_img2txt --input-directory=${OUT_DIR}/
+      } && {
+
+        # Pack the outputs into the dataset shards
+        ocr_export --output-prefix=${SHARD_OUT}/arxiv --with-sources ${OUT_DIR}/
         ((GCount++))
       }
       } || {
@@ -115,4 +116,7 @@ do
   fi
 done
 
-echo "Generated the output for ${GCount} now"
\ No newline at end of file
+echo "Generated the output for ${GCount} now"
+
+echo "Evaluating the OCR output ..."
+ocr_eval --page-table=${OUT}/arxiv/eval_pages.tsv --output-file=${OUT}/arxiv/eval_papers.tsv ${SIM_OUT}/*/
\ No newline at end of file
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019-2020, University of Freiburg.
+# Chair of Algorithms and Data Structures.
+# Markus Näther <naetherm@informatik.uni-freiburg.de>
+
+"""
+Microbenchmark of the macro argument parsers for the most common macros of
+arXiv papers:
+
+  python benchmarks/bench_argparsers.py --repeat 20000
+"""
+
+import sys
+import time
+import argparse
+
+from texparser import texwalker
+
+
+# Macro invocations as they typically appear in papers
+samples = [
+  ('cite', r"\cite{smith2019,doe2020}"),
+  ('cite', r"\cite[Thm.~2]{smith2019}"),
+  ('ref', r"\ref{fig:overview}"),
+  ('textbf', r"\textbf{important}"),
+  ('section', r"\section{Introduction}"),
+  ('section', r"\section*{Acknowledgments}"),
+  ('section', r"\section[Short]{A much longer title}"),
+]
+
+
+def bench_parse_args(repeat):
+  """
+  Time of a single parse_args() call for every sample.
+  """
+  for macroname, latex in samples:
+    w = texwalker.LatexWalker(latex)
+    parsing_state = w.make_parsing_state()
+    spec = parsing_state.latex_context.get_macro_spec(macroname)
+    pos = len(macroname) + 1
+
+    start_ = time.perf_counter()
+    for _ in range(repeat):
+      spec.parse_args(w=w, pos=pos, parsing_state=parsing_state)
+    elapsed_ = (time.perf_counter() - start_) / repeat
+
+    print("{:<40} {:>8.2f} us".format(latex, 1e6 * elapsed_))
+
+
+def bench_document(repeat):
+  """
+  Time to parse a paragraph made up of all samples.
+  """
+  latex = "\n".join("Some text {} and more text.".format(latex) for _, latex in samples) * 50
+
+  start_ = time.perf_counter()
+  for _ in range(max(1, repeat // 1000)):
+    texwalker.LatexWalker(latex).get_latex_nodes()
+  elapsed_ = (time.perf_counter() - start_) / max(1, repeat // 1000)
+
+  print("{:<40} {:>8.2f} ms".format("document ({} chars)".format(len(latex)), 1e3 * elapsed_))
+
+
+def main(argv=None):
+
+  if argv is None:
+    argv = sys.argv[1:]
+
+  parser = argparse.ArgumentParser(prog="bench_argparsers")
+
+  parser.add_argument("--repeat", dest="repeat", type=int, default=10000)
+
+  args = parser.parse_args(argv)
+
+  bench_parse_args(args.repeat)
+  bench_document(args.repeat)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019-2020, University of Freiburg.
+# Chair of Algorithms and Data Structures.
+# Markus Näther <naetherm@informatik.uni-freiburg.de>
+
+"""
+Conversion time of LatexNodes2Text and LatexSimplifier over a sample of the
+corpus (the documents are parsed once, only the conversion is measured):
+
+  python benchmarks/bench_convert.py /output/arxiv/tex/*/main.tex --repeat 3
+
+Without input files, a synthetic paper-like document is used.
+"""
+
+import sys
+import time
+import argparse
+
+from texparser import texwalker
+from texparser.tex2text import LatexNodes2Text
+from texparser.texsimplifier import LatexSimplifier
+
+
+synthetic_paragraph = r"""
+\section{Results}\label{sec:results}
+% The numbers are taken from the first run
+We show in Fig.~\ref{fig:overview} that the method of \cite{smith2019,doe2020}
+converges with rate $\mathcal{O}(n^{-1/2})$ for all $\epsilon > 0$, see
+\begin{equation}
+  \| x_{k+1} - x^* \| \leq \frac{C}{\sqrt{k}} \left( 1 + \sum_{i=1}^{k} \alpha_i \right) .
+\end{equation}
+\begin{itemize}
+  \item[(a)] \textbf{first}, \emph{second}; \item third {\em group}.
+\end{itemize}
+"""
+
+
+def main(argv=None):
+
+  if argv is None:
+    argv = sys.argv[1:]
+
+  parser = argparse.ArgumentParser(prog="bench_convert")
+
+  parser.add_argument("files", metavar="FILE", nargs='*')
+  parser.add_argument("--repeat", dest="repeat", type=int, default=3)
+
+  args = parser.parse_args(argv)
+
+  documents = []
+  for filename in args.files:
+    with open(filename, 'r', encoding='utf-8', errors='replace') as fin:
+      documents.append(fin.read())
+  if not documents:
+    documents.append(synthetic_paragraph * 200)
+
+  nodelists = [texwalker.LatexWalker(latex).get_latex_nodes()[0] for latex in documents]
+  num_chars = sum(len(latex) for latex in documents)
+
+  converters = [
+    ('LatexNodes2Text', lambda: LatexNodes2Text(), 'nodelist_to_text'),
+    ('LatexSimplifier', lambda: LatexSimplifier(), 'nodelist_to_simplified'),
+  ]
+
+  print("{} documents, {} chars".format(len(documents), num_chars))
+  for name, make_converter, method in converters:
+    converter = make_converter()
+    convert = getattr(converter, method)
+
+    best_ = None
+    for _ in range(args.repeat):
+      start_ = time.perf_counter()
+      for nodelist in nodelists:
+        convert(nodelist)
+      elapsed_ = time.perf_counter() - start_
+      best_ = elapsed_ if best_ is None else min(best_, elapsed_)
+
+    print("{:<16} {:>8.3f}s {:>10.0f} chars/s".format(name, best_, num_chars / best_))
+
+
+if __name__ == '__main__':
+  main()
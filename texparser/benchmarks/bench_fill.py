@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019-2020, University of Freiburg.
+# Chair of Algorithms and Data Structures.
+# Markus Näther <naetherm@informatik.uni-freiburg.de>
+
+"""
+Throughput of util.fill_text compared to the textwrap based filling it
+replaces in do_fill_text, on the paragraphs of text files (e.g. the output of
+tex2text):
+
+  python benchmarks/bench_fill.py /output/arxiv/noise/*/original.txt --width 72
+
+Without input files, synthetic paragraphs are used. Both variants have to
+produce the same lines.
+"""
+
+import sys
+import time
+import random
+import argparse
+import textwrap
+
+from texparser.utils import util
+
+
+def synthetic_paragraphs(count, seed=0):
+  rnd_ = random.Random(seed)
+  words_ = ["the", "method", "converges", "with", "rate", "for", "all", "well-known", "results",
+            "see", "[REF]", "[CIT.]", "[MATH]", "e.g.", "non-trivial", "eigenvalue", "a", "of"]
+  return [
+    " ".join(rnd_.choice(words_) for _ in range(rnd_.randint(5, 400)))
+    for _ in range(count)
+  ]
+
+
+def textwrap_fill(text, width, initial_col):
+  return textwrap.fill(text, width, initial_indent='X'*initial_col)[initial_col:]
+
+
+def main(argv=None):
+
+  if argv is None:
+    argv = sys.argv[1:]
+
+  parser = argparse.ArgumentParser(prog="bench_fill")
+
+  parser.add_argument("files", metavar="FILE", nargs='*')
+  parser.add_argument("--width", dest="width", type=int, default=80)
+  parser.add_argument("--repeat", dest="repeat", type=int, default=3)
+
+  args = parser.parse_args(argv)
+
+  paragraphs = []
+  for filename in args.files:
+    with open(filename, 'r', encoding='utf-8', errors='replace') as fin:
+      paragraphs.extend(p.strip() for p in fin.read().split("\n\n") if p.strip())
+  if not paragraphs:
+    paragraphs = synthetic_paragraphs(2000)
+
+  # Vary the initial column as do_fill_text does after inline macros
+  jobs = [(p, i % (args.width - 4)) for i, p in enumerate(paragraphs)]
+  num_chars = sum(len(p) for p in paragraphs)
+
+  for p, col in jobs:
+    if util.fill_text(p, args.width, col) != textwrap_fill(p, args.width, col):
+      print("Mismatch for paragraph {!r} at column {}".format(p[:40], col))
+      sys.exit(1)
+
+  print("{} paragraphs, {} chars, width {}".format(len(paragraphs), num_chars, args.width))
+  for name, fill in [('textwrap', textwrap_fill), ('fill_text', util.fill_text)]:
+    best_ = None
+    for _ in range(args.repeat):
+      start_ = time.perf_counter()
+      for p, col in jobs:
+        fill(p, args.width, col)
+      elapsed_ = time.perf_counter() - start_
+      best_ = elapsed_ if best_ is None else min(best_, elapsed_)
+
+    print("{:<10} {:>8.3f}s {:>12.0f} chars/s".format(name, best_, num_chars / best_))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019-2020, University of Freiburg.
+# Chair of Algorithms and Data Structures.
+# Markus Näther <naetherm@informatik.uni-freiburg.de>
+
+"""
+Token throughput of LatexWalker.get_token() on a LaTeX document (or on a
+synthetic paper-like document if none is given):
+
+  python benchmarks/bench_tokenizer.py [--input-file paper.tex] --repeat 5
+"""
+
+import sys
+import time
+import argparse
+
+from texparser import texwalker
+
+
+synthetic_paragraph = r"""
+\section{Results}\label{sec:results}
+% The numbers are taken from the first run
+We show in Fig.~\ref{fig:overview} that the method of \cite{smith2019,doe2020}
+converges with rate $\mathcal{O}(n^{-1/2})$ for all $\epsilon > 0$, see
+\begin{equation}
+  \| x_{k+1} - x^* \| \leq \frac{C}{\sqrt{k}} \left( 1 + \sum_{i=1}^{k} \alpha_i \right) .
+\end{equation}
+\begin{itemize}
+  \item[(a)] \textbf{first}, \emph{second}; \item third.
+\end{itemize}
+"""
+
+
+def count_tokens(latex):
+  w = texwalker.LatexWalker(latex, tolerant_parsing=True)
+  brackets_ = [('[', ']')]
+  pos_ = 0
+  num_tokens_ = 0
+  while True:
+    try:
+      # Alternate between the plain and the bracket brace configuration, as
+      # the parser does when it looks for optional arguments
+      tok = w.get_token(pos_, include_brace_chars=brackets_ if num_tokens_ % 2 else None)
+    except texwalker.LatexWalkerEndOfStream:
+      break
+    pos_ = tok.pos + tok.len
+    num_tokens_ += 1
+  return num_tokens_
+
+
+def main(argv=None):
+
+  if argv is None:
+    argv = sys.argv[1:]
+
+  parser = argparse.ArgumentParser(prog="bench_tokenizer")
+
+  parser.add_argument("--input-file", dest="input_file", default=None)
+  parser.add_argument("--repeat", dest="repeat", type=int, default=5)
+
+  args = parser.parse_args(argv)
+
+  if args.input_file is not None:
+    with open(args.input_file, 'r', encoding='utf-8', errors='replace') as fin:
+      latex = fin.read()
+  else:
+    latex = synthetic_paragraph * 200
+
+  best_ = None
+  for _ in range(args.repeat):
+    start_ = time.perf_counter()
+    num_tokens_ = count_tokens(latex)
+    elapsed_ = time.perf_counter() - start_
+    best_ = elapsed_ if best_ is None else min(best_, elapsed_)
+
+  print("{} chars, {} tokens, {:.3f}s, {:.0f} tokens/s".format(
+    len(latex), num_tokens_, best_, num_tokens_ / best_
+  ))
+
+
+if __name__ == '__main__':
+  main()
@@ -70,8 +70,12 @@ setup(
             'texwalker=texparser.texwalker.__main__:main',
             'tex2text=texparser.tex2text.__main__:main',
             'texsimplifier=texparser.texsimplifier.__main__:main',
+            'texfmtbuilder=texparser.texsimplifier.__main__:fmtbuilder_main',
+            'texresimplify=texparser.texsimplifier.__main__:resimplify_main',
             'texmacroexpander=texparser.texmacroexpander.__main__:main',
             'textpostwork=texparser.textpostwork.__main__:main',
+            'texvalidator=texparser.texvalidator.__main__:main',
+            'texflatten=texparser.texproject.__main__:main',
         ],
     },
     install_requires = [],
@@ -0,0 +1,47 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from texparser.texvalidator import LatexValidator, VERDICT_OK, VERDICT_FAIL
+
+
+class TestLatexValidator(unittest.TestCase):
+
+    def setUp(self):
+        self.input_directory = tempfile.mkdtemp()
+        with open(os.path.join(self.input_directory, 'fig.png'), 'wb') as fout:
+            fout.write(b'')
+
+    def tearDown(self):
+        shutil.rmtree(self.input_directory)
+
+    def validate(self, body, preamble=''):
+        latex = ("\\documentclass{article}\n\\usepackage{graphicx}\n" + preamble +
+                 "\\begin{document}\n" + body + "\n\\end{document}\n")
+        return LatexValidator().validate(latex, self.input_directory)
+
+    def test_includegraphics_in_newcommand(self):
+        result = self.validate(r'\fig{fig}',
+                               preamble='\\newcommand{\\fig}[1]{\\includegraphics[width=3cm]{#1}}\n')
+        self.assertEqual(result.verdict, VERDICT_OK, result.reasons)
+
+    def test_input_in_newcommand(self):
+        result = self.validate('', preamble='\\newcommand{\\inc}[1]{\\input{#1}}\n')
+        self.assertEqual(result.verdict, VERDICT_OK, result.reasons)
+
+    def test_input_in_def(self):
+        result = self.validate('', preamble='\\def\\inc#1{\\input{#1}}\n')
+        self.assertEqual(result.verdict, VERDICT_OK, result.reasons)
+
+    def test_missing_graphics(self):
+        result = self.validate(r'\includegraphics{nofig}')
+        self.assertEqual(result.verdict, VERDICT_FAIL)
+
+    def test_usepackage_with_comments(self):
+        result = self.validate('', preamble='\\usepackage{amsmath,% math\n  amssymb}\n')
+        self.assertEqual(result.verdict, VERDICT_OK, result.reasons)
+
+
+if __name__ == '__main__':
+    unittest.main()
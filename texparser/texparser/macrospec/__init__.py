@@ -440,6 +440,9 @@ class LatexContextDb(object):
         self.unknown_environment_spec = None
         self.unknown_specials_spec = None
 
+        # first char -> specials candidates, see test_for_specials()
+        self._specials_by_first_char = None
+
         
     def add_context_category(self, category, macros=[], environments=[], specials=[],
                              prepend=False, insert_before=None, insert_after=None):
@@ -503,6 +506,7 @@ class LatexContextDb(object):
             'environments': dict( (e.environmentname, e) for e in environments ),
             'specials': dict( (s.specials_chars, s) for s in specials ),
         }
+        self._specials_by_first_char = None
         
     def set_unknown_macro_spec(self, macrospec):
         r"""
@@ -601,17 +605,32 @@ class LatexContextDb(object):
         Returns a specials spec instance, or `None` if no specials are detected
         at the position `pos`.
         """
+        if self._specials_by_first_char is None:
+            self._specials_by_first_char = self._build_specials_table()
+
+        candidates = self._specials_by_first_char.get(s[pos:pos+1])
+        if not candidates:
+            return None
+
         best_match_len = 0
         best_match_s = None
-        for cat in self.category_list:
-            # search categories in the given order
-            for specials_chars in self.d[cat]['specials'].keys():
-                if len(specials_chars) > best_match_len and s.startswith(specials_chars, pos):
-                    best_match_s = self.d[cat]['specials'][specials_chars]
-                    best_match_len = len(specials_chars)
+        for specials_chars, spec in candidates:
+            if len(specials_chars) > best_match_len and s.startswith(specials_chars, pos):
+                best_match_s = spec
+                best_match_len = len(specials_chars)
 
         return best_match_s # this is None if no match
 
+    def _build_specials_table(self):
+        # Groups all specials by their first char, keeping the order in which
+        # test_for_specials() has to try them (categories in the given order)
+        table = {}
+        for cat in self.category_list:
+            for specials_chars, spec in self.d[cat]['specials'].items():
+                if specials_chars:
+                    table.setdefault(specials_chars[0], []).append( (specials_chars, spec) )
+        return table
+
     def iter_macro_specs(self, categories=None):
         r"""
         Yield the macro specs corresponding to all macros in the given categories.
@@ -219,11 +219,71 @@ class MacroStandardArgsParser(object):
                 "argspec must be a string containing chars '*', '[', '{{' only: {!r}"
                 .format(self.argspec)
             )
+        if self.args_math_mode is not None and \
+           len(self.args_math_mode) != len(self.argspec):
+            raise ValueError("Invalid args_math_mode={!r} for argspec={!r}!"
+                             .format(self.args_math_mode, self.argspec))
         # non-documented attribute that makes us ignore any leading '*'.  We use
         # this to emulate pylatexenc 1.x behavior when using the MacrosDef()
         # function explicitly
         self._like_pylatexenc1x_ignore_leading_star = False
 
+        # the argspec is compiled once into a tuple of steps, see
+        # _compile_argspec()
+        self._steps = self._compile_argspec()
+
+    def _compile_argspec(self):
+        # Returns a tuple of `(step, math_mode)` pairs, one for each character of
+        # the argspec.  Each `step` is one of the bound `_parse_arg_*()` methods
+        # below, and `math_mode` is the corresponding item of `args_math_mode`.
+        # parse_args() then only has to run these steps one after another,
+        # instead of interpreting the argspec again on every macro invocation.
+        parse_optional = self._parse_arg_optional_no_space \
+                         if self.optional_arg_no_space else self._parse_arg_optional
+        step_for = {
+            '{': self._parse_arg_mandatory,
+            '[': parse_optional,
+            '*': self._parse_arg_star,
+        }
+        args_math_mode = self.args_math_mode
+        if args_math_mode is None:
+            args_math_mode = [None]*len(self.argspec)
+        return tuple( (step_for[argt], amm)
+                      for argt, amm in zip(self.argspec, args_math_mode) )
+
+    # Each step reads a single argument at position `p` and returns a tuple
+    # `(node, p)` with the parsed node (or `None`) and the position after it.
+
+    def _parse_arg_mandatory(self, w, p, parsing_state):
+        (node, np, nl) = w.get_latex_expression(p, False, parsing_state)
+        return (node, np + nl)
+
+    def _parse_arg_optional(self, w, p, parsing_state):
+        optarginfotuple = w.get_latex_maybe_optional_arg(p, parsing_state)
+        if optarginfotuple is None:
+            return (None, p)
+        (node, np, nl) = optarginfotuple
+        return (node, np + nl)
+
+    def _parse_arg_optional_no_space(self, w, p, parsing_state):
+        if w.s[p].isspace():
+            # don't try to read optional arg, we don't allow space
+            return (None, p)
+        return self._parse_arg_optional(w, p, parsing_state)
+
+    def _parse_arg_star(self, w, p, parsing_state):
+        from texparser import texwalker
+
+        # possible star.
+        tok = w.get_token(p)
+        if tok.tok == 'char' and tok.arg.startswith('*'):
+            # has star
+            node = w.make_node(texwalker.LatexCharsNode,
+                               parsing_state=parsing_state,
+                               chars='*', pos=tok.pos, len=1)
+            return (node, tok.pos + 1)
+        return (None, p)
+
     def parse_args(self, w, pos, parsing_state=None):
         r"""
         Parse the arguments encountered at position `pos` in the
@@ -258,28 +318,11 @@ class MacroStandardArgsParser(object):
           to continue parsing stuff at the index `pos+len` in the string.
         """
 
-        from texparser import texwalker
-
         if parsing_state is None:
             parsing_state = w.make_parsing_state()
 
         argnlist = []
 
-        if self.args_math_mode is not None and \
-           len(self.args_math_mode) != len(self.argspec):
-            raise ValueError("Invalid args_math_mode={!r} for argspec={!r}!"
-                             .format(self.args_math_mode, self.argspec))
-
-        def get_inner_parsing_state(j):
-            if self.args_math_mode is None:
-                return parsing_state
-            amm = self.args_math_mode[j]
-            if amm is None or amm == parsing_state.in_math_mode:
-                return parsing_state
-            if amm == True:
-                return parsing_state.sub_context(in_math_mode=True)
-            return parsing_state.sub_context(in_math_mode=False)
-
         p = pos
 
         if self._like_pylatexenc1x_ignore_leading_star:
@@ -288,52 +331,13 @@ class MacroStandardArgsParser(object):
             if tok.tok == 'char' and tok.arg == '*':
                 p = tok.pos + tok.len
 
-        for j, argt in enumerate(self.argspec):
-            if argt == '{':
-                (node, np, nl) = w.get_latex_expression(
-                    p,
-                    strict_braces=False,
-                    parsing_state=get_inner_parsing_state(j)
-                )
-                p = np + nl
-                argnlist.append(node)
-
-            elif argt == '[':
-
-                if self.optional_arg_no_space and w.s[p].isspace():
-                    # don't try to read optional arg, we don't allow space
-                    argnlist.append(None)
-                    continue
-
-                optarginfotuple = w.get_latex_maybe_optional_arg(
-                    p,
-                    parsing_state=get_inner_parsing_state(j)
-                )
-                if optarginfotuple is None:
-                    argnlist.append(None)
-                    continue
-                (node, np, nl) = optarginfotuple
-                p = np + nl
-                argnlist.append(node)
-
-            elif argt == '*':
-                # possible star.
-                tok = w.get_token(p)
-                if tok.tok == 'char' and tok.arg.startswith('*'):
-                    # has star
-                    argnlist.append(
-                        w.make_node(texwalker.LatexCharsNode,
-                                    parsing_state=get_inner_parsing_state(j),
-                                    chars='*', pos=tok.pos, len=1)
-                    )
-                    p = tok.pos + 1
-                else:
-                    argnlist.append(None)
-
+        in_math_mode = parsing_state.in_math_mode
+        for step, amm in self._steps:
+            if amm is None or amm == in_math_mode:
+                (node, p) = step(w, p, parsing_state)
             else:
-                raise LatexWalkerError(
-                    "Unknown macro argument kind for macro: {!r}".format(argt)
-                )
+                (node, p) = step(w, p, parsing_state.sub_context(in_math_mode=amm))
+            argnlist.append(node)
 
         parsed = ParsedMacroArgs(
             argspec=self.argspec,
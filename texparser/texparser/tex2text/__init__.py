@@ -49,7 +49,6 @@ import re
 import logging
 import sys
 import inspect
-import textwrap
 
 if sys.version_info.major >= 3:
     def unicode(string): return string
@@ -62,9 +61,14 @@ import texparser
 from texparser import texwalker
 from texparser import macrospec
 from texparser.utils import util
+from texparser.utils.profiler import PHASE_CONVERT
+from texparser.utils.inputcache import LatexInputCache
 
 logger = logging.getLogger(__name__)
 
+# Paragraph breaks of the text filled by do_fill_text()
+_rx_paragraph_breaks = re.compile(r'\n{2,}')
+
 
 
 class MacroTextSpec(object):
@@ -571,6 +575,9 @@ class LatexNodes2Text(object):
       number of characters or 80 by default.  The fill is by far not perfect,
       but the resulting text might be slightly more readable.
 
+    - `profiler`: If set to a :py:class:`texparser.utils.profiler.ParseProfiler`
+      instance, the counts and times of all converted nodes are recorded in it.
+
     - `strict_latex_spaces=True|False`: If set to `True`, then we follow closely
       LaTeX's handling of whitespace.  For instance, whitespace following a bare
       macro (i.e. w/o any delimiting characters like '{') is consumed/removed.
@@ -706,6 +713,8 @@ class LatexNodes2Text(object):
 
         self.tex_input_directory = None
         self.strict_input = True
+        self.latex_walker_init_args = {}
+        self.input_cache = LatexInputCache()
 
         if 'keep_inline_math' in flags:
             if 'math_mode' in flags:
@@ -732,6 +741,22 @@ class LatexNodes2Text(object):
         self.keep_braced_groups_minlen = flags.pop('keep_braced_groups_minlen', 2)
 
         self.fill_text = flags.pop('fill_text', None)
+
+        # node kind -> conversion method, see node_to_text().  Chars nodes are
+        # handled separately as they need the text column.
+        self._node_kind_to_text = {
+            texwalker.NODE_COMMENT: self.comment_node_to_text,
+            texwalker.NODE_GROUP: self.group_node_to_text,
+            texwalker.NODE_MACRO: self.macro_node_to_text,
+            texwalker.NODE_ENVIRONMENT: self.environment_node_to_text,
+            texwalker.NODE_SPECIALS: self.specials_node_to_text,
+            texwalker.NODE_MATH: self.math_node_to_text,
+        }
+
+        # opt-in instrumentation, see texparser.utils.profiler
+        self.profiler = flags.pop('profiler', None)
+        if self.profiler is not None:
+            self.node_to_text = self.profiler.wrap_node_method(PHASE_CONVERT, self.node_to_text)
         if not self.fill_text: # None, 0, False, or false-ish
             self.fill_text = None
         if self.fill_text is True: # exactly boolean true, not an int
@@ -752,7 +777,7 @@ class LatexNodes2Text(object):
         
 
     def set_tex_input_directory(self, tex_input_directory, latex_walker_init_args=None,
-                                strict_input=True):
+                                strict_input=True, input_cache=None):
         """
         Set where to look for input files when encountering the ``\\input`` or
         ``\\include`` macro.
@@ -772,10 +797,20 @@ class LatexNodes2Text(object):
         flags passed to the constructor of
         :py:class:`pylatexenc.latexwalker.LatexWalker` when parsing the input
         file.
+
+        Input files are looked up, read and parsed only once, see
+        :py:class:`texparser.utils.inputcache.LatexInputCache`.  Specify
+        `input_cache` to share an existing cache (e.g. with another converter
+        working on the same document), in which case the other arguments are
+        taken from the cache.
         """
-        self.tex_input_directory = tex_input_directory
-        self.latex_walker_init_args = latex_walker_init_args if latex_walker_init_args else {}
-        self.strict_input = strict_input
+        if input_cache is None:
+            input_cache = LatexInputCache(tex_input_directory, strict_input=strict_input,
+                                          latex_walker_init_args=latex_walker_init_args)
+        self.input_cache = input_cache
+        self.tex_input_directory = input_cache.tex_input_directory
+        self.latex_walker_init_args = input_cache.latex_walker_init_args
+        self.strict_input = input_cache.strict_input
 
 
 
@@ -804,37 +839,7 @@ class LatexNodes2Text(object):
         contents (or generate a warning or raise an error).
         """
 
-        if self.tex_input_directory is None:
-            return ''
-
-        fnfull = os.path.realpath(os.path.join(self.tex_input_directory, fn))
-        if self.strict_input:
-            # make sure that the input file is strictly within dirfull, and didn't escape with
-            # '../..' tricks or via symlinks.
-            dirfull = os.path.realpath(self.tex_input_directory)
-            if not fnfull.startswith(dirfull):
-                logger.warning(
-                    "Can't access path '%s' leading outside of mandated directory [strict input mode]",
-                    fn
-                )
-                return ''
-
-        if not os.path.exists(fnfull) and os.path.exists(fnfull + '.tex'):
-            fnfull = fnfull + '.tex'
-        if not os.path.exists(fnfull) and os.path.exists(fnfull + '.latex'):
-            fnfull = fnfull + '.latex'
-        if not os.path.isfile(fnfull):
-            logger.warning(u"Error, file doesn't exist: '%s'", fn)
-            return ''
-        
-        logger.debug("Reading input file %r", fnfull)
-
-        try:
-            with open(fnfull) as f:
-                return f.read()
-        except IOError as e:
-            logger.warning(u"Error, can't access '%s': %s", fn, e)
-            return ''
+        return self.input_cache.read(fn)
 
 
     def _input_node_simplify_repl(self, n):
@@ -845,15 +850,18 @@ class LatexNodes2Text(object):
         if len(n.nodeargs) != 1:
             logger.warning(u"Expected exactly one argument for '\\input' ! Got = %r", n.nodeargs)
 
-        inputtex = self.read_input_file(self.nodelist_to_text([n.nodeargs[0]]).strip())
+        # Only an overridden read_input_file() has to be asked for the contents
+        read_input_file = None
+        if type(self).read_input_file is not LatexNodes2Text.read_input_file:
+            read_input_file = self.read_input_file
+
+        inputnodes = self.input_cache.parse(self.nodelist_to_text([n.nodeargs[0]]).strip(),
+                                            read_input_file)
 
-        if not inputtex:
+        if not inputnodes:
             return ''
 
-        return self.nodelist_to_text(
-            texwalker.LatexWalker(inputtex, **self.latex_walker_init_args)
-            .get_latex_nodes()[0]
-        )
+        return self.nodelist_to_text(inputnodes)
 
 
     def latex_to_text(self, latex, **parse_flags):
@@ -887,7 +895,7 @@ class LatexNodes2Text(object):
         s = ''
         prev_node = None
         for node in nodelist:
-            if self._is_bare_macro_node(prev_node) and node.isNodeType(texwalker.LatexCharsNode):
+            if self._is_bare_macro_node(prev_node) and node.nodekind == texwalker.NODE_CHARS:
                 if not self.strict_latex_spaces['between-macro-and-chars']:
                     # after a macro with absolutely no arguments, include
                     # post_space in output by default if there are other chars
@@ -924,26 +932,13 @@ class LatexNodes2Text(object):
         # ### It doesn't look like we use prev_node_hint at all.  Eliminate at
         # ### some point?
         
-        if node.isNodeType(texwalker.LatexCharsNode):
+        kind = node.nodekind
+        if kind == texwalker.NODE_CHARS:
             return self.chars_node_to_text(node, textcol=textcol)
-        
-        if node.isNodeType(texwalker.LatexCommentNode):
-            return self.comment_node_to_text(node)
-        
-        if node.isNodeType(texwalker.LatexGroupNode):
-            return self.group_node_to_text(node)
-        
-        if node.isNodeType(texwalker.LatexMacroNode):
-            return self.macro_node_to_text(node)
-        
-        if node.isNodeType(texwalker.LatexEnvironmentNode):
-            return self.environment_node_to_text(node)
-
-        if node.isNodeType(texwalker.LatexSpecialsNode):
-            return self.specials_node_to_text(node)
 
-        if node.isNodeType(texwalker.LatexMathNode):
-            return self.math_node_to_text(node)
+        kind_to_text = self._node_kind_to_text.get(kind)
+        if kind_to_text is not None:
+            return kind_to_text(node)
 
         logger.warning("LatexNodes2Text.node_to_text(): Unknown node: %r", node)
 
@@ -1133,28 +1128,22 @@ class LatexNodes2Text(object):
     def do_fill_text(self, text, textcol=0):
         # keep trailing whitespace to have whitespace between macros in text as
         # in "see \ref{...} and blah blah"
-        head_ws = re.search(r'^\s*', text).group()
+        head_ws = text[:len(text) - len(text.lstrip())]
         head_par = '\n\n' if ('\n\n' in head_ws) else ''
-        #head_nl = '\n' if (not head_par and '\n' in head_ws) else ''
-        trail_ws = re.search(r'\s*$', text).group()
+        trail_ws = text[len(text.rstrip()):]
         trail_par = '\n\n' if ('\n\n' in trail_ws) else ''
-        #trail_nl = '\n' if (not trail_par and '\n' in trail_ws) else ''
         text = text.strip()
+        width = self.fill_text
         def fill_chunk(x, textcol):
-            #head_ws = ' ' if textcol>0 and x[0:1].isspace() else ''
-            #trail_ws = ' ' if x[-1:].isspace() else ''
-            head_ws, trail_ws = '', ''
             x = x.strip()
-            if textcol >= self.fill_text-4:
-                return '\n' + textwrap.fill(x, self.fill_text) + trail_ws
+            if textcol >= width-4:
+                return '\n' + util.fill_text(x, width)
             else:
-                return head_ws + \
-                    textwrap.fill(x, self.fill_text, initial_indent='X'*textcol)[textcol:] + \
-                    trail_ws
+                return util.fill_text(x, width, textcol)
         return head_par + (' ' if textcol>0 and head_ws and not head_par else '') + "\n\n".join(
             chunk
             for chunk in (fill_chunk(x, textcol if j==0 else 0)
-                          for j, x in enumerate(re.compile(r'\n{2,}').split(text)))
+                          for j, x in enumerate(_rx_paragraph_breaks.split(text)))
             if chunk.strip()
         ) + (' ' if trail_ws and not trail_par else '') + trail_par
 
@@ -1168,23 +1157,23 @@ class LatexNodes2Text(object):
         represent the macro/environment/specials arguments.  The argument `what`
         is used in error messages.
         """
-        if callable(simplify_repl):
-            if 'l2tobj' in getfullargspec(simplify_repl)[0]:
+        info = util.get_simplify_repl_info(simplify_repl)
+
+        if info.is_callable:
+            if info.pass_l2tobj:
                 # callable accepts an argument named 'l2tobj', provide pointer to self
                 r = simplify_repl(node, l2tobj=self)
             else:
                 r = simplify_repl(node)
             return r if r else '' # don't return None
 
-        if '%' in simplify_repl:
+        if info.is_format:
             nodeargs = []
             if node.nodeargd and node.nodeargd.argnlist:
                 nodeargs = node.nodeargd.argnlist
 
-            has_percent_s = re.search('(^|[^%])(%%)*%s', simplify_repl)
-
             if node.isNodeType(texwalker.LatexEnvironmentNode):
-                if has_percent_s:
+                if info.percent_s:
                     x = (self.nodelist_to_text(node.nodelist), ) # nodelist_to_latex
                 else:
                     x = dict(
@@ -1193,7 +1182,7 @@ class LatexNodes2Text(object):
                         )
                     )
                     x.update(body=self.nodelist_to_text(node.nodelist)) # nodelist_to_latex
-            elif has_percent_s:
+            elif info.percent_s:
                 x = tuple([self._groupnodecontents_to_text(nn)
                            for nn in nodeargs])
             else:
@@ -1221,7 +1210,7 @@ class LatexNodes2Text(object):
 
     def _is_bare_macro_node(self, node):
         return (node is not None and
-                node.isNodeType(texwalker.LatexMacroNode) and 
+                node.nodekind == texwalker.NODE_MACRO and
                 node.nodeoptarg is None and 
                 len(node.nodeargs) == 0)
 
@@ -32,6 +32,7 @@ import logging
 from texparser import texwalker
 from texparser.texmacroexpander import TexMacroExpander
 from texparser.tex2text import LatexNodes2Text, _strict_latex_spaces_predef
+from texparser.utils.profiler import ParseProfiler, PHASE_PARSE, PHASE_CONVERT
 from texparser.version import version_str
 
 
@@ -125,6 +126,10 @@ def main(argv=None):
                        help="Only apply --keep-braced-groups to groups that contain at least "
                        "this many characters")
 
+    group.add_argument('--input-directory', metavar="DIR", dest='input_directory', default=None,
+                       help="Where to look for files referenced by \\input and \\include "
+                       "(default: they are not followed)")
+
     group = parser.add_argument_group("General options")
 
     group.add_argument('-q', '--quiet', dest='logging_level', action='store_const',
@@ -136,6 +141,9 @@ def main(argv=None):
     group.add_argument('--version', action='version',
                        version='pylatexenc {}'.format(version_str),
                        help="Show version information and exit")
+    group.add_argument('--profile-report', metavar="FILE", dest='profile_report', default=None,
+                       help="Record the counts and times per node type, macro and environment "
+                       "and write them as JSON to FILE")
     group.add_argument('--help', action='help',
                        help="Show this help information and exit")
 
@@ -172,20 +180,43 @@ def main(argv=None):
     else:
         fill_text = None
 
+    profiler = ParseProfiler() if args.profile_report else None
+
     lw = texwalker.LatexWalker(latex,
                                  tolerant_parsing=args.tolerant_parsing,
-                                 strict_braces=args.strict_braces)
+                                 strict_braces=args.strict_braces,
+                                 profiler=profiler)
 
+    start = ParseProfiler.clock()
     (nodelist, pos, len_) = lw.get_latex_nodes()
+    if profiler is not None:
+        profiler.add_document(PHASE_PARSE, ParseProfiler.clock() - start)
 
     ln2t = LatexNodes2Text(math_mode=args.math_mode,
                            keep_comments=args.keep_comments,
                            strict_latex_spaces=args.strict_latex_spaces,
                            keep_braced_groups=args.keep_braced_groups,
                            keep_braced_groups_minlen=args.keep_braced_groups_minlen,
-                           fill_text=fill_text)
+                           fill_text=fill_text,
+                           profiler=profiler)
+
+    if args.input_directory is not None:
+        ln2t.set_tex_input_directory(
+            args.input_directory,
+            latex_walker_init_args=dict(tolerant_parsing=args.tolerant_parsing,
+                                        strict_braces=args.strict_braces)
+        )
+
+    start = ParseProfiler.clock()
+    text = ln2t.nodelist_to_text(nodelist)
+    if profiler is not None:
+        profiler.add_document(PHASE_CONVERT, ParseProfiler.clock() - start)
+
+    print(text + "\n")
 
-    print(ln2t.nodelist_to_text(nodelist) + "\n")
+    if profiler is not None:
+        profiler.documents += 1
+        profiler.write(args.profile_report)
 
 
 
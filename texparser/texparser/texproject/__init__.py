@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019-2020, University of Freiburg.
+# Chair of Algorithms and Data Structures.
+# Markus Näther <naetherm@informatik.uni-freiburg.de>
+
+r"""
+Loads LaTeX projects consisting of several files, e.g. an arXiv source bundle.
+
+:py:class:`LatexProject` detects the root document of a directory and flattens
+it into a single source, by replacing every ``\input``, ``\include`` and
+``\subfile`` with the contents of the referenced file. The references are found
+through :py:class:`LatexWalker`, so commented out ones are left alone. The
+:py:class:`SourceMap` of the flattened source maps every position back to the
+original file and offset.
+"""
+
+import os
+import re
+import json
+import bisect
+import logging
+
+from texparser import texwalker
+from texparser.utils.inputcache import LatexInputCache
+
+logger = logging.getLogger(__name__)
+
+
+# Names of the root document, in order of preference, if several files qualify
+preferred_root_names = ['main.tex', 'ms.tex', 'paper.tex', 'article.tex']
+
+# Macros which are replaced by the contents of the file they reference
+input_macros = frozenset(['input', 'include', 'subfile'])
+
+_rx_documentclass = re.compile(r'^[^%\n]*?\\documentclass\s*(?:\[[^\]]*\])?\s*\{\s*([^}\s]*)\s*\}', re.MULTILINE)
+_rx_begin_document = re.compile(r'^[^%\n]*?\\begin\s*\{document\}', re.MULTILINE)
+# File name of an '\input file' without braces
+_rx_bare_filename = re.compile(r'[^\s{}%\\]+')
+
+
+class SourceMap(object):
+  r"""
+  Maps positions of a flattened source back to the original files.
+
+  The source is covered by segments (out_start, length, filename, src_start),
+  sorted by their position in the flattened source. The filename of text
+  inserted by the flattener itself (e.g. the ``\clearpage`` of ``\include``)
+  is None.
+  """
+
+  def __init__(self, segments=None):
+    super(SourceMap, self).__init__()
+
+    self.segments = []
+    self._starts = []
+    for segment in segments or []:
+      self.add(*segment)
+
+  def add(self, out_start, length, filename, src_start):
+    if not length:
+      return
+
+    if self.segments:
+      last_start, last_length, last_filename, last_src_start = self.segments[-1]
+      if last_filename == filename and filename is not None and \
+        last_start + last_length == out_start and last_src_start + last_length == src_start:
+        # Continues the last segment
+        self.segments[-1] = (last_start, last_length + length, filename, last_src_start)
+        return
+
+    self.segments.append((out_start, length, filename, src_start))
+    self._starts.append(out_start)
+
+  def extend(self, other, offset):
+    """
+    Appends all segments of the SourceMap `other`, shifted by `offset`.
+    """
+    for out_start, length, filename, src_start in other.segments:
+      self.add(out_start + offset, length, filename, src_start)
+
+  def lookup(self, pos):
+    """
+    Returns the tuple (filename, offset) of position `pos` of the flattened
+    source, or (None, None) if it was inserted by the flattener.
+    """
+    i = bisect.bisect_right(self._starts, pos) - 1
+    if i < 0:
+      return None, None
+
+    out_start, length, filename, src_start = self.segments[i]
+    if filename is None or pos >= out_start + length:
+      return None, None
+    return filename, src_start + (pos - out_start)
+
+  def to_json_object(self):
+    return {
+      'segments': [list(segment) for segment in self.segments],
+    }
+
+  def write(self, filename):
+    with open(filename, 'w') as fout:
+      json.dump(self.to_json_object(), fout)
+
+  @classmethod
+  def load(cls, filename):
+    with open(filename, 'r') as fin:
+      return cls([tuple(segment) for segment in json.load(fin)['segments']])
+
+
+class FlattenedSource(object):
+  """
+  The result of :py:meth:`LatexProject.flatten`.
+
+  .. py:attribute:: text
+
+      The flattened source.
+
+  .. py:attribute:: source_map
+
+      The :py:class:`SourceMap` of `text`.
+
+  .. py:attribute:: files
+
+      The files which were inlined, relative to the project directory, the root
+      file first.
+  """
+
+  def __init__(self, text, source_map, files):
+    super(FlattenedSource, self).__init__()
+
+    self.text = text
+    self.source_map = source_map
+    self.files = files
+
+
+class LatexProject(object):
+  """
+  The LaTeX project within `directory`, see the module documentation.
+
+  The root document is `root_file` (relative to `directory`), or detected by
+  :py:meth:`find_root_files` if not given. All files are read and parsed
+  through the :py:class:`LatexInputCache` `input_cache` (by default one reading
+  utf-8, with undecodable bytes preserved as surrogates), so every file is only
+  read and parsed once, and each file is flattened only once no matter how
+  often it is included.
+  """
+
+  def __init__(self, directory, root_file=None, input_cache=None):
+    super(LatexProject, self).__init__()
+
+    self.directory = directory
+    self._root_file = root_file
+
+    if input_cache is None:
+      input_cache = LatexInputCache(directory, encoding='utf-8', errors='surrogateescape')
+    self.input_cache = input_cache
+
+    self._dirfull = os.path.realpath(directory)
+    # (full path, subfile?) -> (text, source map) of the flattened file
+    self._flattened = {}
+
+  def tex_files(self):
+    """
+    Returns all .tex files within the project directory, relative to it.
+    """
+    tex_files = []
+    for dirpath, dirnames, filenames in os.walk(self.directory):
+      dirnames.sort()
+      for fn in sorted(filenames):
+        if fn.lower().endswith('.tex'):
+          tex_files.append(os.path.relpath(os.path.join(dirpath, fn), self.directory))
+    return tex_files
+
+  def find_root_files(self):
+    r"""
+    Returns the candidates for the root document, the most likely first.
+
+    Candidates have a ``\documentclass`` (which is not 'subfiles'). Those with a
+    ``\begin{document}`` come first, followed by the preferred names (see
+    `preferred_root_names`) and finally the larger files.
+    """
+    candidates = []
+    for fn in self.tex_files():
+      text = self.input_cache.read(fn)
+      m = _rx_documentclass.search(text)
+      if m is None or m.group(1) == 'subfiles':
+        continue
+
+      has_document = _rx_begin_document.search(text) is not None
+      name = os.path.basename(fn).lower()
+      preference = preferred_root_names.index(name) if name in preferred_root_names else len(preferred_root_names)
+      candidates.append((not has_document, preference, -len(text), fn))
+
+    return [candidate[-1] for candidate in sorted(candidates)]
+
+  @property
+  def root_file(self):
+    if self._root_file is None:
+      candidates = self.find_root_files()
+      if candidates:
+        self._root_file = candidates[0]
+    return self._root_file
+
+  def flatten(self):
+    """
+    Returns the :py:class:`FlattenedSource` of the root document, or None if
+    there is none.
+    """
+    if self.root_file is None:
+      return None
+
+    files = []
+    flattened = self._flatten_file(self.root_file, 'input', frozenset(), files)
+    if flattened is None:
+      return None
+
+    text, source_map = flattened
+    return FlattenedSource(text, source_map, files)
+
+  def _flatten_file(self, fn, macroname, visiting, files):
+    fnfull = self.input_cache.resolve(fn)
+    if fnfull is None:
+      return None
+    if fnfull in visiting:
+      logger.warning("Not including '%s' recursively", fn)
+      return None
+
+    relname = os.path.relpath(fnfull, self._dirfull)
+    if relname not in files:
+      files.append(relname)
+
+    key = (fnfull, macroname == 'subfile')
+    flattened = self._flattened.get(key)
+    if flattened is not None:
+      return flattened
+
+    text = self.input_cache.read(fn)
+    nodelist = self.input_cache.parse(fn) or []
+
+    start, end = 0, len(text)
+    if macroname == 'subfile':
+      # Subfiles are complete documents on their own, only their body counts
+      start, end = _document_body_range(nodelist, start, end)
+
+    builder = _FlattenedBuilder()
+    p = start
+
+    for node, name, node_end in _iter_input_macros(nodelist, text):
+      if node.pos < p or node_end > end:
+        continue
+
+      included = self._flatten_file(name, node.macroname, visiting | frozenset([fnfull]), files)
+      if included is None:
+        # Keep the macro itself, it can't be resolved
+        continue
+
+      builder.append(text[p:node.pos], relname, p)
+      if node.macroname == 'include':
+        builder.append("\\clearpage\n")
+      builder.append_flattened(*included)
+      if node.macroname == 'include':
+        builder.append("\n\\clearpage\n")
+      p = node_end
+
+    builder.append(text[p:end], relname, p)
+
+    flattened = builder.result()
+    self._flattened[key] = flattened
+    return flattened
+
+
+class _FlattenedBuilder(object):
+
+  def __init__(self):
+    super(_FlattenedBuilder, self).__init__()
+
+    self.pieces = []
+    self.source_map = SourceMap()
+    self.length = 0
+
+  def append(self, piece, filename=None, src_start=None):
+    self.pieces.append(piece)
+    self.source_map.add(self.length, len(piece), filename, src_start)
+    self.length += len(piece)
+
+  def append_flattened(self, text, source_map):
+    self.pieces.append(text)
+    self.source_map.extend(source_map, self.length)
+    self.length += len(text)
+
+  def result(self):
+    return "".join(self.pieces), self.source_map
+
+
+def _iter_input_macros(nodelist, text):
+  r"""
+  Yields the tuples (node, filename, end) of all ``\input``, ``\include`` and
+  ``\subfile`` macros within `nodelist`, in document order, where `end` is the
+  position of `text` right after the macro and its argument.
+  """
+  for node in _iter_nodes(nodelist):
+    if node.nodekind != texwalker.NODE_MACRO or node.macroname not in input_macros:
+      continue
+
+    if node.nodeargd is None or not node.nodeargd.argnlist or node.nodeargd.argnlist[-1] is None:
+      continue
+
+    arg = node.nodeargd.argnlist[-1]
+    if arg.nodekind == texwalker.NODE_GROUP:
+      name = text[arg.pos + 1:arg.pos + arg.len - 1].strip()
+      end = arg.pos + arg.len
+    else:
+      # '\input file': the parser only took the first char of the name
+      m = _rx_bare_filename.match(text, arg.pos)
+      if m is None:
+        continue
+      name = m.group(0)
+      end = m.end()
+
+    if name:
+      yield node, name, end
+
+
+def _iter_nodes(nodelist):
+  for node in nodelist:
+    if node is None:
+      continue
+    yield node
+    if node.nodekind == texwalker.NODE_MACRO and node.macroname in input_macros:
+      continue
+    if getattr(node, 'nodeargd', None) is not None and node.nodeargd.argnlist:
+      for argnode in _iter_nodes(node.nodeargd.argnlist):
+        yield argnode
+    if getattr(node, 'nodelist', None):
+      for subnode in _iter_nodes(node.nodelist):
+        yield subnode
+
+
+def _document_body_range(nodelist, start, end):
+  """
+  Returns the range within the document environment of `nodelist`, or (start,
+  end) if there is none.
+  """
+  for node in nodelist:
+    if node is not None and node.nodekind == texwalker.NODE_ENVIRONMENT and \
+      node.environmentname == 'document':
+      if not node.nodelist:
+        return node.pos, node.pos
+      last = node.nodelist[-1]
+      return node.nodelist[0].pos, last.pos + last.len
+  return start, end
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019-2020, University of Freiburg.
+# Chair of Algorithms and Data Structures.
+# Markus Näther <naetherm@informatik.uni-freiburg.de>
+
+import os
+import sys
+import argparse
+import logging
+
+from texparser.texproject import LatexProject
+
+def main(argv=None):
+
+  if argv is None:
+    argv = sys.argv[1:]
+
+  parser = argparse.ArgumentParser(prog='texflatten', add_help=False)
+
+  group = parser.add_argument_group("Flattening options")
+
+  group.add_argument('--root', dest='root', default=None,
+                     help="The root document, relative to DIRECTORY. default: detected automatically.")
+  group.add_argument('--print-root', dest='print_root', action='store_true',
+                     help="Only print the path of the root document (nothing if there is none) and exit.")
+  group.add_argument('--output-file', dest='output_file', default=None,
+                     help="Write the flattened source to this file. default: standard output.")
+  group.add_argument('--source-map', dest='source_map', default=None,
+                     help="Write the source map of the flattened source as JSON to this file.")
+
+  group = parser.add_argument_group("General options")
+
+  group.add_argument('-q', '--quiet', dest='logging_level', action='store_const',
+                      const=logging.ERROR, default=logging.INFO,
+                      help="Suppress warning messages")
+  group.add_argument('-v', '--verbose', dest='logging_level', action='store_const',
+                      const=logging.DEBUG,
+                      help="Verbose output")
+  group.add_argument('--help', action='help',
+                      help="Show this help information and exit")
+
+  parser.add_argument('directory', metavar="DIRECTORY",
+                      help='The directory containing the LaTeX project')
+
+  args = parser.parse_args(argv)
+
+  logging.basicConfig()
+  logging.getLogger().setLevel(args.logging_level)
+
+  project = LatexProject(args.directory, root_file=args.root)
+
+  if args.print_root:
+    if project.root_file is not None:
+      print(os.path.join(args.directory, project.root_file))
+    return
+
+  flattened = project.flatten()
+  if flattened is None:
+    logging.error("No root document found in '%s'", args.directory)
+    sys.exit(1)
+
+  logging.debug("Flattened %s", ", ".join(flattened.files))
+
+  # Undecodable bytes were kept as surrogates, write them back unchanged
+  data = flattened.text.encode('utf-8', errors='surrogateescape')
+  if args.output_file is not None:
+    with open(args.output_file, 'wb') as fout:
+      fout.write(data)
+  else:
+    sys.stdout.buffer.write(data)
+
+  if args.source_map is not None:
+    flattened.source_map.write(args.source_map)
+
+if __name__ == '__main__':
+  main()
@@ -26,7 +26,7 @@ import re
 import logging
 import sys
 import inspect
-import textwrap
+import subprocess
 from string import ascii_letters
 
 if sys.version_info.major >= 3:
@@ -40,9 +40,15 @@ import texparser
 from texparser import texwalker
 from texparser import macrospec
 from texparser.utils import util
+from texparser.utils.profiler import PHASE_CONVERT
+from texparser.utils.inputcache import LatexInputCache
+from texparser.utils.specdeps import KIND_MACRO, KIND_ENVIRONMENT, KIND_SPECIALS
 
 logger = logging.getLogger(__name__)
 
+# Paragraph breaks of the text filled by do_fill_text()
+_rx_paragraph_breaks = re.compile(r'\n{2,}')
+
 
 
 
@@ -190,20 +196,95 @@ def raise_l2t_unknown_latex(n):
   raise ValueError("Unknown latex construct: '{}'".format(n.latex_verbatim()))
 
 
+# Switches all font families to typewriter, see the sim_typewriter flag
+_sim_typewriter_preamble = (
+  "\\renewcommand{\\familydefault}{cmtt}\n"
+  "\\renewcommand{\\rmdefault}{cmtt}\n"
+  "\\renewcommand{\\sfdefault}{cmtt}\n"
+  "\\renewcommand{\\bfdefault}{m}\n"
+  "\\renewcommand{\\itdefault}{n}\n"
+  "\\renewcommand{\\sldefault}{n}\n"
+  "\\renewcommand{\\scdefault}{n}\n"
+)
+
+
+# The point up to which mylatexformat dumps (and later skips) the preamble. The
+# first \endofdump is inside braces and thus not seen when skipping.
+_endofdump = "\\providecommand{\\endofdump}{}\n\\endofdump\n"
+
+
+def precompiled_format_name(letter_spacing=51, sim_typewriter=False):
+  """
+  Returns the name of the precompiled format matching the given configuration,
+  see :py:func:`build_precompiled_format`.
+  """
+  return "simplified-ls{}{}".format(letter_spacing, "-tt" if sim_typewriter else "")
+
+
+def fixed_preamble(letter_spacing=51, sim_typewriter=False):
+  """
+  Returns the part of the preamble that is the same for every document
+  simplified with the given configuration.
+  """
+  preamble = "\\documentclass{article}\n" + \
+             "\\usepackage[letterspace="+str(letter_spacing)+"]{microtype}\n"
+
+  if sim_typewriter:
+    preamble += _sim_typewriter_preamble
+
+  return preamble
+
+
+def build_precompiled_format(output_directory, letter_spacing=51, sim_typewriter=False, pdflatex='pdflatex'):
+  """
+  Dumps the format file for the given configuration into `output_directory`,
+  using mylatexformat. Documents simplified with `precompiled_format` set start
+  with a matching ``%&<format>`` line; pdflatex then loads the format instead of
+  the fixed preamble and skips everything up to ``\\endofdump``.
+  Returns the path of the format file.
+  """
+  name = precompiled_format_name(letter_spacing, sim_typewriter)
+  output_directory = os.path.abspath(output_directory)
+
+  preamble_fn = os.path.join(output_directory, name + ".tex")
+  with open(preamble_fn, 'w', encoding='utf-8') as fout:
+    fout.write(fixed_preamble(letter_spacing, sim_typewriter))
+    fout.write(_endofdump + "\\begin{document}\n\\end{document}\n")
+
+  subprocess.run(
+    [
+      pdflatex, '-ini', '-interaction=nonstopmode', '-jobname=' + name,
+      '-output-directory=' + output_directory,
+      '&pdflatex', 'mylatexformat.ltx', preamble_fn
+    ],
+    cwd=output_directory,
+    stdin=subprocess.DEVNULL,
+    stdout=subprocess.PIPE,
+    stderr=subprocess.STDOUT,
+    check=True
+  )
+
+  return os.path.join(output_directory, name + ".fmt")
+
+
 def fmt_replace_documentclass(envnode, l2tobj):
   if envnode.nodeargd and envnode.nodeargd.argnlist:
     a = envnode.nodeargd.argnlist
+
+  letter_spacing = getattr(l2tobj, 'letter_spacing', 51)
+  sim_typewriter = getattr(l2tobj, "sim_typewriter", False)
+
+  if getattr(l2tobj, 'precompiled_format', None):
+    # The fixed preamble is part of the format, everything up to the dump point
+    # is skipped when compiling with it. Without the format \endofdump is
+    # simply defined as a no-op.
+    return fixed_preamble(letter_spacing, sim_typewriter) + _endofdump + "\\lsstyle\n"
+
   new_dc = "\\documentclass{article}\n" + \
-           "\\usepackage[letterspace="+str(getattr(l2tobj, 'letter_spacing', 51))+"]{microtype}\n\\lsstyle\n"
-
-  if getattr(l2tobj, "sim_typewriter", False):
-    new_dc += "\\renewcommand{\\familydefault}{cmtt}\n"
-    new_dc += "\\renewcommand{\\rmdefault}{cmtt}\n"
-    new_dc += "\\renewcommand{\\sfdefault}{cmtt}\n"
-    new_dc += "\\renewcommand{\\bfdefault}{m}\n"
-    new_dc += "\\renewcommand{\\itdefault}{n}\n"
-    new_dc += "\\renewcommand{\\sldefault}{n}\n"
-    new_dc += "\\renewcommand{\\scdefault}{n}\n"
+           "\\usepackage[letterspace="+str(letter_spacing)+"]{microtype}\n\\lsstyle\n"
+
+  if sim_typewriter:
+    new_dc += _sim_typewriter_preamble
   
   #logger.warning("\n"*20)
   #logger.warning("Replacing documentclass: {}".format(new_dc))
@@ -500,6 +581,8 @@ class LatexSimplifier(object):
 
     self.tex_input_directory = None
     self.strict_input = True
+    self.latex_walker_init_args = {}
+    self.input_cache = LatexInputCache()
 
     # Keep math?
     self.math_mode = flags.pop('math_mode', 'text')
@@ -514,23 +597,65 @@ class LatexSimplifier(object):
 
     self.fill_text = flags.pop('fill_text', None)
 
+    # (kind, name) of all specs looked up so far, see texparser.utils.specdeps
+    self.used_specs = set()
+
+    # node kind -> conversion method, see node_to_text().  Chars nodes are
+    # handled separately as they need the text column.
+    self._node_kind_to_text = {
+      texwalker.NODE_COMMENT: self.comment_node_to_text,
+      texwalker.NODE_GROUP: self.group_node_to_text,
+      texwalker.NODE_MACRO: self.macro_node_to_text,
+      texwalker.NODE_ENVIRONMENT: self.environment_node_to_text,
+      texwalker.NODE_SPECIALS: self.specials_node_to_text,
+      texwalker.NODE_MATH: self.math_node_to_text,
+    }
+
+    # opt-in instrumentation, see texparser.utils.profiler
+    self.profiler = flags.pop('profiler', None)
+    if self.profiler is not None:
+      self.node_to_text = self.profiler.wrap_node_method(PHASE_CONVERT, self.node_to_text)
+
     self.letter_spacing = flags.pop('letter_spacing', 51)
     self.sim_typewriter = flags.pop('sim_typewriter', False)
     self.remove_title = flags.pop('remove_title', False)
     self.no_abstract = flags.pop('no_abstract', False)
+    # Name of the precompiled format (see build_precompiled_format) the output
+    # is meant to be compiled with, None to emit the full preamble
+    self.precompiled_format = flags.pop('precompiled_format', None)
+
+  def precompiled_format_header(self):
+    """
+    Returns the ``%&<format>`` line that has to precede the simplified document
+    if `precompiled_format` is set, otherwise an empty string.
+    """
+    if not self.precompiled_format:
+      return ""
+    return "%&" + self.precompiled_format + "\n"
 
   def set_tex_input_directory(
     self,
     tex_input_directory,
     latex_walker_init_args=None,
-    strict_input=True
+    strict_input=True,
+    input_cache=None
   ):
     """
     Sets where to look for input files when encountering the ``\\input`` or ``\\include`` macro.
+
+    Input files are looked up, read and parsed only once, see LatexInputCache;
+    an existing `input_cache` may be shared instead of creating a new one.
     """
-    self.tex_input_directory = tex_input_directory
-    self.latex_walker_init_args = latex_walker_init_args if latex_walker_init_args else {}
-    self.strict_input = strict_input
+    if input_cache is None:
+      input_cache = LatexInputCache(
+        tex_input_directory,
+        strict_input=strict_input,
+        latex_walker_init_args=latex_walker_init_args
+      )
+    self.input_cache = input_cache
+    self.tex_input_directory = input_cache.tex_input_directory
+    self.latex_walker_init_args = input_cache.latex_walker_init_args
+    self.strict_input = input_cache.strict_input
 
   def read_input_file(
     self,
@@ -538,52 +663,27 @@ class LatexSimplifier(object):
   ):
     """
     """
-    # If there is no input directory, just return an empty string
-    if self.tex_input_directory is None:
-      return ""
-
-    fnfull = os.path.realpath(os.path.join(self.tex_input_directory, fn))
-
-    if self.strict_input:
-      # make sure that the input file is strictly within dirfull and didn't escape with
-      # "../.." tricks or vial symlink
-      dirfull = os.path.realpath(self.tex_input_directory)
-      if not fnfull.startswith(dirfull):
-        logger.warning(
-          "Can't access path '%s' leading outside of mandated directory [strict input mode", fn
-        )
-        return ""
-
-    if not os.path.exists(fnfull) and os.path.exists(fnfull + ".tex"):
-      fnfull = fnfull + ".tex"
-    if not os.path.exists(fnfull) and os.path.exists(fnfull + ".latex"):
-      fnfull = fnfull + ".latex"
-    if not os.path.isfile(fnfull):
-      logger.warning(u"Error, file does not exist: '%s", fn)
-      return ""
-
-    logger.debug("Reading input file %r", fnfull)
-
-    try:
-      with open(fnfull) as fin:
-        return fin.read()
-    except IOError as e:
-      logger.warning(u"Error, cannot access file '%s': %s", fn, e)
-      return ""
+    return self.input_cache.read(fn)
 
   def _input_node_simplify_repl(self, n):
     
     if len(n.nodeargs) != 1:
       logger.warning(u"Expected exactly one argument for '\\input' ! Got = %r", n.nodeargs)
 
-    input_tex = self.read_input_file(self.nodelist_to_simplified([n.nodeargs[0]]).strip())
+    # Only an overridden read_input_file() has to be asked for the contents
+    read_input_file = None
+    if type(self).read_input_file is not LatexSimplifier.read_input_file:
+      read_input_file = self.read_input_file
 
-    if not input_tex:
+    input_nodes = self.input_cache.parse(
+      self.nodelist_to_simplified([n.nodeargs[0]]).strip(),
+      read_input_file
+    )
+
+    if not input_nodes:
       return ""
 
-    return self.nodelist_to_simplified(
-      texwalker.LatexWalker(input_tex, **self.latex_walker_init_args).get_latex_nodes()[0]
-    )
+    return self.nodelist_to_simplified(input_nodes)
 
 
   def latex_to_simplified(self, latex, **parse_flags):
@@ -593,7 +693,7 @@ class LatexSimplifier(object):
     s = ''
     prev_node = None
     for node in nodelist:
-      if self._is_bare_macro_node(prev_node) and node.isNodeType(texwalker.LatexCharsNode):
+      if self._is_bare_macro_node(prev_node) and node.nodekind == texwalker.NODE_CHARS:
         if not self.strict_latex_spaces['between-macro-and-chars']:
           # after a macro with absolutely no arguments, include
           # post_space in output by default if there are other chars
@@ -623,26 +723,13 @@ class LatexSimplifier(object):
     # ### It doesn't look like we use prev_node_hint at all.  Eliminate at
     # ### some point?
     
-    if node.isNodeType(texwalker.LatexCharsNode):
+    kind = node.nodekind
+    if kind == texwalker.NODE_CHARS:
       return self.chars_node_to_text(node, textcol=textcol)
-    
-    if node.isNodeType(texwalker.LatexCommentNode):
-      return self.comment_node_to_text(node)
-    
-    if node.isNodeType(texwalker.LatexGroupNode):
-      return self.group_node_to_text(node)
-    
-    if node.isNodeType(texwalker.LatexMacroNode):
-      return self.macro_node_to_text(node)
-    
-    if node.isNodeType(texwalker.LatexEnvironmentNode):
-      return self.environment_node_to_text(node)
 
-    if node.isNodeType(texwalker.LatexSpecialsNode):
-      return self.specials_node_to_text(node)
-
-    if node.isNodeType(texwalker.LatexMathNode):
-      return self.math_node_to_text(node)
+    kind_to_text = self._node_kind_to_text.get(kind)
+    if kind_to_text is not None:
+      return kind_to_text(node)
 
     logger.warning("LatexSimplifier.node_to_text(): Unknown node: %r", node)
 
@@ -690,6 +777,7 @@ class LatexSimplifier(object):
   def macro_node_to_text(self, node):
     macroname = node.macroname
     mac = self.latex_context.get_macro_spec(macroname)
+    self.used_specs.add((KIND_MACRO, macroname))
 
     if mac is None:
       #default to unknown macros, which will be fully eliminated
@@ -718,6 +806,7 @@ class LatexSimplifier(object):
   def environment_node_to_text(self, node):
     environmentname = node.environmentname
     envdef = self.latex_context.get_environment_spec(environmentname)
+    self.used_specs.add((KIND_ENVIRONMENT, environmentname))
     if envdef is None:
       # default for unknown environments
       envdef = EnvironmentTextSpec(environmentname, discard=True)
@@ -733,6 +822,7 @@ class LatexSimplifier(object):
   def specials_node_to_text(self, node):
     specials_chars = node.specials_chars
     sspec = self.latex_context.get_specials_spec(specials_chars)
+    self.used_specs.add((KIND_SPECIALS, specials_chars))
     if sspec is None:
       # no corresponding spec, leave the special chars unchanged:
       return specials_chars
@@ -788,28 +878,22 @@ class LatexSimplifier(object):
 
   def do_fill_text(self, text, textcol=0):
     # keep trailing whitespace to have whitespace between macros in text 
-    head_ws = re.search(r'^\s*', text).group()
+    head_ws = text[:len(text) - len(text.lstrip())]
     head_par = '\n\n' if ('\n\n' in head_ws) else ''
-    #head_nl = '\n' if (not head_par and '\n' in head_ws) else ''
-    trail_ws = re.search(r'\s*$', text).group()
+    trail_ws = text[len(text.rstrip()):]
     trail_par = '\n\n' if ('\n\n' in trail_ws) else ''
-    #trail_nl = '\n' if (not trail_par and '\n' in trail_ws) else ''
     text = text.strip()
+    width = self.fill_text
     def fill_chunk(x, textcol):
-      #head_ws = ' ' if textcol>0 and x[0:1].isspace() else ''
-      #trail_ws = ' ' if x[-1:].isspace() else ''
-      head_ws, trail_ws = '', ''
       x = x.strip()
-      if textcol >= self.fill_text-4:
-        return '\n' + textwrap.fill(x, self.fill_text) + trail_ws
+      if textcol >= width-4:
+        return '\n' + util.fill_text(x, width)
       else:
-        return head_ws + \
-          textwrap.fill(x, self.fill_text, initial_indent='X'*textcol)[textcol:] + \
-          trail_ws
+        return util.fill_text(x, width, textcol)
     return head_par + (' ' if textcol>0 and head_ws and not head_par else '') + "\n\n".join(
       chunk
       for chunk in (fill_chunk(x, textcol if j==0 else 0)
-                    for j, x in enumerate(re.compile(r'\n{2,}').split(text)))
+                    for j, x in enumerate(_rx_paragraph_breaks.split(text)))
       if chunk.strip()
     ) + (' ' if trail_ws and not trail_par else '') + trail_par
 
@@ -823,23 +907,23 @@ class LatexSimplifier(object):
     represent the macro/environment/specials arguments.  The argument `what`
     is used in error messages.
     """
-    if callable(simplify_repl):
-      if 'l2tobj' in getfullargspec(simplify_repl)[0]:
+    info = util.get_simplify_repl_info(simplify_repl)
+
+    if info.is_callable:
+      if info.pass_l2tobj:
         # callable accepts an argument named 'l2tobj', provide pointer to self
         r = simplify_repl(node, l2tobj=self)
       else:
         r = simplify_repl(node)
       return r if r else '' # don't return None
 
-    if '%' in simplify_repl:
+    if info.is_format:
       nodeargs = []
       if node.nodeargd and node.nodeargd.argnlist:
         nodeargs = node.nodeargd.argnlist
 
-      has_percent_s = re.search('(^|[^%])(%%)*%s', simplify_repl)
-
       if node.isNodeType(texwalker.LatexEnvironmentNode):
-        if has_percent_s:
+        if info.percent_s:
           x = (self.nodelist_to_simplified(node.nodelist), )
         else:
           x = dict(
@@ -848,7 +932,7 @@ class LatexSimplifier(object):
             )
           )
           x.update(body=self.nodelist_to_simplified(node.nodelist))
-      elif has_percent_s:
+      elif info.percent_s:
         x = tuple([self._groupnodecontents_to_text(nn)
                     for nn in nodeargs])
       else:
@@ -876,7 +960,7 @@ class LatexSimplifier(object):
 
   def _is_bare_macro_node(self, node):
     return (node is not None and
-            node.isNodeType(texwalker.LatexMacroNode) and 
+            node.nodekind == texwalker.NODE_MACRO and
             node.nodeoptarg is None and 
             len(node.nodeargs) == 0)
 
@@ -3,6 +3,7 @@
 # Chair of Algorithms and Data Structures.
 # Markus Näther <naetherm@informatik.uni-freiburg.de>
 
+import os
 import sys
 import fileinput
 import argparse
@@ -10,9 +11,46 @@ import logging
 
 from texparser import texwalker
 from texparser.texmacroexpander import TexMacroExpander
-from texparser.texsimplifier import LatexSimplifier, _strict_latex_spaces_predef
+from texparser.texsimplifier import LatexSimplifier, _strict_latex_spaces_predef, \
+  precompiled_format_name, build_precompiled_format, get_default_latex_context_db
+from texparser.utils.profiler import ParseProfiler, PHASE_PARSE, PHASE_CONVERT
+from texparser.utils.specdeps import SpecDependencies, context_fingerprints
 from texparser.version import version_str
 
+
+def simplify_latex(latex, simplifier_options, parser_options, input_directory=None, profiler=None):
+  """
+  Parses and simplifies `latex` with the LatexWalker flags `parser_options` and
+  the LatexSimplifier flags `simplifier_options`. Returns the simplifier and the
+  simplified document.
+  """
+  lw = texwalker.LatexWalker(latex, profiler=profiler, **parser_options)
+
+  start = ParseProfiler.clock()
+  (nodelist, pos, len_) = lw.get_latex_nodes()
+  if profiler is not None:
+    profiler.add_document(PHASE_PARSE, ParseProfiler.clock() - start)
+
+  ln2s = LatexSimplifier(profiler=profiler, **simplifier_options)
+
+  if input_directory is not None:
+    ln2s.set_tex_input_directory(input_directory, latex_walker_init_args=parser_options)
+
+  start = ParseProfiler.clock()
+  simplified = ln2s.nodelist_to_simplified(nodelist)
+  if profiler is not None:
+    profiler.add_document(PHASE_CONVERT, ParseProfiler.clock() - start)
+
+  return ln2s, ln2s.precompiled_format_header() + simplified + "\n"
+
+
+def _write_output(text, output_file):
+  if output_file is None:
+    print(text)
+  else:
+    with open(output_file, 'w') as fout:
+      print(text, file=fout)
+
 def main(argv=None):
 
   if argv is None:
@@ -105,6 +143,10 @@ def main(argv=None):
                       help="Only apply --keep-braced-groups to groups that contain at least "
                       "this many characters")
 
+  group.add_argument('--input-directory', metavar="DIR", dest='input_directory', default=None,
+                     help="Where to look for files referenced by \\input and \\include "
+                     "(default: they are not followed)")
+
   group = parser.add_argument_group("General options")
 
   group.add_argument('-q', '--quiet', dest='logging_level', action='store_const',
@@ -116,6 +158,14 @@ def main(argv=None):
   group.add_argument('--version', action='version',
                      version='pylatexenc {}'.format(version_str),
                      help="Show version information and exit")
+  group.add_argument('--profile-report', metavar="FILE", dest='profile_report', default=None,
+                     help="Record the counts and times per node type, macro and environment "
+                     "and write them as JSON to FILE")
+  group.add_argument('--output-file', metavar="FILE", dest='output_file', default=None,
+                     help="Write the simplified document to FILE. default: standard output.")
+  group.add_argument('--deps-file', metavar="FILE", dest='deps_file', default=None,
+                     help="Write the fingerprints of the specs the document depends on to FILE, "
+                     "see texresimplify.")
   group.add_argument('--help', action='help',
                       help="Show this help information and exit")
 
@@ -129,6 +179,10 @@ def main(argv=None):
   group.add_argument('--no-abstract', dest='no_abstract', action='store_true', 
                      help="If activated, the abstract will be removed, if any is available. default: False.")
 
+  group.add_argument('--precompiled-format', dest='precompiled_format', action='store_true',
+                     help="If activated, the fixed preamble is expected to come from the format built "
+                     "by texfmtbuilder for the same --letter-spacing/--sim-typewriter. default: False.")
+
   parser.add_argument('files', metavar="FILE", nargs='*',
                       help='Input files (if none specified, read from stdandard input)')
 
@@ -163,16 +217,10 @@ def main(argv=None):
   else:
     fill_text = None
 
-  lw = texwalker.LatexWalker(
-    latex,
-    tolerant_parsing=args.tolerant_parsing,
-    strict_braces=args.strict_braces
-  )
-
-  (nodelist, pos, len_) = lw.get_latex_nodes()
+  profiler = ParseProfiler() if args.profile_report else None
 
-  # TODO create the simplifier instance
-  ln2s = LatexSimplifier(
+  parser_options = dict(tolerant_parsing=args.tolerant_parsing, strict_braces=args.strict_braces)
+  simplifier_options = dict(
     math_mode=args.math_mode,
     keep_comments=args.keep_comments,
     strict_latex_spaces=args.strict_latex_spaces,
@@ -182,10 +230,138 @@ def main(argv=None):
     letter_spacing=args.letter_spacing,
     sim_typewriter=args.sim_typewriter,
     remove_title=args.remove_title,
-    no_abstract=args.no_abstract
+    no_abstract=args.no_abstract,
+    precompiled_format=precompiled_format_name(args.letter_spacing, args.sim_typewriter) if args.precompiled_format else None
+  )
+
+  input_directory = args.input_directory
+
+  ln2s, simplified = simplify_latex(
+    latex, simplifier_options, parser_options, input_directory=input_directory, profiler=profiler
   )
 
-  print(ln2s.nodelist_to_simplified(nodelist) + "\n")
+  _write_output(simplified, args.output_file)
+
+  if args.deps_file is not None:
+    SpecDependencies.from_used_specs(
+      ln2s.used_specs,
+      context_fingerprints(ln2s.latex_context),
+      options={
+        'parser': parser_options,
+        'simplifier': simplifier_options,
+        'input_directory': input_directory,
+        'input_file': os.path.abspath(args.files[0]) if len(args.files) == 1 else None,
+        'output_file': os.path.abspath(args.output_file) if args.output_file is not None else None,
+      }
+    ).write(args.deps_file)
+
+  if profiler is not None:
+    profiler.documents += 1
+    profiler.write(args.profile_report)
+
+
+def fmtbuilder_main(argv=None):
+
+  if argv is None:
+    argv = sys.argv[1:]
+
+  parser = argparse.ArgumentParser(prog='texfmtbuilder', add_help=False)
+
+  group = parser.add_argument_group("Format options")
+
+  group.add_argument('--letter-spacing', dest='letter_spacing', default=56, 
+                     help="The letter spacing that should be used. default: 56.")
+  group.add_argument('--sim-typewriter', dest='sim_typewriter', action='store_true', 
+                     help="If activated, each text will be packed within typewriter font. default: False.")
+  group.add_argument('--output-dir', dest='output_dir', default='.',
+                     help="The directory to write the format file to. default: current directory.")
+  group.add_argument('--help', action='help',
+                      help="Show this help information and exit")
+
+  args = parser.parse_args(argv)
+
+  print(build_precompiled_format(
+    args.output_dir,
+    letter_spacing=args.letter_spacing,
+    sim_typewriter=args.sim_typewriter
+  ))
+
+def resimplify_main(argv=None):
+
+  if argv is None:
+    argv = sys.argv[1:]
+
+  parser = argparse.ArgumentParser(prog='texresimplify', add_help=False)
+
+  group = parser.add_argument_group("Re-simplification options")
+
+  group.add_argument('--deps-suffix', dest='deps_suffix', default='.deps.json',
+                     help="Suffix of the files written by texsimplifier --deps-file. default: .deps.json.")
+  group.add_argument('--dry-run', dest='dry_run', action='store_true',
+                     help="Only print the outputs which would be simplified again. default: False.")
+
+  group = parser.add_argument_group("General options")
+
+  group.add_argument('-q', '--quiet', dest='logging_level', action='store_const',
+                      const=logging.ERROR, default=logging.INFO,
+                      help="Suppress warning messages")
+  group.add_argument('-v', '--verbose', dest='logging_level', action='store_const',
+                      const=logging.DEBUG,
+                      help="Verbose output")
+  group.add_argument('--help', action='help',
+                      help="Show this help information and exit")
+
+  parser.add_argument('paths', metavar="PATH", nargs='+',
+                      help='Dependency files, or directories which are searched for them')
+
+  args = parser.parse_args(argv)
+
+  logging.basicConfig()
+  logging.getLogger().setLevel(args.logging_level)
+
+  deps_files = []
+  for path in args.paths:
+    if not os.path.isdir(path):
+      deps_files.append(path)
+      continue
+    for dirpath, dirnames, filenames in os.walk(path):
+      dirnames.sort()
+      deps_files.extend(os.path.join(dirpath, fn) for fn in sorted(filenames) if fn.endswith(args.deps_suffix))
+
+  fingerprints = context_fingerprints(get_default_latex_context_db())
+
+  num_changed = 0
+  for deps_file in deps_files:
+    deps = SpecDependencies.load(deps_file)
+    changed = deps.changed(fingerprints)
+    if not changed:
+      continue
+
+    num_changed += 1
+    logging.debug("%s depends on the changed specs %s", deps_file, ", ".join(changed))
+
+    input_file = deps.options.get('input_file')
+    output_file = deps.options.get('output_file')
+    if input_file is None or output_file is None:
+      logging.warning("Can't simplify '%s' again, its input or output file is unknown", deps_file)
+      continue
+
+    print(output_file)
+    if args.dry_run:
+      continue
+
+    with open(input_file, 'r') as fin:
+      latex = fin.read()
+
+    ln2s, simplified = simplify_latex(
+      latex, deps.options['simplifier'], deps.options['parser'],
+      input_directory=deps.options.get('input_directory')
+    )
+    _write_output(simplified, output_file)
+
+    SpecDependencies.from_used_specs(ln2s.used_specs, fingerprints, options=deps.options).write(deps_file)
+
+  logging.info("%d of %d documents depend on changed specs", num_changed, len(deps_files))
 
 if __name__ == '__main__':
   main()
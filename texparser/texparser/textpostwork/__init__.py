@@ -2,3 +2,181 @@
 # Copyright 2019-2020, University of Freiburg.
 # Chair of Algorithms and Data Structures.
 # Markus Näther <naetherm@informatik.uni-freiburg.de>
+
+r"""
+Normalisation of the plain text produced by tex2text (or extracted from pdfs).
+
+The :py:class:`TextPostProcessor` applies a configurable set of rules in one
+pass over the text: the Unicode normalisation, then all character replacements
+(ligatures) through one translation table, then all pattern based rules through
+one combined regular expression. Documents can be processed one by one, many at
+once, or streamed paragraph by paragraph (no rule reaches across a blank line).
+"""
+
+import re
+import unicodedata
+
+
+RULE_NFC = 'nfc'
+RULE_LIGATURES = 'ligatures'
+RULE_SPACES = 'spaces'
+RULE_BLANK_LINES = 'blank_lines'
+RULE_HYPHENATION = 'hyphenation'
+RULE_MATH = 'math'
+
+all_rules = (RULE_NFC, RULE_LIGATURES, RULE_SPACES, RULE_BLANK_LINES, RULE_HYPHENATION, RULE_MATH)
+
+# Hyphenation joins only make sense for text with line breaks within words
+# (e.g. extracted from pdfs), and the math placeholders may be wanted as they
+# are, so these are opt-in
+default_rules = (RULE_NFC, RULE_LIGATURES, RULE_SPACES, RULE_BLANK_LINES)
+
+# The placeholder of math in the text, see LatexNodes2Text's math_mode
+math_placeholder = '[MATH]'
+
+ligatures = {
+  'ﬀ': 'ff',
+  'ﬁ': 'fi',
+  'ﬂ': 'fl',
+  'ﬃ': 'ffi',
+  'ﬄ': 'ffl',
+  'ﬅ': 'st',
+  'ﬆ': 'st',
+  'Ĳ': 'IJ',
+  'ĳ': 'ij',
+}
+
+# Separates the documents processed together by process_many(). None of the
+# rules matches across it.
+_document_separator = '\x00'
+
+_rx_letter = r'[^\W\d_]'
+
+
+def _replace_hyphenation(processor, m):
+  if m.string[m.end()].islower():
+    return ''
+  return m.group()
+
+
+def _replace_math(processor, m):
+  if not processor.math_replacement:
+    return ''
+  if m.group()[0] in ' \t':
+    return ' ' + processor.math_replacement
+  return processor.math_replacement
+
+
+# (rule, pattern, replacement) of the rules applied by the combined regular
+# expression, in the order they are tried at every position. The replacement is
+# a string, or a function of the processor and the match. The patterns must not
+# contain named groups.
+_pattern_rules = [
+  # 'exam-\nple' -> 'example', if the continuation is in lower case
+  (RULE_HYPHENATION, r'(?<=' + _rx_letter + r')-\n(?=' + _rx_letter + r')', _replace_hyphenation),
+  # trailing whitespace of lines
+  (RULE_SPACES, r'[ \t]+(?=\n|' + _document_separator + r'|\Z)', ''),
+  # runs of spaces and tabs
+  (RULE_SPACES, r'[ \t]{2,}|\t', ' '),
+  # more than one blank line
+  (RULE_BLANK_LINES, r'\n(?:[ \t]*\n){2,}', '\n\n'),
+  # (runs of) math placeholders, with one preceding space
+  (RULE_MATH, r'[ \t]?' + re.escape(math_placeholder) +
+   r'(?:[ \t]*\n?[ \t]*' + re.escape(math_placeholder) + r')*', _replace_math),
+]
+
+
+class TextPostProcessor(object):
+  """
+  Applies the rules `rules` (see `all_rules`) to texts:
+
+    - 'nfc': Unicode normalisation form C.
+    - 'ligatures': Expands the ligature characters, e.g. 'ﬁ' -> 'fi'.
+    - 'spaces': Removes trailing whitespace of lines and collapses runs of
+      spaces and tabs into one space.
+    - 'blank_lines': Collapses several blank lines into one.
+    - 'hyphenation': Joins words hyphenated at the end of a line, if the
+      continuation starts in lower case.
+    - 'math': Collapses adjacent math placeholders into one and replaces it
+      by `math_replacement` (removing one preceding space if that is empty).
+
+  All rules see the text as it was before the single pass, e.g. the spaces
+  around a removed math placeholder are not collapsed anymore.
+  """
+
+  def __init__(self, rules=default_rules, math_replacement=math_placeholder):
+    super(TextPostProcessor, self).__init__()
+
+    unknown_ = set(rules) - set(all_rules)
+    if unknown_:
+      raise ValueError("Unknown post-processing rules: {}".format(", ".join(sorted(unknown_))))
+
+    self.rules = tuple(r for r in all_rules if r in rules)
+    self.math_replacement = math_replacement
+
+    self._nfc = RULE_NFC in self.rules
+    self._translation = str.maketrans(ligatures) if RULE_LIGATURES in self.rules else None
+
+    alternatives_ = []
+    # group name -> replacement
+    self._replacements = {}
+    for i, (rule, pattern, replacement) in enumerate(_pattern_rules):
+      if rule not in self.rules:
+        continue
+      group = "r{}".format(i)
+      alternatives_.append("(?P<{}>{})".format(group, pattern))
+      self._replacements[group] = replacement
+
+    self._rx = re.compile("|".join(alternatives_)) if alternatives_ else None
+
+  def _replace(self, m):
+    replacement = self._replacements[m.lastgroup]
+    if isinstance(replacement, str):
+      return replacement
+    return replacement(self, m)
+
+  def process(self, text):
+    """
+    Returns the normalised `text`.
+    """
+    if self._nfc:
+      text = unicodedata.normalize('NFC', text)
+    if self._translation is not None:
+      text = text.translate(self._translation)
+    if self._rx is not None:
+      text = self._rx.sub(self._replace, text)
+    return text
+
+  def process_many(self, texts):
+    """
+    Returns the list of the normalised `texts`. They are processed together, in
+    a single pass, unless one of them contains the internal document separator.
+    """
+    texts = list(texts)
+    if any(_document_separator in text for text in texts):
+      return [self.process(text) for text in texts]
+    if not texts:
+      return []
+    return self.process(_document_separator.join(texts)).split(_document_separator)
+
+  def process_stream(self, fin, fout, chunk_size=1 << 16):
+    """
+    Normalises the text read from the file object `fin` and writes it to
+    `fout`. The text is processed in pieces of about `chunk_size` characters,
+    which end right before a line following a blank line.
+    """
+    pending = []
+    pending_size = 0
+    after_blank = False
+    for line in fin:
+      blank = not line.strip()
+      if not blank and after_blank and pending_size >= chunk_size:
+        fout.write(self.process("".join(pending)))
+        pending = []
+        pending_size = 0
+      pending.append(line)
+      pending_size += len(line)
+      after_blank = blank and line.endswith('\n')
+
+    if pending:
+      fout.write(self.process("".join(pending)))
@@ -5,12 +5,11 @@
 
 from __future__ import print_function, unicode_literals
 
-import os
 import sys
-import re
 import logging
 import argparse
-import regex as re
+
+from texparser.textpostwork import TextPostProcessor, all_rules, default_rules, math_placeholder
 
 logger = logging.getLogger(__name__)
 
@@ -20,31 +19,49 @@ def main(argv=None):
   if argv is None:
     argv = sys.argv[1:]
 
-  parser = argparse.ArgumentParser(prog='texmacroexpander', add_help=False)
+  parser = argparse.ArgumentParser(prog='textpostwork', add_help=False)
 
-  parser.add_argument(
-    '--input-file', dest='input_file', 
-    help="The input file to work on.")
-  parser.add_argument(
-    '--output-file', dest='output_file',
-    help="The output file to save to."
-  )
+  group = parser.add_argument_group("Post-processing options")
 
-  args = parser.parse_args(argv)
+  group.add_argument('--input-file', dest='input_file', default=None,
+                     help="The input file to work on. default: standard input.")
+  group.add_argument('--output-file', dest='output_file', default=None,
+                     help="The output file to save to. default: standard output.")
+  group.add_argument('--rules', dest='rules', nargs='+', choices=all_rules, default=list(default_rules),
+                     help="The rules to apply. default: {}".format(" ".join(default_rules)))
+  group.add_argument('--math-replacement', dest='math_replacement', default=math_placeholder,
+                     help="Replacement of (runs of) math placeholders by the rule 'math'. default: '{}'"
+                     .format(math_placeholder))
 
-  cont = ""
-  with open(args.input_file, 'r', encoding='utf-8') as fin:
-    cont = fin.read()
+  group = parser.add_argument_group("General options")
 
-  #print("cont: {}".format(cont))
+  group.add_argument('-q', '--quiet', dest='logging_level', action='store_const',
+                      const=logging.ERROR, default=logging.INFO,
+                      help="Suppress warning messages")
+  group.add_argument('-v', '--verbose', dest='logging_level', action='store_const',
+                      const=logging.DEBUG,
+                      help="Verbose output")
+  group.add_argument('--help', action='help',
+                      help="Show this help information and exit")
+
+  args = parser.parse_args(argv)
 
-  cont = re.sub(r'^\n+(?=\n)', '\n', cont)
+  logging.basicConfig()
+  logging.getLogger().setLevel(args.logging_level)
 
-  #print("cont: {}".format(cont))
+  processor = TextPostProcessor(rules=args.rules, math_replacement=args.math_replacement)
+  logger.debug("Applying the rules %s", ", ".join(processor.rules))
 
-  with open(args.output_file, 'w') as fout:
-    fout.write(cont)
+  fin = open(args.input_file, 'r', encoding='utf-8') if args.input_file is not None else sys.stdin
+  fout = open(args.output_file, 'w', encoding='utf-8') if args.output_file is not None else sys.stdout
+  try:
+    processor.process_stream(fin, fout)
+  finally:
+    if fin is not sys.stdin:
+      fin.close()
+    if fout is not sys.stdout:
+      fout.close()
 
 
 if __name__ == '__main__':
-  main()
\ No newline at end of file
+  main()
@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019-2020, University of Freiburg.
+# Chair of Algorithms and Data Structures.
+# Markus Näther <naetherm@informatik.uni-freiburg.de>
+
+r"""
+Predicts whether a LaTeX document compiles, without running pdflatex.
+
+The prediction is based on the parsed :py:class:`LatexWalker` tree: the document
+has to parse without errors (balanced braces and environments), and the
+document class, all packages and all files referenced by ``\input``,
+``\include`` and ``\includegraphics`` have to be available. Whenever that can't
+be decided, the verdict is 'uncertain' and the caller should compile the
+document for real, see :py:func:`compile_check`.
+"""
+
+import os
+import json
+import shutil
+import logging
+import tempfile
+import subprocess
+
+from texparser import texwalker
+
+logger = logging.getLogger(__name__)
+
+
+VERDICT_OK = 'ok'
+VERDICT_FAIL = 'fail'
+VERDICT_UNCERTAIN = 'uncertain'
+
+# Classes and packages which are part of every reasonable TeX installation
+default_known_packages = frozenset([
+  'article', 'report', 'book', 'letter', 'amsart', 'amsbook', 'revtex4', 'revtex4-1', 'revtex4-2',
+  'llncs', 'IEEEtran', 'elsarticle', 'aa', 'mn2e', 'emulateapj', 'aastex', 'jhep', 'JHEP',
+  'amsmath', 'amssymb', 'amsthm', 'amsfonts', 'mathtools', 'bm', 'latexsym', 'mathrsfs',
+  'graphicx', 'graphics', 'epsfig', 'color', 'xcolor', 'subfigure', 'subfig', 'subcaption',
+  'caption', 'float', 'wrapfig', 'rotating', 'epstopdf', 'tikz', 'pgf', 'pgfplots',
+  'hyperref', 'url', 'cite', 'natbib', 'biblatex', 'geometry', 'fullpage', 'setspace',
+  'inputenc', 'fontenc', 'babel', 'times', 'mathptmx', 'lmodern', 'microtype', 'textcomp',
+  'array', 'tabularx', 'longtable', 'multirow', 'booktabs', 'multicol', 'enumerate', 'enumitem',
+  'verbatim', 'listings', 'algorithm', 'algorithmic', 'algorithmicx', 'algpseudocode',
+  'ifthen', 'calc', 'xspace', 'soul', 'ulem', 'bbm', 'dsfont', 'slashed', 'braket',
+  'dcolumn', 'appendix', 'fancyhdr', 'lineno', 'comment', 'psfrag', 'pstricks',
+])
+
+# Extensions pdflatex tries for \includegraphics without extension
+graphics_extensions = ['', '.pdf', '.png', '.jpg', '.jpeg', '.eps', '.PDF', '.PNG', '.JPG', '.JPEG', '.EPS']
+
+# Extensions tried for \input and \include
+input_extensions = ['', '.tex']
+
+# Macros defining macros or environments. Files referenced in their bodies are
+# only read where the definition is used, with arguments unknown here
+definition_macros = frozenset([
+  'newcommand', 'renewcommand', 'providecommand', 'DeclareRobustCommand',
+  'newenvironment', 'renewenvironment',
+])
+
+
+class ValidationResult(object):
+  """
+  The result of a :py:meth:`LatexValidator.validate` call.
+
+  .. py:attribute:: verdict
+
+      One of 'ok', 'fail' or 'uncertain'.
+
+  .. py:attribute:: reasons
+
+      List of human readable reasons for the verdict.
+  """
+
+  def __init__(self, verdict=VERDICT_OK, reasons=None):
+    super(ValidationResult, self).__init__()
+
+    self.verdict = verdict
+    self.reasons = reasons if reasons is not None else []
+
+  def fail(self, reason):
+    self.verdict = VERDICT_FAIL
+    self.reasons.append(reason)
+
+  def uncertain(self, reason):
+    if self.verdict != VERDICT_FAIL:
+      self.verdict = VERDICT_UNCERTAIN
+    self.reasons.append(reason)
+
+
+class LatexValidator(object):
+  """
+  Predicts the compilability of documents, see the module documentation.
+
+  Packages and classes are looked up in the document's directory, in
+  `known_packages`, and finally through `kpsewhich` (the results of which are
+  cached for the lifetime of the validator).
+  """
+
+  def __init__(self, known_packages=None, kpsewhich='kpsewhich'):
+    super(LatexValidator, self).__init__()
+
+    self.known_packages = known_packages if known_packages is not None else default_known_packages
+    self.kpsewhich = kpsewhich
+
+    # file name -> True/False, or None if kpsewhich is not available
+    self._kpsewhich_cache = {}
+
+  def validate_file(self, filename, input_directory=None):
+    """
+    Validates the document `filename`; all referenced files are resolved
+    relative to `input_directory` (default: its directory), e.g. the source
+    tree of a flattened document.
+    """
+    with open(filename, 'r', encoding='utf-8', errors='replace') as fin:
+      latex = fin.read()
+
+    if input_directory is None:
+      input_directory = os.path.dirname(os.path.abspath(filename))
+
+    return self.validate(latex, input_directory)
+
+  def validate(self, latex, input_directory):
+    result = ValidationResult()
+
+    nodelist = self._parse(latex, result, "document")
+
+    documentclasses = []
+    self._validate_nodes(nodelist, input_directory, result, documentclasses, set())
+
+    if not documentclasses:
+      result.fail("no \\documentclass")
+
+    return result
+
+  def _parse(self, latex, result, what):
+    try:
+      return texwalker.LatexWalker(latex, tolerant_parsing=False).get_latex_nodes()[0]
+    except texwalker.LatexWalkerError as e:
+      # Our parser is stricter than TeX (e.g. for environments opened within
+      # \newenvironment definitions), so this is no proof of failure
+      result.uncertain("{} does not parse: {}".format(what, str(e).split("\n")[0]))
+
+    return texwalker.LatexWalker(latex, tolerant_parsing=True).get_latex_nodes()[0]
+
+  def _validate_nodes(self, nodelist, input_directory, result, documentclasses, visited):
+    for node in _iter_nodes(nodelist):
+      if not node.isNodeType(texwalker.LatexMacroNode):
+        continue
+
+      if node.macroname == 'documentclass':
+        documentclasses.append(node)
+        for name in _macro_arg_names(node):
+          self._check_package(name, '.cls', input_directory, result)
+      elif node.macroname == 'usepackage':
+        for name in _macro_arg_names(node):
+          self._check_package(name, '.sty', input_directory, result)
+      elif node.macroname in ('input', 'include'):
+        for name in _file_arg_names(node):
+          fn = _find_file(input_directory, name, input_extensions)
+          if fn is None:
+            result.fail("missing input file '{}'".format(name))
+          elif fn not in visited:
+            visited.add(fn)
+            with open(fn, 'r', encoding='utf-8', errors='replace') as fin:
+              included = self._parse(fin.read(), result, "'{}'".format(name))
+            self._validate_nodes(included, input_directory, result, documentclasses, visited)
+      elif node.macroname == 'includegraphics':
+        for name in _file_arg_names(node):
+          if _find_file(input_directory, name, graphics_extensions) is None:
+            result.fail("missing graphics file '{}'".format(name))
+      elif node.macroname == 'graphicspath':
+        # Graphics may be found elsewhere, we can't tell missing ones for sure anymore
+        result.uncertain("\\graphicspath is used")
+
+  def _check_package(self, name, ext, input_directory, result):
+    if name in self.known_packages or os.path.isfile(os.path.join(input_directory, name + ext)):
+      return
+
+    found = self._kpsewhich_lookup(name + ext)
+    if found is None:
+      result.uncertain("can't look up '{}'".format(name + ext))
+    elif not found:
+      result.fail("missing '{}'".format(name + ext))
+
+  def _kpsewhich_lookup(self, fn):
+    if fn not in self._kpsewhich_cache:
+      try:
+        proc = subprocess.run([self.kpsewhich, fn], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self._kpsewhich_cache[fn] = bool(proc.stdout.strip())
+      except OSError:
+        self._kpsewhich_cache[fn] = None
+    return self._kpsewhich_cache[fn]
+
+
+def _iter_nodes(nodelist):
+  """
+  Yields all nodes of `nodelist`, including all nested nodes and macro
+  arguments, in document order. The arguments of `definition_macros` are
+  skipped.
+  """
+  for node in nodelist:
+    if node is None:
+      continue
+    yield node
+    if node.isNodeType(texwalker.LatexMacroNode) and node.macroname in definition_macros:
+      continue
+    if getattr(node, 'nodeargd', None) is not None and node.nodeargd.argnlist:
+      for argnode in _iter_nodes(node.nodeargd.argnlist):
+        yield argnode
+    if getattr(node, 'nodelist', None):
+      for subnode in _iter_nodes(node.nodelist):
+        yield subnode
+
+
+def _macro_arg_names(node):
+  """
+  Returns the comma separated names of the last (mandatory) argument of the
+  macro `node`, e.g. ['amsmath', 'amssymb'] for ``\\usepackage{amsmath,amssymb}``.
+  Comments and the whitespace around the names are dropped.
+  """
+  if node.nodeargd is None or not node.nodeargd.argnlist or node.nodeargd.argnlist[-1] is None:
+    return []
+
+  arg = node.nodeargd.argnlist[-1]
+  if arg.isNodeType(texwalker.LatexGroupNode):
+    text = "".join(
+      n.latex_verbatim() for n in arg.nodelist
+      if n is not None and not n.isNodeType(texwalker.LatexCommentNode)
+    )
+  else:
+    text = arg.latex_verbatim()
+
+  return [name.strip() for name in text.split(",") if name.strip()]
+
+
+def _file_arg_names(node):
+  """
+  Same as :py:func:`_macro_arg_names`, but without names containing macro
+  parameters (e.g. ``\\input{#1}`` within the body of a ``\\def``), which
+  can't be checked.
+  """
+  return [name for name in _macro_arg_names(node) if '#' not in name]
+
+
+def _find_file(input_directory, name, extensions):
+  for ext in extensions:
+    fn = os.path.join(input_directory, name + ext)
+    if os.path.isfile(fn):
+      return fn
+  return None
+
+
+def compile_check(filename, timeout=60, pdflatex='pdflatex', input_directory=None):
+  """
+  Compiles `filename` in a temporary output directory and returns whether
+  pdflatex succeeded. Referenced files are looked up in `input_directory`
+  (default: the directory of `filename`).
+  """
+  filename = os.path.abspath(filename)
+  if input_directory is None:
+    input_directory = os.path.dirname(filename)
+  tmp_dir = tempfile.mkdtemp(prefix="texvalidator-")
+  try:
+    proc = subprocess.run(
+      [pdflatex, '-halt-on-error', '-interaction=nonstopmode', '-output-directory=' + tmp_dir, filename],
+      cwd=input_directory,
+      stdin=subprocess.DEVNULL,
+      stdout=subprocess.DEVNULL,
+      stderr=subprocess.DEVNULL,
+      timeout=timeout
+    )
+    return proc.returncode == 0
+  except subprocess.TimeoutExpired:
+    return False
+  finally:
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+class ValidationStats(object):
+  """
+  Accumulates how often the fast path was taken and how often it agreed with
+  pdflatex, persisted as JSON in `filename`. For uncertain verdicts, the
+  results of the fallback compilation are counted as well.
+  """
+
+  def __init__(self, filename=None):
+    super(ValidationStats, self).__init__()
+
+    self.filename = filename
+    self.counts = {
+      'predicted_ok': 0,
+      'predicted_fail': 0,
+      'uncertain': 0,
+      'uncertain_compiled_ok': 0,
+      'uncertain_compiled_fail': 0,
+      'verified': 0,
+      'agreed': 0,
+    }
+
+    if filename is not None and os.path.exists(filename):
+      with open(filename, 'r') as fin:
+        self.counts.update(json.load(fin))
+
+  def add(self, verdict, compiled=None):
+    """
+    Records a validation with fast path `verdict` and the result of the real
+    compilation, if one was done.
+    """
+    if verdict == VERDICT_UNCERTAIN:
+      self.counts['uncertain'] += 1
+      if compiled is not None:
+        self.counts['uncertain_compiled_' + (VERDICT_OK if compiled else VERDICT_FAIL)] += 1
+      return
+
+    self.counts['predicted_' + verdict] += 1
+    if compiled is not None:
+      self.counts['verified'] += 1
+      if compiled == (verdict == VERDICT_OK):
+        self.counts['agreed'] += 1
+
+  def agreement_rate(self):
+    if not self.counts['verified']:
+      return None
+    return self.counts['agreed'] / float(self.counts['verified'])
+
+  def save(self):
+    if self.filename is None:
+      return
+    with open(self.filename, 'w') as fout:
+      json.dump(self.counts, fout, indent=2)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019-2020, University of Freiburg.
+# Chair of Algorithms and Data Structures.
+# Markus Näther <naetherm@informatik.uni-freiburg.de>
+
+import sys
+import random
+import argparse
+import logging
+
+from texparser.texvalidator import LatexValidator, ValidationStats, compile_check, \
+  VERDICT_OK, VERDICT_UNCERTAIN
+
+def main(argv=None):
+
+  if argv is None:
+    argv = sys.argv[1:]
+
+  parser = argparse.ArgumentParser(prog='texvalidator', add_help=False)
+
+  group = parser.add_argument_group("Validation options")
+
+  group.add_argument('--input-directory', dest='input_directory', default=None,
+                     help="Directory the referenced files (packages, \\input, graphics) are looked up in, "
+                     "e.g. the source tree of a flattened document. default: the directory of FILE.")
+  group.add_argument('--fallback-compile', dest='fallback_compile', action='store_true',
+                     help="Compile the document with pdflatex if the prediction is uncertain. default: False.")
+  group.add_argument('--verify-rate', dest='verify_rate', type=float, default=0.0,
+                     help="Fraction of the certain predictions which are checked by a real compilation "
+                     "to measure the agreement with pdflatex. default: 0.")
+  group.add_argument('--timeout', dest='timeout', type=float, default=60,
+                     help="Timeout of a real compilation in seconds. default: 60.")
+  group.add_argument('--stats-file', dest='stats_file', default=None,
+                     help="JSON file accumulating the validation statistics over several runs.")
+  group.add_argument('--report', dest='report', action='store_true',
+                     help="Only print the statistics of --stats-file and exit.")
+
+  group = parser.add_argument_group("General options")
+
+  group.add_argument('-q', '--quiet', dest='logging_level', action='store_const',
+                      const=logging.ERROR, default=logging.INFO,
+                      help="Suppress warning messages")
+  group.add_argument('-v', '--verbose', dest='logging_level', action='store_const',
+                      const=logging.DEBUG,
+                      help="Verbose output")
+  group.add_argument('--help', action='help',
+                      help="Show this help information and exit")
+
+  parser.add_argument('file', metavar="FILE", nargs='?',
+                      help='The TeX file to validate')
+
+  args = parser.parse_args(argv)
+
+  logging.basicConfig()
+  logging.getLogger().setLevel(args.logging_level)
+
+  stats = ValidationStats(args.stats_file)
+
+  if args.report:
+    for key, count in sorted(stats.counts.items()):
+      print("{}: {}".format(key, count))
+    rate = stats.agreement_rate()
+    print("agreement: {}".format("n/a" if rate is None else "{:.1%}".format(rate)))
+    return
+
+  if args.file is None:
+    parser.error("Expecting a file to validate.")
+
+  result = LatexValidator().validate_file(args.file, args.input_directory)
+  for reason in result.reasons:
+    logging.info("%s: %s", args.file, reason)
+
+  compiled = None
+  if result.verdict == VERDICT_UNCERTAIN:
+    if args.fallback_compile:
+      compiled = compile_check(args.file, timeout=args.timeout, input_directory=args.input_directory)
+  elif random.random() < args.verify_rate:
+    compiled = compile_check(args.file, timeout=args.timeout, input_directory=args.input_directory)
+
+  stats.add(result.verdict, compiled)
+  stats.save()
+
+  if compiled is not None:
+    ok = compiled
+  else:
+    ok = result.verdict == VERDICT_OK or (result.verdict == VERDICT_UNCERTAIN and not args.fallback_compile)
+
+  print(result.verdict if compiled is None else ("ok" if compiled else "fail"))
+
+  if not ok:
+    sys.exit(1)
+
+if __name__ == '__main__':
+  main()
@@ -113,6 +113,12 @@ else:
 logger = logging.getLogger(__name__)
 
 
+# Precompiled patterns used by LatexWalker.get_token().  They are matched in
+# place with pattern.match(s, pos) / pattern.search(s, pos).
+_rx_environment_name = re.compile(r'\s*\{([\w*]+)\}')
+_rx_comment_end = re.compile(r'(\n|\r|\n\r)(?P<extraspace>\s*)')
+
+
 def _maketuple(*args):
     # for use with Python 2, where we don't have *args expansion in tuples and
     # lists
@@ -450,6 +456,16 @@ class LatexToken(object):
 
 
 
+# Integer tags of the node classes, see :py:attr:`LatexNode.nodekind`
+NODE_CHARS = 1
+NODE_GROUP = 2
+NODE_COMMENT = 3
+NODE_MACRO = 4
+NODE_ENVIRONMENT = 5
+NODE_SPECIALS = 6
+NODE_MATH = 7
+
+
 class LatexNode(object):
     """
     Represents an abstract 'node' of the latex document.
@@ -487,7 +503,21 @@ class LatexNode(object):
        
        The attributes `parsing_state`, `pos` and `len` were added in
        `pylatexenc 2.0`.
+
+    All node classes furthermore have the class attribute:
+
+    .. py:attribute:: nodekind
+
+       A small integer identifying the node class (one of `NODE_CHARS`,
+       `NODE_GROUP`, `NODE_COMMENT`, `NODE_MACRO`, `NODE_ENVIRONMENT`,
+       `NODE_SPECIALS`, `NODE_MATH`), or 0 for this abstract base class.
+       Subclasses of a node class inherit its tag.  Code which handles every
+       node type differently can dispatch on this tag in a table instead of
+       testing :py:meth:`isNodeType()` for every class in turn.
     """
+
+    nodekind = 0
+
     def __init__(self, _fields, _redundant_fields=None,
                  parsing_state=None, pos=None, len=None, **kwargs):
 
@@ -572,6 +602,8 @@ class LatexCharsNode(LatexNode):
 
        The string of characters represented by this node.
     """
+    nodekind = NODE_CHARS
+
     def __init__(self, chars, **kwargs):
         super(LatexCharsNode, self).__init__(
             _fields = ('chars',),
@@ -605,6 +637,8 @@ class LatexGroupNode(LatexNode):
 
           The `delimiters` field was added in `pylatexenc 2.0`.
     """
+    nodekind = NODE_GROUP
+
     def __init__(self, nodelist, **kwargs):
         delimiters = kwargs.pop('delimiters', ('{', '}'))
         super(LatexGroupNode, self).__init__(
@@ -631,6 +665,8 @@ class LatexCommentNode(LatexNode):
        (e.g., indentation spaces of the next line)
 
     """
+    nodekind = NODE_COMMENT
+
     def __init__(self, comment, **kwargs):
         comment_post_space = kwargs.pop('comment_post_space', '')
 
@@ -700,6 +736,8 @@ class LatexMacroNode(LatexNode):
        A list of arguments to the macro. Each item in the list is a
        :py:class:`LatexNode`.
     """
+    nodekind = NODE_MACRO
+
     def __init__(self, macroname, **kwargs):
         nodeargd=kwargs.pop('nodeargd', macrospec.ParsedMacroArgs())
         macro_post_space=kwargs.pop('macro_post_space', '')
@@ -779,6 +817,8 @@ class LatexEnvironmentNode(LatexNode):
           arguments for standard latex macros, for backwards compatibility.
     """
     
+    nodekind = NODE_ENVIRONMENT
+
     def __init__(self, environmentname, nodelist, **kwargs):
         nodeargd = kwargs.pop('nodeargd', macrospec.ParsedMacroArgs())
         # legacy:
@@ -830,6 +870,8 @@ class LatexSpecialsNode(LatexNode):
 
        Latex specials were introduced in `pylatexenc 2.0`.
     """
+    nodekind = NODE_SPECIALS
+
     def __init__(self, specials_chars, **kwargs):
         nodeargd=kwargs.pop('nodeargd', None)
 
@@ -874,6 +916,8 @@ class LatexMathNode(LatexNode):
        The contents of the environment, given as a list of
        :py:class:`LatexNode`'s.
     """
+    nodekind = NODE_MATH
+
     def __init__(self, displaytype, nodelist=[], **kwargs):
         delimiters = kwargs.pop('delimiters', (None, None))
 
@@ -948,33 +992,86 @@ class ParsingState(object):
     .. versionadded:: 2.0
  
        This class was introduced in version 2.0.
+
+    Parsing states are immutable, and states with identical fields are shared:
+    :py:meth:`sub_context` returns the same instance for the same fields instead
+    of copying the state.  Use :py:meth:`sub_context` to obtain a modified
+    state.
     """
+
+    _fields = ('s', 'latex_context', 'in_math_mode', )
+
     def __init__(self, s=None, latex_context=None, in_math_mode=False):
         super(ParsingState, self).__init__()
-        self.s = s
-        self.latex_context = latex_context
-        self.in_math_mode = in_math_mode
-        self._fields = ('s', 'latex_context', 'in_math_mode', )
+        object.__setattr__(self, 's', s)
+        object.__setattr__(self, 'latex_context', latex_context)
+        object.__setattr__(self, 'in_math_mode', in_math_mode)
+        # all states derived from this one through sub_context(), by their field
+        # values; shared with these derived states
+        object.__setattr__(self, '_interned', {self._intern_key(self.get_fields()): self})
+        # sub_context() arguments -> resulting state
+        object.__setattr__(self, '_sub_contexts', {})
+
+    def __setattr__(self, name, value):
+        raise AttributeError(
+            "ParsingState is immutable, use sub_context({}=...) instead".format(name)
+        )
+
+    def _intern_key(self, fields):
+        # `s` may be very long, so it is identified by its id rather than by its
+        # value.  Returns None if any field value is not hashable.
+        key = tuple( (id(v) if f == 's' else v) for f, v in sorted(fields.items()) )
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
 
     def sub_context(self, **kwargs):
         r"""
-        Return a new :py:class:`ParsingState` instance that is a copy of the current
-        parsing state, but where the given properties keys have been set to the
-        corresponding values (given as keyword arguments).
+        Return a :py:class:`ParsingState` instance that is the same as the
+        current parsing state, but where the given properties keys have been set
+        to the corresponding values (given as keyword arguments).
 
         This makes it easy to create a sub-context in a given parser.  For
         instance, if we enter math mode, we might write::
 
            parsing_state_inner = parsing_state.sub_context(in_math_mode=True)
 
-        If no arguments are provided, this returns a copy of the present parsing
-        context object.
+        If no arguments are provided, or if all arguments are equal to the
+        current values, this returns the present parsing state object itself.
+        Otherwise, states with identical fields are created only once and
+        reused on subsequent calls.
         """
-        p = self.__class__(**self.get_fields())
+        if not kwargs:
+            return self
+
+        try:
+            cachekey = tuple(sorted(kwargs.items()))
+            return self._sub_contexts[cachekey]
+        except KeyError:
+            pass
+        except TypeError:
+            # unhashable argument values, don't cache
+            cachekey = None
+
         for k, v in kwargs.items():
             if k not in self._fields:
                 raise ValueError("Invalid field for ParsingState: {}={!r}".format(k, v))
-            setattr(p, k, v)
+
+        fields = self.get_fields()
+        fields.update(kwargs)
+
+        key = self._intern_key(fields)
+        p = self._interned.get(key) if key is not None else None
+        if p is None:
+            p = self.__class__(**fields)
+            object.__setattr__(p, '_interned', self._interned)
+            if key is not None:
+                self._interned[key] = p
+
+        if cachekey is not None:
+            self._sub_contexts[cachekey] = p
         return p
 
     def get_fields(self):
@@ -1019,6 +1116,10 @@ class LatexWalker(object):
         generally won't need to specify this flag, use `tolerant_parsing`
         instead.
 
+      - `profiler=None|ParseProfiler` If set to a
+        :py:class:`texparser.utils.profiler.ParseProfiler` instance, the counts
+        and times of all parsed nodes are recorded in it.
+
     The methods provided in this class perform various parsing of the given
     string `s`.  These methods typically accept a `pos` parameter, which must be
     an integer, which defines the position in the string `s` to start parsing.
@@ -1079,6 +1180,10 @@ class LatexWalker(object):
         # will be determined lazily automatically by pos_to_lineno_colno(...)
         self._line_no_calc = None
 
+        # brace char configuration -> (open brace chars, close brace chars), see
+        # _get_brace_char_sets()
+        self._brace_char_sets = {}
+
         self.debug_nodes = False
 
         if latex_context is None:
@@ -1126,6 +1231,9 @@ class LatexWalker(object):
         self.tolerant_parsing = kwargs.pop('tolerant_parsing', True)
         self.strict_braces = kwargs.pop('strict_braces', False)
 
+        # opt-in instrumentation, see texparser.utils.profiler
+        self.profiler = kwargs.pop('profiler', None)
+
         if 'keep_inline_math' in kwargs:
             util.pylatexenc_deprecated_2(
                 "The keep_inline_math=... option in LatexWalker() has no effect "
@@ -1147,7 +1255,8 @@ class LatexWalker(object):
         that we are parsing (`s` provided to the constructor) and the current
         latex context (`latex_context` provided to the constructor).
 
-        If no arguments are provided, this returns the default parsing state.
+        If no arguments are provided, this returns the default parsing state
+        (the same instance every time).
 
         If keyword arguments are provided, then they can override fields from
         the default parsing state.  For instance, if we enter math mode, you
@@ -1156,6 +1265,8 @@ class LatexWalker(object):
           parsing_state_mathmode = \
               my_latex_walker.make_parsing_state(in_math_mode=True)
         """
+        if not kwargs:
+            return self.default_parsing_state
         return self.default_parsing_state.sub_context(**kwargs)
 
     def parse_flags(self):
@@ -1229,57 +1340,56 @@ class LatexWalker(object):
         """
 
         if parsing_state is None:
-            parsing_state = self.make_parsing_state() # get default parsing state
-
-        brace_chars = [('{', '}')]
-
-        if include_brace_chars:
-            brace_chars += include_brace_chars
+            parsing_state = self.default_parsing_state
 
+        brackets_are_braces = False
         if 'brackets_are_chars' in kwargs:
-            if not kwargs.pop('brackets_are_chars'):
-                brace_chars += [('[', ']')]
-
+            brackets_are_braces = not kwargs.pop('brackets_are_chars')
 
         s = self.s # shorthand
-
-        space = ''
-        while pos < len(s) and s[pos].isspace():
-            space += s[pos]
+        n = len(s)
+
+        start = pos
+        while pos < n and s[pos].isspace():
+            if s[pos] == '\n' and pos > start and s[pos-1] == '\n':
+                # two \n's indicate new paragraph.
+                return LatexToken(tok='char', arg='\n\n', pos=pos-1, len=2,
+                                  pre_space=s[start:pos-1])
             pos += 1
-            if space.endswith('\n\n'):  # two \n's indicate new paragraph.
-                return LatexToken(tok='char', arg='\n\n', pos=pos-2, len=2, pre_space=space[:-2])
+        space = s[start:pos]
 
-        if pos >= len(s):
+        if pos >= n:
             raise LatexWalkerEndOfStream(final_space=space)
 
-        if s[pos] == '\\':
+        c = s[pos]
+
+        if c == '\\':
             # escape sequence
-            if pos+1 >= len(s):
+            if pos+1 >= n:
                 raise LatexWalkerEndOfStream()
-            macro = s[pos+1] # next char is necessarily part of macro
-            # following chars part of macro only if all are alphabetical
+            # next char is necessarily part of macro; following chars part of
+            # macro only if all are alphabetical
             isalphamacro = False
             i = 2
             if s[pos+1].isalpha():
                 isalphamacro = True
-                while pos+i<len(s) and s[pos+i].isalpha():
-                    macro += s[pos+i]
+                while pos+i < n and s[pos+i].isalpha():
                     i += 1
+            macro = s[pos+1:pos+i]
 
             # special treatment for \( ... \) and \[ ... \] -- "macros" for
             # inline/display math modes
-            if macro in ['[', ']']:
+            if macro == '[' or macro == ']':
                 return LatexToken(tok='mathmode_display', arg='\\'+macro,
                                   pos=pos, len=i, pre_space=space)
-            if macro in ['(', ')']:
+            if macro == '(' or macro == ')':
                 return LatexToken(tok='mathmode_inline', arg='\\'+macro,
                                   pos=pos, len=i, pre_space=space)
 
             # see if we have a begin/end environment
-            if environments and macro in ['begin', 'end']:
+            if environments and (macro == 'begin' or macro == 'end'):
                 # \begin{environment} or \end{environment}
-                envmatch = re.match(r'^\s*\{([\w*]+)\}', s[pos+i:])
+                envmatch = _rx_environment_name.match(s, pos+i)
                 if envmatch is None:
                     raise LatexWalkerParseError(
                         s=s,
@@ -1292,7 +1402,7 @@ class LatexWalker(object):
                     tok=('begin_environment' if macro == 'begin' else 'end_environment'),
                     arg=envmatch.group(1),
                     pos=pos,
-                    len=i+envmatch.end(), # !!envmatch.end() counts from pos+i
+                    len=envmatch.end()-pos,
                     pre_space=space
                     )
 
@@ -1300,16 +1410,17 @@ class LatexWalker(object):
             post_space = ''
             if isalphamacro:
                 # important, LaTeX does not consume space after non-alpha macros, like \&
-                while pos+i<len(s) and s[pos+i].isspace():
-                    post_space += s[pos+i]
+                j = pos+i
+                while pos+i < n and s[pos+i].isspace():
                     i += 1
+                post_space = s[j:pos+i]
 
             return LatexToken(tok='macro', arg=macro, pos=pos, len=i,
                               pre_space=space, post_space=post_space)
 
-        if s[pos] == '%':
+        if c == '%':
             # latex comment
-            m = re.compile(r'(\n|\r|\n\r)(?P<extraspace>\s*)').search(s, pos)
+            m = _rx_comment_end.search(s, pos)
             mlen = None
             if m is not None:
                 if m.group('extraspace').startswith( ('\n', '\r', '\n\r',) ):
@@ -1323,20 +1434,20 @@ class LatexWalker(object):
                     mlen = m.end()-pos
                     mspace = m.group()
             else:
-                arglen = len(s)-pos# [  ==len(s[pos:])  ]
+                arglen = n-pos# [  ==len(s[pos:])  ]
                 mlen = arglen
                 mspace = ''
             return LatexToken(tok='comment', arg=s[pos+1:pos+arglen], pos=pos, len=mlen,
                               pre_space=space, post_space=mspace)
 
-        # see https://stackoverflow.com/a/19343/1694896
-        openbracechars, closebracechars = zip(*brace_chars)
+        openbracechars, closebracechars = \
+            self._get_brace_char_sets(include_brace_chars, brackets_are_braces)
 
-        if s[pos] in openbracechars:
-            return LatexToken(tok='brace_open', arg=s[pos], pos=pos, len=1, pre_space=space)
+        if c in openbracechars:
+            return LatexToken(tok='brace_open', arg=c, pos=pos, len=1, pre_space=space)
 
-        if s[pos] in closebracechars:
-            return LatexToken(tok='brace_close', arg=s[pos], pos=pos, len=1, pre_space=space)
+        if c in closebracechars:
+            return LatexToken(tok='brace_close', arg=c, pos=pos, len=1, pre_space=space)
 
         # check for math-mode dollar signs.  Using python syntax "string.startswith(pattern, pos)"
         if s.startswith('$$', pos):
@@ -1353,7 +1464,28 @@ class LatexWalker(object):
 
         # otherwise, the token is a normal 'char' type.
 
-        return LatexToken(tok='char', arg=s[pos], pos=pos, len=1, pre_space=space)
+        return LatexToken(tok='char', arg=c, pos=pos, len=1, pre_space=space)
+
+    def _get_brace_char_sets(self, include_brace_chars, brackets_are_braces):
+        # Returns the sets of opening and closing brace chars for the given
+        # get_token() arguments.  These are built only once per configuration.
+        key = (tuple(include_brace_chars) if include_brace_chars else (), brackets_are_braces)
+        try:
+            return self._brace_char_sets[key]
+        except KeyError:
+            pass
+
+        brace_chars = [('{', '}')]
+        if include_brace_chars:
+            brace_chars += include_brace_chars
+        if brackets_are_braces:
+            brace_chars += [('[', ']')]
+
+        # see https://stackoverflow.com/a/19343/1694896
+        openbracechars, closebracechars = zip(*brace_chars)
+        sets = (frozenset(openbracechars), frozenset(closebracechars))
+        self._brace_char_sets[key] = sets
+        return sets
 
 
     def make_node(self, node_class, **kwargs):
@@ -1412,6 +1544,18 @@ class LatexWalker(object):
 
         return self._line_no_calc.pos_to_lineno_colno(pos, as_dict=as_dict)
 
+    def pos_to_lineno_colno_batch(self, positions, as_dict=False):
+        r"""
+        Same as :py:meth:`pos_to_lineno_colno`, but converts a whole sequence of
+        positions (e.g. the positions of all nodes of a node list) at once.
+        Returns a list of tuples (or dictionaries if `as_dict=True`).
+        """
+
+        if self._line_no_calc is None:
+            self._line_no_calc = util.LineNumbersCalculator(self.s)
+
+        return self._line_no_calc.pos_to_lineno_colno_batch(positions, as_dict=as_dict)
+
 
     def get_latex_expression(self, pos, strict_braces=None, parsing_state=None):
         r"""
@@ -2168,9 +2312,18 @@ class LatexWalker(object):
 
 
 
+        profiler = self.profiler
+
         while True:
             try:
-                r_endnow = do_read(nodelist, p)
+                if profiler is None:
+                    r_endnow = do_read(nodelist, p)
+                else:
+                    num_nodes = len(nodelist)
+                    start = profiler.clock()
+                    r_endnow = do_read(nodelist, p)
+                    profiler.add_parsed_nodes(nodelist[num_nodes:], profiler.clock() - start,
+                                              LatexCharsNode.__name__)
             except LatexWalkerParseError as e:
                 if self.tolerant_parsing:
                     logger.debug("Ignoring parse error (tolerant parsing mode): %s", e)
@@ -2197,6 +2350,8 @@ class LatexWalker(object):
             if r_endnow:
                 # add last chars and last space
                 if isinstance(r_endnow, LatexWalkerEndOfStream):
+                    if p.lastchars_pos is None and r_endnow.final_space:
+                        p.lastchars_pos = p.pos
                     p.lastchars += r_endnow.final_space
                     p.pos += len(r_endnow.final_space)
                 if p.lastchars:
@@ -2504,7 +2659,36 @@ def disp_node(n, indent=0, context='* ', skip_group=False):
 
 
 
-def make_json_encoder(latexwalker, use_line_numbers=True):
+def _node_positions(nodelist, positions):
+    # collect the positions of all nodes in `nodelist`, including nested nodes
+    # and macro arguments
+    for n in nodelist:
+        if n is None:
+            continue
+        if isinstance(n, LatexNode):
+            positions.append(n.pos)
+            if getattr(n, 'nodelist', None):
+                _node_positions(n.nodelist, positions)
+            if getattr(n, 'nodeargd', None) is not None and n.nodeargd.argnlist:
+                _node_positions(n.nodeargd.argnlist, positions)
+
+
+def make_json_encoder(latexwalker, use_line_numbers=True, nodelist=None):
+    r"""
+    Return a :py:class:`json.JSONEncoder` class for the nodes produced by
+    `latexwalker`.  If the `nodelist` to be encoded is given, the line and
+    column numbers of all of its nodes are computed upfront in a single batch.
+    """
+
+    linenos_colnos = {}
+    if use_line_numbers and nodelist is not None:
+        positions = []
+        _node_positions(nodelist, positions)
+        positions = sorted(set(positions))
+        linenos_colnos = dict(zip(
+            positions,
+            latexwalker.pos_to_lineno_colno_batch(positions, as_dict=True)
+        ))
 
     class LatexNodesJSONEncoder(json.JSONEncoder):
         # not official API for now
@@ -2526,7 +2710,11 @@ def make_json_encoder(latexwalker, use_line_numbers=True):
                 #redundant_fields = getattr(n, '_redundant_fields', n._fields)
                 for fld in n._fields:
                     d[fld] = n.__dict__[fld]
-                d.update(latexwalker.pos_to_lineno_colno(n.pos, as_dict=True))
+                if use_line_numbers:
+                    lineno_colno = linenos_colnos.get(n.pos)
+                    if lineno_colno is None:
+                        lineno_colno = latexwalker.pos_to_lineno_colno(n.pos, as_dict=True)
+                    d.update(lineno_colno)
                 return d
 
             if isinstance(obj, macrospec.ParsedMacroArgs):
@@ -2536,4 +2724,125 @@ def make_json_encoder(latexwalker, use_line_numbers=True):
             return super(LatexNodesJSONEncoder, self).default(obj)
 
     
-    return LatexNodesJSONEncoder
\ No newline at end of file
+    return LatexNodesJSONEncoder
+
+
+
+def iter_flat_nodes(nodelist):
+    r"""
+    Yield all nodes of `nodelist` (including nested nodes and macro arguments)
+    in document order as flat dictionaries, without nesting.  Every dictionary
+    contains the keys:
+
+    - 'id': the index of the node in the sequence of yielded nodes;
+
+    - 'parent': the 'id' of the parent node, or -1 for the nodes of `nodelist`;
+
+    - 'argidx': for macro, environment or specials arguments, the index of the
+      argument, otherwise `None`;
+
+    - 'nodetype': the node class name;
+
+    plus all fields of the node except for the nested `nodelist` and
+    `nodeargd` (of which only the 'argspec' is kept).
+    """
+    next_id = 0
+    # stack of (parent id, argidx, node), in reverse order
+    stack = [ (-1, None, n) for n in reversed(nodelist) ]
+    while stack:
+        parent, argidx, n = stack.pop()
+        if n is None:
+            continue
+
+        d = {
+            'id': next_id,
+            'parent': parent,
+            'argidx': argidx,
+            'nodetype': n.__class__.__name__,
+        }
+        for fld in n._fields:
+            if fld not in ('nodelist', 'nodeargd'):
+                d[fld] = n.__dict__[fld]
+
+        nodeargd = getattr(n, 'nodeargd', None)
+        if nodeargd is not None:
+            d['argspec'] = getattr(nodeargd, 'argspec', None)
+
+        # children are pushed in reverse order, arguments come before the
+        # contents
+        children = []
+        if nodeargd is not None and nodeargd.argnlist:
+            children.extend( (next_id, j, a) for j, a in enumerate(nodeargd.argnlist) )
+        if getattr(n, 'nodelist', None):
+            children.extend( (next_id, None, c) for c in n.nodelist )
+        stack.extend(reversed(children))
+
+        next_id += 1
+        yield d
+
+
+def _iter_flat_node_chunks(latexwalker, nodelist, use_line_numbers, chunk_size):
+    # yield lists of flat nodes, with line numbers computed per chunk
+    chunk = []
+    for d in iter_flat_nodes(nodelist):
+        chunk.append(d)
+        if len(chunk) >= chunk_size:
+            _add_line_numbers(latexwalker, chunk, use_line_numbers)
+            yield chunk
+            chunk = []
+    if chunk:
+        _add_line_numbers(latexwalker, chunk, use_line_numbers)
+        yield chunk
+
+
+def _add_line_numbers(latexwalker, chunk, use_line_numbers):
+    if not use_line_numbers:
+        return
+    for d, (lineno, colno) in zip(chunk,
+                                  latexwalker.pos_to_lineno_colno_batch([d['pos'] for d in chunk])):
+        d['lineno'] = lineno
+        d['colno'] = colno
+
+
+def write_nodes_ndjson(latexwalker, nodelist, fout, use_line_numbers=True, chunk_size=4096):
+    r"""
+    Write all nodes of `nodelist` to the file object `fout` as newline
+    delimited JSON, one flat node (see :py:func:`iter_flat_nodes`) per line.
+    The output is written in chunks of `chunk_size` nodes, the full document
+    is never held in memory.
+    """
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for chunk in _iter_flat_node_chunks(latexwalker, nodelist, use_line_numbers, chunk_size):
+        fout.write("".join(encoder.encode(d) + "\n" for d in chunk))
+
+
+def write_nodes_columnar(latexwalker, nodelist, fout, use_line_numbers=True, chunk_size=4096):
+    r"""
+    Write all nodes of `nodelist` to the file object `fout` as a single JSON
+    object mapping every field of the flat nodes (see
+    :py:func:`iter_flat_nodes`) to the list of its values, with `None` for
+    nodes that don't have that field.  The 'id' is implicit as the index into
+    the lists.
+
+    Unlike :py:func:`write_nodes_ndjson`, this holds all columns in memory
+    before anything is written.
+    """
+    columns = {}
+    count = 0
+    for chunk in _iter_flat_node_chunks(latexwalker, nodelist, use_line_numbers, chunk_size):
+        for d in chunk:
+            for key, value in d.items():
+                if key == 'id':
+                    continue
+                col = columns.get(key)
+                if col is None:
+                    col = [None]*count
+                    columns[key] = col
+                col.append(value)
+            count += 1
+            for col in columns.values():
+                if len(col) < count:
+                    col.append(None)
+
+    columns['count'] = count
+    json.dump(columns, fout, ensure_ascii=False, separators=(',', ':'))
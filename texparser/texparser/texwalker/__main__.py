@@ -30,7 +30,9 @@ import json
 import logging
 
 
-from texparser.texwalker import LatexWalker, disp_node, make_json_encoder
+from texparser.texwalker import LatexWalker, disp_node, make_json_encoder, \
+    write_nodes_ndjson, write_nodes_columnar
+from texparser.utils.profiler import ParseProfiler, PHASE_PARSE
 from texparser.version import version_str
 
 
@@ -43,8 +45,13 @@ def main(argv=None):
     parser = argparse.ArgumentParser(prog='latexwalker', add_help=False)
 
     parser.add_argument('--output-format', metavar="FORMAT", dest="output_format",
-                        choices=["human", "json"], default='human',
-                        help='Requested output format for the node tree')
+                        choices=["human", "json", "ndjson", "columnar"], default='human',
+                        help='Requested output format for the node tree. "ndjson" writes one '
+                        'flat node per line with the index of its parent instead of nesting, '
+                        '"columnar" writes the same flat nodes as one JSON list per field')
+    parser.add_argument('--output-file', metavar="FILE", dest="output_file", default=None,
+                        help='Write the ndjson or columnar output to this file instead of '
+                        'the standard output')
     parser.add_argument('--json-indent', metavar="NUMSPACES", dest="json_indent",
                         type=int, default=2,
                         help='Indentation in JSON output (specify number of spaces '
@@ -85,6 +92,9 @@ def main(argv=None):
     parser.add_argument('--version', action='version',
                         version='pylatexenc {}'.format(version_str),
                         help="Show version information and exit")
+    parser.add_argument('--profile-report', metavar="FILE", dest='profile_report', default=None,
+                        help="Record the counts and times per node type, macro and environment "
+                        "and write them as JSON to FILE")
     parser.add_argument('--help', action='help',
                         help="Show this help information and exit")
 
@@ -100,12 +110,21 @@ def main(argv=None):
     for line in fileinput.input(files=args.files):
         latex += line
     
+    profiler = ParseProfiler() if args.profile_report else None
+
     latexwalker = LatexWalker(latex,
                               tolerant_parsing=args.tolerant_parsing,
-                              strict_braces=args.strict_braces)
+                              strict_braces=args.strict_braces,
+                              profiler=profiler)
 
+    start = ParseProfiler.clock()
     (nodelist, pos, len_) = latexwalker.get_latex_nodes()
 
+    if profiler is not None:
+        profiler.add_document(PHASE_PARSE, ParseProfiler.clock() - start)
+        profiler.documents += 1
+        profiler.write(args.profile_report)
+
     if args.output_format == 'human':
         print('\n--- NODES ---\n')
         for n in nodelist:
@@ -116,11 +135,22 @@ def main(argv=None):
     if args.output_format == 'json':
         json.dump({ 'nodelist': nodelist, },
                   sys.stdout,
-                  cls=make_json_encoder(latexwalker),
+                  cls=make_json_encoder(latexwalker, nodelist=nodelist),
                   indent=args.json_indent)
         sys.stdout.write("\n")
         return
     
+    if args.output_format in ('ndjson', 'columnar'):
+        write_nodes = write_nodes_ndjson if args.output_format == 'ndjson' else write_nodes_columnar
+        if args.output_file is not None:
+            with open(args.output_file, 'w', encoding='utf-8') as fout:
+                write_nodes(latexwalker, nodelist, fout)
+        else:
+            write_nodes(latexwalker, nodelist, sys.stdout)
+            if args.output_format == 'columnar':
+                sys.stdout.write("\n")
+        return
+
     raise ValueError("Invalid output format: "+args.output_format)
 
 
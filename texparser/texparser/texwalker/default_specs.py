@@ -108,6 +108,8 @@ specs = [
             # \input{someotherfile}
             std_macro('input', False, 1),
             std_macro('include', False, 1),
+            # \subfile{someotherfile} of the subfiles package
+            std_macro('subfile', False, 1),
 
             std_macro('includegraphics', True, 1),
 
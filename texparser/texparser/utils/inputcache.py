@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019-2020, University of Freiburg.
+# Chair of Algorithms and Data Structures.
+# Markus Näther <naetherm@informatik.uni-freiburg.de>
+
+r"""
+Resolution, reading and parsing of the files referenced by ``\input`` and
+``\include``, cached for a conversion session.
+"""
+
+import os
+import logging
+
+from texparser import texwalker
+
+logger = logging.getLogger(__name__)
+
+
+# Extensions tried (in that order) if the referenced file doesn't exist as is
+input_extensions = ['.tex', '.latex']
+
+
+class LatexInputCache(object):
+  """
+  Looks up input files relative to `tex_input_directory` and caches their
+  resolved paths, contents and parsed node lists, so every file is only looked
+  up, read and parsed once, no matter how often it is included.
+
+  If `strict_input` is set, files outside of the subtree of
+  `tex_input_directory` (e.g. through '..' or symbolic links) are refused. The
+  `latex_walker_init_args` are passed to the :py:class:`LatexWalker` parsing
+  the input files, `encoding` and `errors` to :py:func:`open` reading them.
+
+  The cached node lists are shared between all includes of the same file, so
+  they must not be modified.
+  """
+
+  def __init__(
+    self,
+    tex_input_directory=None,
+    strict_input=True,
+    latex_walker_init_args=None,
+    encoding=None,
+    errors=None
+  ):
+    super(LatexInputCache, self).__init__()
+
+    self.tex_input_directory = tex_input_directory
+    self.strict_input = strict_input
+    self.latex_walker_init_args = latex_walker_init_args if latex_walker_init_args else {}
+    self.encoding = encoding
+    self.errors = errors
+
+    self._dirfull = os.path.realpath(tex_input_directory) if tex_input_directory is not None else None
+
+    # referenced name -> full path (None if it can't be resolved)
+    self._paths = {}
+    # full path -> contents
+    self._contents = {}
+    # full path -> node list (None if there is no content)
+    self._nodelists = {}
+    # referenced name -> node list, for contents from a custom read_input_file
+    self._named_nodelists = {}
+
+    self.hits = 0
+    self.misses = 0
+
+  def resolve(self, fn):
+    """
+    Returns the full path of the referenced file `fn`, or None if it does not
+    exist or is not accessible.
+    """
+    try:
+      return self._paths[fn]
+    except KeyError:
+      pass
+
+    fnfull = self._resolve(fn)
+    self._paths[fn] = fnfull
+    return fnfull
+
+  def _resolve(self, fn):
+    if self._dirfull is None:
+      return None
+
+    fnfull = os.path.realpath(os.path.join(self.tex_input_directory, fn))
+    if self.strict_input and not fnfull.startswith(self._dirfull):
+      # make sure that the input file is strictly within dirfull, and didn't
+      # escape with '../..' tricks or via symlinks.
+      logger.warning(
+        "Can't access path '%s' leading outside of mandated directory [strict input mode]", fn
+      )
+      return None
+
+    if os.path.isfile(fnfull):
+      return fnfull
+    for ext in input_extensions:
+      if os.path.isfile(fnfull + ext):
+        return fnfull + ext
+
+    logger.warning(u"Error, file doesn't exist: '%s'", fn)
+    return None
+
+  def read(self, fn):
+    """
+    Returns the contents of the referenced file `fn`, or an empty string if it
+    can't be read.
+    """
+    fnfull = self.resolve(fn)
+    if fnfull is None:
+      return ''
+
+    try:
+      return self._contents[fnfull]
+    except KeyError:
+      pass
+
+    logger.debug("Reading input file %r", fnfull)
+    try:
+      with open(fnfull, 'r', encoding=self.encoding, errors=self.errors) as fin:
+        contents = fin.read()
+    except IOError as e:
+      logger.warning(u"Error, can't access '%s': %s", fn, e)
+      contents = ''
+
+    self._contents[fnfull] = contents
+    return contents
+
+  def parse(self, fn, read_input_file=None):
+    """
+    Returns the parsed node list of the referenced file `fn`, or None if it
+    has no contents. The node lists are cached by the resolved path, so e.g.
+    'sec/a', 'sec/a.tex' and './sec/a' are parsed only once.
+
+    If `read_input_file` is given (e.g. a converter's overridden lookup), the
+    contents are obtained from `read_input_file(fn)` instead of
+    :py:meth:`read`. The cache can't know which file such a lookup reads, so
+    its node lists are cached by the referenced name `fn`.
+    """
+    if read_input_file is None:
+      key = self.resolve(fn)
+      if key is None:
+        return None
+      nodelists = self._nodelists
+    else:
+      key = fn
+      nodelists = self._named_nodelists
+
+    try:
+      nodelist = nodelists[key]
+      self.hits += 1
+      return nodelist
+    except KeyError:
+      self.misses += 1
+
+    contents = read_input_file(fn) if read_input_file is not None else self.read(fn)
+    nodelist = None
+    if contents:
+      nodelist = texwalker.LatexWalker(contents, **self.latex_walker_init_args).get_latex_nodes()[0]
+
+    nodelists[key] = nodelist
+    return nodelist
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019-2020, University of Freiburg.
+# Chair of Algorithms and Data Structures.
+# Markus Näther <naetherm@informatik.uni-freiburg.de>
+
+r"""
+Opt-in profiling of the parser and the converters.
+
+A :py:class:`ParseProfiler` is handed to :py:class:`LatexWalker` and/or the
+converters (``profiler=...``). It counts the nodes they produce or convert and
+accumulates their time, per node type, per macro name and per environment name.
+Times are inclusive, i.e. the time of an environment contains the time of all
+nodes within it. Without a profiler, the only cost is a ``None`` check per node
+in the parser.
+"""
+
+import json
+import time
+
+
+PHASE_PARSE = 'parse'
+PHASE_CONVERT = 'convert'
+
+CATEGORY_NODES = 'nodes'
+CATEGORY_MACROS = 'macros'
+CATEGORY_ENVIRONMENTS = 'environments'
+CATEGORY_TOTAL = 'total'
+
+
+class ParseProfiler(object):
+  """
+  Records counts and cumulative times, see the module documentation.
+
+  The report (see :py:meth:`to_json_object`) maps every phase ('parse',
+  'convert') and category ('nodes', 'macros', 'environments', and 'total' for
+  whole documents) to a dictionary ``name -> {'count': ..., 'time': ...}``,
+  with times in seconds. Reports of several documents can be summed up with
+  :py:meth:`merge`.
+  """
+
+  clock = staticmethod(time.perf_counter)
+
+  def __init__(self):
+    super(ParseProfiler, self).__init__()
+
+    self.documents = 0
+    self.stats = {}
+
+  def _add(self, phase, category, name, count, elapsed):
+    entries = self.stats.setdefault(phase, {}).setdefault(category, {})
+    entry = entries.get(name)
+    if entry is None:
+      entries[name] = entry = {'count': 0, 'time': 0.0}
+    entry['count'] += count
+    entry['time'] += elapsed
+
+  def add_document(self, phase, elapsed):
+    """
+    Records the total time of `phase` for a whole document.
+    """
+    self._add(phase, CATEGORY_TOTAL, 'document', 1, elapsed)
+
+  def add_node(self, phase, node, elapsed, count=1):
+    """
+    Records `count` occurrences of `node` (its type and, for macros and
+    environments, their names) which took `elapsed` seconds.
+    """
+    self._add(phase, CATEGORY_NODES, node.__class__.__name__, count, elapsed)
+
+    macroname = getattr(node, 'macroname', None)
+    if macroname is not None:
+      self._add(phase, CATEGORY_MACROS, macroname, count, elapsed)
+
+    environmentname = getattr(node, 'environmentname', None)
+    if environmentname is not None:
+      self._add(phase, CATEGORY_ENVIRONMENTS, environmentname, count, elapsed)
+
+  def add_parsed_nodes(self, nodes, elapsed, fallback_node_type):
+    """
+    Records the nodes the parser appended in one step which took `elapsed`
+    seconds. The time is attributed to the last node; if there is none (e.g.
+    the parser only accumulated chars), it is attributed to
+    `fallback_node_type` without counting a node.
+    """
+    if not nodes:
+      self._add(PHASE_PARSE, CATEGORY_NODES, fallback_node_type, 0, elapsed)
+      return
+
+    for node in nodes[:-1]:
+      self.add_node(PHASE_PARSE, node, 0.0)
+    self.add_node(PHASE_PARSE, nodes[-1], elapsed)
+
+  def wrap_node_method(self, phase, method):
+    """
+    Returns a wrapper of the converter method `method` (whose first argument is
+    the node) which records every call.
+    """
+    clock = self.clock
+
+    def wrapper(node, *args, **kwargs):
+      if node is None:
+        return method(node, *args, **kwargs)
+      start_ = clock()
+      result_ = method(node, *args, **kwargs)
+      self.add_node(phase, node, clock() - start_)
+      return result_
+
+    return wrapper
+
+  def merge(self, other):
+    """
+    Adds the report `other` (a :py:class:`ParseProfiler` or the object returned
+    by its :py:meth:`to_json_object`) to this one.
+    """
+    if isinstance(other, ParseProfiler):
+      other = other.to_json_object()
+
+    self.documents += other.get('documents', 0)
+    for phase, categories in other.get('stats', {}).items():
+      for category, entries in categories.items():
+        for name, entry in entries.items():
+          self._add(phase, category, name, entry['count'], entry['time'])
+
+  def top(self, phase, category, n=10, key='time'):
+    """
+    Returns the `n` (name, entry) pairs of `phase` and `category` with the
+    largest `key` ('time' or 'count').
+    """
+    entries = self.stats.get(phase, {}).get(category, {})
+    return sorted(entries.items(), key=lambda item: item[1][key], reverse=True)[:n]
+
+  def to_json_object(self):
+    return {
+      'documents': self.documents,
+      'stats': self.stats,
+    }
+
+  def write(self, filename):
+    with open(filename, 'w') as fout:
+      json.dump(self.to_json_object(), fout, indent=2, sort_keys=True)
+
+  @classmethod
+  def load(cls, filename):
+    profiler = cls()
+    with open(filename, 'r') as fin:
+      profiler.merge(json.load(fin))
+    return profiler
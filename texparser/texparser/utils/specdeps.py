@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019-2020, University of Freiburg.
+# Chair of Algorithms and Data Structures.
+# Markus Näther <naetherm@informatik.uni-freiburg.de>
+
+r"""
+Records which entries of the spec database a converted document depends on.
+
+Every macro, environment and specials spec of a :py:class:`LatexContextDb` gets
+a short fingerprint, a hash of its attributes. For callables, the hash covers
+their byte code, constants, defaults and closures, as well as the functions of
+the same module they call and the module level data (strings, tables, regular
+expressions) they use. A converter records the specs it looked up (see
+``LatexSimplifier.used_specs``), including the ones that were looked up but
+are unknown. :py:class:`SpecDependencies` stores their fingerprints next to the
+output, so that a document only has to be converted again if one of these
+fingerprints changed.
+
+The byte code differs between Python versions, so after an interpreter upgrade
+all documents are considered changed.
+"""
+
+import re
+import json
+import types
+import hashlib
+import functools
+
+
+KIND_MACRO = 'macro'
+KIND_ENVIRONMENT = 'environment'
+KIND_SPECIALS = 'specials'
+
+# Maximum nesting depth of the values described for a fingerprint
+_max_depth = 8
+
+_pattern_type = type(re.compile(''))
+
+# Types of the module level values a function's fingerprint depends on. Modules,
+# classes and objects with state of their own (e.g. loggers) are left out
+_data_types = (bool, int, float, str, bytes, list, tuple, set, frozenset, dict, _pattern_type)
+
+
+def spec_key(kind, name):
+  return kind + ":" + name
+
+
+def _describe(value, seen, depth=0):
+  """
+  Returns a string describing `value` for hashing.
+  """
+  if value is None or isinstance(value, (bool, int, float, str, bytes)):
+    return repr(value)
+  if depth > _max_depth:
+    return type(value).__name__
+
+  depth += 1
+  if isinstance(value, (list, tuple)):
+    return "[" + ",".join(_describe(v, seen, depth) for v in value) + "]"
+  if isinstance(value, (set, frozenset)):
+    return "{" + ",".join(sorted(_describe(v, seen, depth) for v in value)) + "}"
+  if isinstance(value, dict):
+    return "{" + ",".join(sorted(
+      _describe(k, seen, depth) + ":" + _describe(v, seen, depth) for k, v in value.items()
+    )) + "}"
+  if isinstance(value, types.MethodType):
+    return _describe(value.__func__, seen, depth)
+  if isinstance(value, functools.partial):
+    return "partial(" + ",".join([
+      _describe(value.func, seen, depth), _describe(value.args, seen, depth), _describe(value.keywords, seen, depth)
+    ]) + ")"
+  if isinstance(value, types.FunctionType):
+    return _describe_function(value, seen, depth)
+  if isinstance(value, types.CodeType):
+    return "code(" + ",".join([
+      value.co_code.hex(), _describe(value.co_consts, seen, depth), _describe(value.co_names, seen, depth)
+    ]) + ")"
+  if isinstance(value, _pattern_type):
+    return "re(" + repr(value.pattern) + "," + str(value.flags) + ")"
+  if hasattr(value, '__dict__'):
+    return type(value).__name__ + _describe(vars(value), seen, depth)
+  return repr(value)
+
+
+def _code_names(code):
+  """
+  Returns the names used by `code`, including those of the code nested within it
+  (e.g. comprehensions and lambdas).
+  """
+  names = set(code.co_names)
+  for const in code.co_consts:
+    if isinstance(const, types.CodeType):
+      names |= _code_names(const)
+  return names
+
+
+def _describe_function(func, seen, depth):
+  name = func.__module__ + "." + func.__qualname__
+  if func in seen:
+    return name
+  seen.add(func)
+
+  parts = [
+    name,
+    _describe(func.__code__, seen, depth),
+    _describe(func.__defaults__, seen, depth),
+    _describe(func.__kwdefaults__, seen, depth),
+  ]
+  if func.__closure__:
+    parts.append(_describe([cell.cell_contents for cell in func.__closure__], seen, depth))
+
+  # Helpers of the same module the function calls, and the module level data
+  # (strings, tables, regular expressions, ...) it uses
+  for global_name in sorted(_code_names(func.__code__)):
+    value = func.__globals__.get(global_name)
+    if isinstance(value, types.FunctionType):
+      if value.__module__ == func.__module__:
+        parts.append(_describe_function(value, seen, depth))
+    elif isinstance(value, _data_types):
+      parts.append(global_name + "=" + _describe(value, seen, depth))
+
+  return "function(" + ",".join(parts) + ")"
+
+
+def spec_fingerprint(spec):
+  """
+  Returns the fingerprint of `spec`, or None if there is no spec.
+  """
+  if spec is None:
+    return None
+  return hashlib.sha1(_describe(spec, set()).encode('utf-8', errors='surrogateescape')).hexdigest()[:16]
+
+
+def context_fingerprints(latex_context):
+  """
+  Returns a dictionary mapping the keys (see :py:func:`spec_key`) of all specs of
+  `latex_context` to their fingerprints. Of several specs of the same name, the
+  one of the first category wins, as in the lookups of the context.
+  """
+  fingerprints = {}
+  for cat in latex_context.category_list:
+    d_ = latex_context.d[cat]
+    for kind, specs in ((KIND_MACRO, d_['macros']), (KIND_ENVIRONMENT, d_['environments']),
+                        (KIND_SPECIALS, d_['specials'])):
+      for name, spec in specs.items():
+        key = spec_key(kind, name)
+        if key not in fingerprints:
+          fingerprints[key] = spec_fingerprint(spec)
+  return fingerprints
+
+
+class SpecDependencies(object):
+  """
+  The fingerprints of the specs a converted document depends on, and the
+  `options` needed to convert it again (e.g. the converter flags and the input
+  and output files).
+  """
+
+  def __init__(self, specs=None, options=None):
+    super(SpecDependencies, self).__init__()
+
+    # spec key -> fingerprint (None for unknown specs)
+    self.specs = specs if specs is not None else {}
+    self.options = options if options is not None else {}
+
+  @classmethod
+  def from_used_specs(cls, used_specs, fingerprints, options=None):
+    """
+    Collects the fingerprints of the (kind, name) pairs `used_specs` from
+    `fingerprints` (see :py:func:`context_fingerprints`).
+    """
+    keys_ = (spec_key(kind, name) for kind, name in used_specs)
+    return cls(dict((key, fingerprints.get(key)) for key in keys_), options)
+
+  def changed(self, fingerprints):
+    """
+    Returns the sorted keys of the specs whose fingerprint differs in
+    `fingerprints`.
+    """
+    return sorted(key for key, fingerprint in self.specs.items() if fingerprints.get(key) != fingerprint)
+
+  def to_json_object(self):
+    return {
+      'specs': self.specs,
+      'options': self.options,
+    }
+
+  def write(self, filename):
+    with open(filename, 'w') as fout:
+      json.dump(self.to_json_object(), fout, sort_keys=True)
+
+  @classmethod
+  def load(cls, filename):
+    with open(filename, 'r') as fin:
+      d = json.load(fin)
+    return cls(d.get('specs'), d.get('options'))
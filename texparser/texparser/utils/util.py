@@ -34,8 +34,20 @@ try:
 except ImportError:
     from collections import MutableMapping
 
+import re
+import sys
+import inspect
 import warnings
 import bisect
+import itertools
+import functools
+import textwrap
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 # ------------------------------------------------------------------------------
@@ -126,24 +138,14 @@ class LazyDict(MutableMapping):
 class LineNumbersCalculator(object):
     r"""
     Utility to calculate line numbers.
+
+    The offsets of all line starts are computed once, with a vectorized scan
+    if `numpy` is available, and stored compactly in an ``array('l')``.
     """
     def __init__(self, s):
         super(LineNumbersCalculator, self).__init__()
 
-        def find_all_new_lines(x):
-            # first line starts at the beginning of the string
-            yield 0
-            k = 0
-            while k < len(x):
-                k = x.find('\n', k)
-                if k == -1:
-                    return
-                k += 1
-                # s[k] is the character after the newline, i.e., the 0-th column
-                # of the new line
-                yield k
-
-        self._pos_new_lines = list(find_all_new_lines(s))
+        self._pos_new_lines = _find_all_new_lines(s)
 
         
     def pos_to_lineno_colno(self, pos, as_dict=False):
@@ -169,3 +171,241 @@ class LineNumbersCalculator(object):
             return {'lineno': 1 + line_no, 'colno': col_no}
         return (1 + line_no, col_no)
 
+    def pos_to_lineno_colno_batch(self, positions, as_dict=False):
+        r"""
+        Same as :py:meth:`pos_to_lineno_colno`, but converts a whole sequence of
+        positions at once and returns a list.
+        """
+        if numpy is not None and len(positions) > _numpy_min_batch:
+            pos_arr = numpy.asarray(positions, dtype=numpy.int64)
+            pos_new_lines = numpy.frombuffer(self._pos_new_lines, dtype=numpy.dtype('l'))
+            line_nos = numpy.searchsorted(pos_new_lines, pos_arr, side='right') - 1
+            col_nos = pos_arr - pos_new_lines[line_nos]
+            pairs = zip((line_nos + 1).tolist(), col_nos.tolist())
+        else:
+            pos_new_lines = self._pos_new_lines
+            pairs = []
+            for pos in positions:
+                line_no = bisect.bisect_right(pos_new_lines, pos)-1
+                pairs.append( (1 + line_no, pos - pos_new_lines[line_no]) )
+
+        if as_dict:
+            return [ {'lineno': l, 'colno': c} for (l, c) in pairs ]
+        return list(pairs)
+
+
+# below these sizes, the pure python versions are faster than numpy
+_numpy_min_len = 4096
+_numpy_min_batch = 64
+
+
+def _find_all_new_lines(s):
+    r"""
+    Return an ``array('l')`` with the positions at which the lines of `s` start.
+    The first line starts at the beginning of the string; every following one
+    at the character after a newline.
+    """
+    if numpy is not None and len(s) > _numpy_min_len:
+        try:
+            # utf-32 has fixed width, so the indices are character positions
+            buf = numpy.frombuffer(s.encode('utf-32-le'), dtype=numpy.uint32)
+        except UnicodeEncodeError:
+            # e.g. lone surrogates, use the pure python version
+            buf = None
+        if buf is not None:
+            pos_new_lines = array('l', [0])
+            pos_new_lines.frombytes(
+                (numpy.flatnonzero(buf == 0x0A) + 1).astype(numpy.dtype('l')).tobytes()
+            )
+            return pos_new_lines
+
+    # the line lengths (including the newline) add up to the line starts
+    return array('l', itertools.accumulate(itertools.chain(
+        (0,), (n + 1 for n in map(len, s.split('\n')[:-1]))
+    )))
+
+
+
+# ------------------------------------------------------------------------------
+
+
+if sys.version_info.major >= 3:
+    _getfullargspec = inspect.getfullargspec
+else:
+    _getfullargspec = inspect.getargspec
+
+_rx_percent_s = re.compile('(^|[^%])(%%)*%s')
+
+
+class SimplifyReplInfo(object):
+    r"""
+    What the text converters need to know about a `simplify_repl` of a macro,
+    environment or specials text spec in order to apply it.  See
+    :py:func:`get_simplify_repl_info()`.
+
+    .. py:attribute:: is_callable
+
+       Whether `simplify_repl` is a callable.
+
+    .. py:attribute:: pass_l2tobj
+
+       For callables, whether the callable accepts an argument named `l2tobj`.
+
+    .. py:attribute:: is_format
+
+       For strings, whether the string contains '%' substitutions.
+
+    .. py:attribute:: percent_s
+
+       For format strings, whether they use positional '%s' substitutions
+       (rather than named '%(<n>)s' ones).
+    """
+    def __init__(self, simplify_repl):
+        self.is_callable = callable(simplify_repl)
+        self.pass_l2tobj = self.is_callable and \
+            'l2tobj' in _getfullargspec(simplify_repl)[0]
+        self.is_format = not self.is_callable and '%' in simplify_repl
+        self.percent_s = self.is_format and \
+            _rx_percent_s.search(simplify_repl) is not None
+
+
+_simplify_repl_infos = {}
+
+def get_simplify_repl_info(simplify_repl):
+    r"""
+    Return the :py:class:`SimplifyReplInfo` of `simplify_repl`.  The
+    introspection of callables and the scan of format strings are done only once
+    per `simplify_repl`, later calls are a dictionary lookup.
+    """
+    # bound methods are cached by their function, so that the cache doesn't
+    # keep their instances alive
+    key = getattr(simplify_repl, '__func__', simplify_repl)
+    try:
+        return _simplify_repl_infos[key]
+    except KeyError:
+        info = SimplifyReplInfo(simplify_repl)
+        _simplify_repl_infos[key] = info
+        return info
+    except TypeError:
+        # not hashable, can't cache
+        return SimplifyReplInfo(simplify_repl)
+
+
+
+# ------------------------------------------------------------------------------
+
+# Use textwrap's own chunking, so that fill_text() breaks lines at exactly the
+# same places
+_fill_text_wordsep_re = textwrap.TextWrapper.wordsep_re
+_fill_text_whitespace_trans = textwrap.TextWrapper.unicode_whitespace_trans
+_rx_fill_text_spaces = re.compile(r'( +)')
+_rx_fill_text_hyphenated = re.compile(r'(?<![^ ])[^ ]*-[^ ]*')
+
+
+@functools.lru_cache(maxsize=4096)
+def _fill_text_word_bounds(word):
+    # The offsets within `word` at which wordsep_re splits it
+    word_bounds = []
+    offset = 0
+    for w in _fill_text_wordsep_re.split(word):
+        if w:
+            offset += len(w)
+            word_bounds.append(offset)
+    return tuple(word_bounds[:-1])
+
+
+def _fill_text_bounds(text):
+    # Returns the offsets of the chunks textwrap would split the (munged) text
+    # into, followed by len(text).  textwrap's wordsep_re only splits words
+    # further at hyphens, and none of its lookarounds reaches across
+    # whitespace.  So it's enough (and a lot faster) to split at spaces, and to
+    # apply wordsep_re to the words with hyphens only.
+    bounds = [0]
+    bounds.extend(itertools.accumulate(
+        map(len, filter(None, _rx_fill_text_spaces.split(text)))
+    ))
+    if '-' not in text:
+        return bounds
+
+    hyphen_bounds = []
+    for m in _rx_fill_text_hyphenated.finditer(text):
+        word_bounds = _fill_text_word_bounds(m.group())
+        if word_bounds:
+            offset = m.start()
+            hyphen_bounds.extend(offset + b for b in word_bounds)
+    if not hyphen_bounds:
+        return bounds
+
+    bounds.extend(hyphen_bounds)
+    bounds.sort()
+    return bounds
+
+
+def fill_text(text, width, initial_col=0):
+    r"""
+    Fill `text` into lines of at most `width` characters, where the first line
+    starts at column `initial_col`.
+
+    The result is the same as ``textwrap.fill(text, width,
+    initial_indent='X'*initial_col)[initial_col:]`` with textwrap's default
+    options, but without creating a :py:class:`textwrap.TextWrapper` and an
+    indentation string on every call.  The text is split into chunks once
+    (running textwrap's expensive word splitting on hyphenated words only).
+    The lines are then found by bisecting the chunk offsets, and sliced
+    directly from the text.
+    """
+    if width <= 0:
+        raise ValueError("invalid width %r (must be > 0)" % width)
+
+    text = text.expandtabs().translate(_fill_text_whitespace_trans)
+    # bounds[k] is the offset of the k-th chunk in text
+    bounds = _fill_text_bounds(text)
+    n = len(bounds) - 1
+    text_len = bounds[n]
+
+    lines = []
+    # the filling continues at offset pos, within the i-th chunk (pos is
+    # only past the chunk's start if the chunk was broken at the end of the
+    # previous line)
+    pos = 0
+    i = 0
+    while pos < text_len:
+        line_width = width - initial_col if not lines else width
+
+        # whitespace at the beginning of a continued line is dropped
+        if lines and not text[pos:bounds[i+1]].strip():
+            i += 1
+            pos = bounds[i]
+            if i == n:
+                break
+
+        # the chunks i..j-1 fit on the line
+        j = bisect.bisect_right(bounds, pos + line_width, i + 1) - 1
+        line_start = pos
+        line_end = bounds[j] if j > i else pos
+        last_start = max(bounds[j-1], pos) if j > i else None
+
+        if j < n and bounds[j+1] - max(bounds[j], pos) > line_width:
+            # the next chunk doesn't fit on any line, break it (after its last
+            # hyphen that fits, if there is one with non-hyphens before it)
+            chunk_start = max(bounds[j], pos)
+            chunk = text[chunk_start:bounds[j+1]]
+            space_left = line_width - (line_end - line_start) if line_width >= 1 else 1
+            end = space_left
+            hyphen = chunk.rfind('-', 0, space_left)
+            if hyphen > 0 and chunk[:hyphen].strip('-'):
+                end = hyphen + 1
+            last_start = chunk_start
+            line_end = chunk_start + end
+
+        i = j
+        pos = line_end
+
+        # as is whitespace at the end of a line
+        if last_start is not None and not text[last_start:line_end].strip():
+            line_end = last_start
+
+        if line_end > line_start:
+            lines.append(text[line_start:line_end])
+
+    return '\n'.join(lines)